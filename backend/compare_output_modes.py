@@ -0,0 +1,34 @@
+"""Compare Gemini output modes (verbose prompts vs compact schema) on sample photos
+
+Usage: python compare_output_modes.py photo1.jpg [photo2.jpg ...]
+
+Uses VISION_BACKEND like the API (set it to "fake" or "replay" to run offline).
+"""
+import asyncio
+import json
+import sys
+
+from src.api.food_analysis import _build_vision_backend
+from src.services.gemini_vision import GeminiVisionService, OUTPUT_MODES
+
+
+async def main(paths):
+    images = []
+    for path in paths:
+        with open(path, 'rb') as f:
+            images.append(f.read())
+
+    service = GeminiVisionService(backend=_build_vision_backend())
+    for mode in OUTPUT_MODES:
+        service.output_mode = mode
+        print(f"{mode}: prompt {len(service._build_prompt(None, None))} chars")
+        for image_bytes in images:
+            await service.analyze_food_image(image_bytes)
+
+    print(json.dumps(service.usage.stats(), indent=2))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        sys.exit(__doc__)
+    asyncio.run(main(sys.argv[1:]))
@@ -1,7 +1,11 @@
 """Food Analysis API - AI-powered food recognition from images"""
 from fastapi import APIRouter, File, UploadFile, HTTPException, Depends, Form, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import AsyncIterator, List, Optional, Tuple, Union
+from datetime import datetime
+import asyncio
+import logging
 import os
 import json
 from dotenv import load_dotenv
@@ -9,11 +13,41 @@ from dotenv import load_dotenv
 # Load environment variables
 load_dotenv()
 
-from ..services.gemini_vision import GeminiVisionService, DetectedFood
+from ..services.gemini_vision import (
+    GeminiVisionService,
+    DetectedFood,
+    FoodAnalysisResult,
+    is_retryable_gemini_error,
+)
 from ..services.food_matcher import FoodMatcher
-from ..infrastructure.config.limiter import limiter
+from ..services.catalog_file import CatalogFileError, load_catalog_file
+from ..services.analysis_cache import AnalysisCache
+from ..services.image_hash import NearDuplicateIndex
+from ..services.single_flight import SingleFlight
+from ..services.image_pool import ImagePreparationPool, ImagePoolSaturatedError
+from ..services.image_decoding import ImageRejectedError, read_upload_limited
+from ..services.analysis_jobs import AnalysisJobQueue, AnalysisWorkerPool, JobQueueFullError
+from ..services.vision_backends import (
+    FakeVisionBackend,
+    GeminiBackend,
+    RecordReplayBackend,
+    VisionBackend,
+)
+from ..services.resilience import (
+    CircuitBreaker,
+    CircuitOpenError,
+    DeadlineExceededError,
+    ResilientCaller,
+)
+from ..infrastructure.auth.security import get_request_user_key
+from ..infrastructure.config.limiter import limiter, refund_rate_limit, adjust_rate_limit, charge_rate_limit
+from ..infrastructure.config.settings import settings
+from ..infrastructure.database.database import SessionLocal
+from ..infrastructure.database.models import AnalysisJob
 
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter(prefix="/api", tags=["food-analysis"])
 
 
@@ -25,6 +59,17 @@ FOOD_DATABASE_PATH = os.path.join(
     'food_database.json'
 )
 
+# Compiled, memory-mapped form of the same catalog with its indexes
+# (python -m src.services.catalog_compiler); preferred when present and
+# built from the current food_database.json, since every worker then
+# shares one copy. A stale file (the JSON edited or rebuilt since) is
+# ignored with a warning and the JSON is loaded instead.
+FOOD_CATALOG_PATH = os.path.join(
+    os.path.dirname(__file__), 
+    '..', '..', 
+    'food_catalog.bin'
+)
+
 
 class MatchedFood(BaseModel):
     """Food matched with database and nutrition calculated"""
@@ -54,19 +99,111 @@ class FoodAnalysisResponse(BaseModel):
     image_base64: Optional[str] = None
 
 
+class BatchImageResult(BaseModel):
+    """Outcome for one image of a batch request"""
+    index: int
+    filename: Optional[str] = None
+    success: bool
+    error: Optional[str] = None
+    analysis: Optional[FoodAnalysisResponse] = None
+
+
+class BatchFoodAnalysisResponse(BaseModel):
+    """Response from batch food image analysis"""
+    success: bool
+    results: List[BatchImageResult]
+    total_calories: float
+    total_protein: float
+    total_carbs: float
+    total_fat: float
+
+
+class AnalysisJobResponse(BaseModel):
+    """State of an asynchronous analysis job"""
+    job_id: str
+    status: str
+    priority: int
+    attempts: int
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+    result: Optional[FoodAnalysisResponse] = None
+    error: Optional[str] = None
+    error_status: Optional[int] = None
+
+
+# Job priorities clients may ask for (higher runs first)
+JOB_PRIORITIES = {"low": 0, "normal": 10}
+
+
 # Initialize services
 gemini_service = None
 food_matcher = None
+analysis_cache = None
+near_duplicate_index = None
+analysis_flights = SingleFlight()
+analysis_workers = None
+
+
+def _build_vision_backend() -> VisionBackend:
+    """Create the vision backend selected by VISION_BACKEND"""
+    backend_name = settings.VISION_BACKEND.lower()
+
+    if backend_name == 'fake':
+        options = {
+            'latency_seconds': settings.VISION_FAKE_LATENCY_MS / 1000,
+            'jitter_seconds': settings.VISION_FAKE_JITTER_MS / 1000,
+        }
+        if settings.VISION_FAKE_RESPONSE_PATH:
+            return FakeVisionBackend.from_file(settings.VISION_FAKE_RESPONSE_PATH, **options)
+        return FakeVisionBackend(**options)
+
+    if backend_name == 'replay':
+        return RecordReplayBackend(settings.VISION_RECORDINGS_DIR, mode=RecordReplayBackend.REPLAY)
+
+    if backend_name not in ('gemini', 'record'):
+        raise HTTPException(status_code=500, detail=f"Unknown VISION_BACKEND: {settings.VISION_BACKEND}")
+
+    api_key = os.getenv('GEMINI_API_KEY')
+    if not api_key:
+        raise HTTPException(status_code=500, detail="GEMINI_API_KEY not configured")
+    backend = GeminiBackend(api_key)
+    if backend_name == 'record':
+        return RecordReplayBackend(
+            settings.VISION_RECORDINGS_DIR,
+            mode=RecordReplayBackend.RECORD,
+            inner=backend
+        )
+    return backend
 
 
 def get_gemini_service() -> GeminiVisionService:
     """Dependency to get Gemini service instance"""
     global gemini_service
     if gemini_service is None:
-        api_key = os.getenv('GEMINI_API_KEY')
-        if not api_key:
-            raise HTTPException(status_code=500, detail="GEMINI_API_KEY not configured")
-        gemini_service = GeminiVisionService(api_key)
+        backend = _build_vision_backend()
+        image_pool = ImagePreparationPool(
+            max_workers=settings.IMAGE_POOL_WORKERS,
+            max_queue=settings.IMAGE_POOL_QUEUE_DEPTH
+        )
+        resilience = ResilientCaller(
+            deadline_seconds=settings.GEMINI_DEADLINE_SECONDS,
+            max_attempts=settings.GEMINI_MAX_ATTEMPTS,
+            is_retryable=is_retryable_gemini_error,
+            breaker=CircuitBreaker(
+                failure_threshold=settings.GEMINI_BREAKER_FAILURE_THRESHOLD,
+                reset_timeout=settings.GEMINI_BREAKER_RESET_SECONDS
+            ),
+            hedge=settings.GEMINI_HEDGE_ENABLED,
+            hedge_min_delay_seconds=settings.GEMINI_HEDGE_MIN_DELAY_SECONDS
+        )
+        gemini_service = GeminiVisionService(
+            image_pool=image_pool,
+            max_image_pixels=settings.MAX_IMAGE_PIXELS,
+            resilience=resilience,
+            backend=backend,
+            output_mode=settings.GEMINI_OUTPUT_MODE,
+            repair_attempts=settings.GEMINI_REPAIR_ATTEMPTS
+        )
     return gemini_service
 
 
@@ -74,17 +211,206 @@ def get_food_matcher() -> FoodMatcher:
     """Dependency to get food matcher instance"""
     global food_matcher
     if food_matcher is None:
+        if os.path.exists(FOOD_CATALOG_PATH):
+            try:
+                food_matcher = FoodMatcher(
+                    load_catalog_file(FOOD_CATALOG_PATH, database_path=FOOD_DATABASE_PATH),
+                    cache_entries=settings.FOOD_MATCH_CACHE_MAX_ENTRIES
+                )
+                return food_matcher
+            except CatalogFileError as e:
+                logger.warning("Ignoring compiled food catalog: %s", e)
+        
         # Load food database
         try:
             with open(FOOD_DATABASE_PATH, 'r', encoding='utf-8') as f:
                 food_db = json.load(f)
-            food_matcher = FoodMatcher(food_db)
+            food_matcher = FoodMatcher(food_db, cache_entries=settings.FOOD_MATCH_CACHE_MAX_ENTRIES)
         except FileNotFoundError:
             # Fallback to minimal database if file not found
-            food_matcher = FoodMatcher([])
+            food_matcher = FoodMatcher([], cache_entries=settings.FOOD_MATCH_CACHE_MAX_ENTRIES)
     return food_matcher
 
 
+def get_analysis_cache() -> AnalysisCache:
+    """Dependency to get the per-worker analysis result cache"""
+    global analysis_cache
+    if analysis_cache is None:
+        analysis_cache = AnalysisCache(
+            max_entries=settings.ANALYSIS_CACHE_MAX_ENTRIES,
+            ttl_seconds=settings.ANALYSIS_CACHE_TTL_SECONDS,
+            max_bytes=settings.ANALYSIS_CACHE_MAX_BYTES
+        )
+    return analysis_cache
+
+
+def get_near_duplicate_index() -> NearDuplicateIndex:
+    """Dependency to get the per-worker near-duplicate photo index"""
+    global near_duplicate_index
+    if near_duplicate_index is None:
+        near_duplicate_index = NearDuplicateIndex(
+            max_distance=settings.NEAR_DUPLICATE_MAX_DISTANCE,
+            window_seconds=settings.NEAR_DUPLICATE_WINDOW_SECONDS,
+            max_entries=settings.NEAR_DUPLICATE_MAX_ENTRIES
+        )
+    return near_duplicate_index
+
+
+async def _analyze_image_bytes(
+    user_key: str,
+    image_bytes: bytes,
+    scaled_weight_g: Optional[int],
+    additional_context: Optional[str],
+    gemini: GeminiVisionService,
+    cache: AnalysisCache,
+    near_duplicates: NearDuplicateIndex
+) -> Tuple[FoodAnalysisResult, bool]:
+    """
+    Get the Gemini analysis of an image, reusing earlier results when possible
+    
+    Identical uploads (same image bytes and parameters) are served from the
+    result cache, or join the identical analysis already in flight. So are
+    near-duplicates of a photo the same user analyzed recently (same plate
+    shot again, recompressed copy), detected by perceptual hash.
+    
+    Args:
+        user_key: Requester identity (see get_request_user_key) scoping near-duplicates
+    
+    Returns:
+        Tuple of (analysis_result, called_model)
+    """
+    cache_key = cache.make_key(image_bytes, scaled_weight_g, additional_context)
+    analysis_result = cache.get(cache_key)
+    if analysis_result is not None:
+        return analysis_result, False
+    
+    owner = f"{user_key}:{cache.params_key(scaled_weight_g, additional_context)}"
+    
+    async def analyze() -> Tuple[FoodAnalysisResult, bool]:
+        prepared = await gemini.prepare_image(image_bytes)
+        
+        # Same user, same parameters, visually near-identical photo?
+        near_match = near_duplicates.find(prepared.phash, owner)
+        
+        if near_match is not None:
+            result, _ = near_match
+            called_model = False
+        else:
+            # Analyze with Gemini Vision (pass scale weight and context if available)
+            result = await gemini.analyze_food_image(image_bytes, scaled_weight_g=scaled_weight_g, additional_context=additional_context, prepared=prepared)
+            near_duplicates.add(prepared.phash, owner, result)
+            called_model = True
+        
+        # Stored even if the requester disconnected, so its retry is a hit
+        cache.set(cache_key, result)
+        return result, called_model
+    
+    # Retries arriving while the first attempt is still running share it
+    (analysis_result, called_model), joined = await analysis_flights.run(cache_key, analyze)
+    return analysis_result, called_model and not joined
+
+
+def _match_detected_foods(detected_foods: List[DetectedFood], matcher: FoodMatcher) -> List[MatchedFood]:
+    """Match detected foods with the database and calculate their nutrition"""
+    matched_foods = []
+    
+    # Match all detections with the database in one pass, with nutrition for their grams
+    matches = matcher.match_many(
+        [(detected.name, detected.preparation, detected.estimated_grams) for detected in detected_foods],
+        min_confidence=0.4  # Lower threshold for better coverage
+    )
+    
+    for detected, match in zip(detected_foods, matches):
+        if match:
+            food_item, match_conf, nutrition = match.food, match.score, match.nutrition
+            
+            matched_food = MatchedFood(
+                detected_name=detected.name,
+                matched_food_id=food_item.get('id', food_item['name'].lower().replace(' ', '-')),
+                matched_food_name=food_item['name'],
+                estimated_grams=detected.estimated_grams,
+                preparation=detected.preparation,
+                confidence=detected.confidence,
+                match_confidence=match_conf,
+                calories=nutrition['calories'],
+                protein=nutrition['protein'],
+                carbs=nutrition['carbs'],
+                fat=nutrition['fat'],
+                emoji=food_item.get('emoji', '🍽️')
+            )
+        else:
+            # No match found - create custom entry with estimated values
+            # Use rough estimates: 1g = ~1.5 kcal, 20% protein, 50% carbs, 30% fat
+            est_calories = detected.estimated_grams * 1.5
+            
+            matched_food = MatchedFood(
+                detected_name=detected.name,
+                matched_food_id=None,
+                matched_food_name=None,
+                estimated_grams=detected.estimated_grams,
+                preparation=detected.preparation,
+                confidence=detected.confidence,
+                match_confidence=None,
+                calories=est_calories,
+                protein=est_calories * 0.20 / 4,  # 20% protein (4 kcal/g)
+                carbs=est_calories * 0.50 / 4,    # 50% carbs (4 kcal/g)
+                fat=est_calories * 0.30 / 9,      # 30% fat (9 kcal/g)
+                emoji="🍽️"
+            )
+        
+        matched_foods.append(matched_food)
+    
+    return matched_foods
+
+
+def _build_analysis_response(
+    analysis_result: FoodAnalysisResult,
+    matched_foods: List[MatchedFood]
+) -> FoodAnalysisResponse:
+    """Sum matched foods into the API response"""
+    # Encode image for frontend display (optional)
+    image_base64 = None
+    # image_base64 = gemini.encode_image_to_base64(image_bytes)
+    
+    return FoodAnalysisResponse(
+        success=True,
+        matched_foods=matched_foods,
+        meal_description=analysis_result.meal_description,
+        total_calories=round(sum(food.calories for food in matched_foods), 1),
+        total_protein=round(sum(food.protein for food in matched_foods), 1),
+        total_carbs=round(sum(food.carbs for food in matched_foods), 1),
+        total_fat=round(sum(food.fat for food in matched_foods), 1),
+        image_base64=image_base64
+    )
+
+
+def _analysis_http_exception(error: Exception) -> HTTPException:
+    """Map a failure of the analysis pipeline to the HTTP error returned to the client"""
+    if isinstance(error, ImageRejectedError):
+        return HTTPException(status_code=error.status_code, detail=str(error))
+    if isinstance(error, ImagePoolSaturatedError):
+        return HTTPException(
+            status_code=503,
+            detail="Server busy processing images, please retry",
+            headers={"Retry-After": "2"}
+        )
+    if isinstance(error, CircuitOpenError):
+        return HTTPException(
+            status_code=503,
+            detail="Food recognition temporarily unavailable, please retry later",
+            headers={"Retry-After": str(int(settings.GEMINI_BREAKER_RESET_SECONDS))}
+        )
+    if isinstance(error, DeadlineExceededError):
+        return HTTPException(
+            status_code=504,
+            detail="Food recognition took too long, please retry"
+        )
+    return HTTPException(
+        status_code=500,
+        detail=f"Food analysis failed: {str(error)}"
+    )
+
+
 @router.post("/analyze-food", response_model=FoodAnalysisResponse)
 @limiter.limit("10/hour")
 async def analyze_food_image(
@@ -93,7 +419,9 @@ async def analyze_food_image(
     scaled_weight_g: Optional[int] = Form(None),
     additional_context: Optional[str] = Form(None),
     gemini: GeminiVisionService = Depends(get_gemini_service),
-    matcher: FoodMatcher = Depends(get_food_matcher)
+    matcher: FoodMatcher = Depends(get_food_matcher),
+    cache: AnalysisCache = Depends(get_analysis_cache),
+    near_duplicates: NearDuplicateIndex = Depends(get_near_duplicate_index)
 ):
     """
     Analyze food image using Gemini Vision AI
@@ -102,97 +430,400 @@ async def analyze_food_image(
     - Estimates portions in grams (or uses exact scale weight if provided)
     - Matches with food database
     - Calculates nutritional values
+    
+    Photos analyzed recently (exact or near-duplicate) are answered without
+    calling Gemini or consuming rate limit.
     """
     try:
-        # Read image bytes
-        image_bytes = await image.read()
+        # Read image bytes (bounded, in chunks)
+        image_bytes = await read_upload_limited(image, settings.MAX_UPLOAD_BYTES)
         
         if len(image_bytes) == 0:
             raise HTTPException(status_code=400, detail="Empty image file")
         
-        # Analyze with Gemini Vision (pass scale weight and context if available)
-        analysis_result = await gemini.analyze_food_image(image_bytes, scaled_weight_g=scaled_weight_g, additional_context=additional_context)
+        analysis_result, called_model = await _analyze_image_bytes(
+            get_request_user_key(request), image_bytes, scaled_weight_g, additional_context,
+            gemini, cache, near_duplicates
+        )
+        
+        if not called_model:
+            # Retry of an already analyzed photo - don't charge the rate limit
+            refund_rate_limit(request)
         
         # Match detected foods with database
-        matched_foods = []
-        total_calories = 0.0
-        total_protein = 0.0
-        total_carbs = 0.0
-        total_fat = 0.0
-        
-        for detected in analysis_result.foods:
-            # Try to match with database
-            match_result = matcher.match_food(
-                detected.name,
-                detected.preparation,
-                min_confidence=0.4  # Lower threshold for better coverage
-            )
-            
-            if match_result:
-                food_item, match_conf = match_result
-                
-                # Calculate nutrition for detected grams
-                nutrition = matcher.calculate_nutrition(food_item, detected.estimated_grams)
-                
-                matched_food = MatchedFood(
-                    detected_name=detected.name,
-                    matched_food_id=food_item.get('id', food_item['name'].lower().replace(' ', '-')),
-                    matched_food_name=food_item['name'],
-                    estimated_grams=detected.estimated_grams,
-                    preparation=detected.preparation,
-                    confidence=detected.confidence,
-                    match_confidence=match_conf,
-                    calories=nutrition['calories'],
-                    protein=nutrition['protein'],
-                    carbs=nutrition['carbs'],
-                    fat=nutrition['fat'],
-                    emoji=food_item.get('emoji', '🍽️')
-                )
-            else:
-                # No match found - create custom entry with estimated values
-                # Use rough estimates: 1g = ~1.5 kcal, 20% protein, 50% carbs, 30% fat
-                est_calories = detected.estimated_grams * 1.5
-                
-                matched_food = MatchedFood(
-                    detected_name=detected.name,
-                    matched_food_id=None,
-                    matched_food_name=None,
-                    estimated_grams=detected.estimated_grams,
-                    preparation=detected.preparation,
-                    confidence=detected.confidence,
-                    match_confidence=None,
-                    calories=est_calories,
-                    protein=est_calories * 0.20 / 4,  # 20% protein (4 kcal/g)
-                    carbs=est_calories * 0.50 / 4,    # 50% carbs (4 kcal/g)
-                    fat=est_calories * 0.30 / 9,      # 30% fat (9 kcal/g)
-                    emoji="🍽️"
-                )
-            
-            matched_foods.append(matched_food)
-            
-            # Add to totals
-            total_calories += matched_food.calories
-            total_protein += matched_food.protein
-            total_carbs += matched_food.carbs
-            total_fat += matched_food.fat
+        matched_foods = _match_detected_foods(analysis_result.foods, matcher)
         
-        # Encode image for frontend display (optional)
-        image_base64 = None
-        # image_base64 = gemini.encode_image_to_base64(image_bytes)
+        return _build_analysis_response(analysis_result, matched_foods)
         
-        return FoodAnalysisResponse(
-            success=True,
-            matched_foods=matched_foods,
-            meal_description=analysis_result.meal_description,
-            total_calories=round(total_calories, 1),
-            total_protein=round(total_protein, 1),
-            total_carbs=round(total_carbs, 1),
-            total_fat=round(total_fat, 1),
-            image_base64=image_base64
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise _analysis_http_exception(e)
+
+
+@router.post("/analyze-food/batch", response_model=BatchFoodAnalysisResponse)
+@limiter.limit("10/hour")
+async def analyze_food_images_batch(
+    request: Request,
+    images: List[UploadFile] = File(...),
+    gemini: GeminiVisionService = Depends(get_gemini_service),
+    matcher: FoodMatcher = Depends(get_food_matcher),
+    cache: AnalysisCache = Depends(get_analysis_cache),
+    near_duplicates: NearDuplicateIndex = Depends(get_near_duplicate_index)
+):
+    """
+    Analyze several meal photos in one request (e.g. offline backlog)
+    
+    Images are analyzed concurrently, at most ANALYSIS_BATCH_CONCURRENCY
+    at a time. Results are returned in upload order; a failing image is
+    reported in its own result without failing the batch. Every image that
+    needs a Gemini call counts against the rate limit: the whole batch is
+    reserved up front (429 if the quota left cannot cover it) and images
+    answered without a call are given back afterwards.
+    """
+    if len(images) > settings.ANALYSIS_BATCH_MAX_IMAGES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.ANALYSIS_BATCH_MAX_IMAGES} images per batch"
+        )
+    
+    # The request already paid for one model call; reserve the others
+    if not charge_rate_limit(request, len(images) - 1):
+        refund_rate_limit(request)
+        raise HTTPException(
+            status_code=429,
+            detail=f"Rate limit exceeded: not enough analyses left for {len(images)} images"
         )
+    
+    semaphore = asyncio.Semaphore(settings.ANALYSIS_BATCH_CONCURRENCY)
+    user_key = get_request_user_key(request)
+    
+    async def analyze_one(upload: UploadFile) -> Tuple[FoodAnalysisResult, bool]:
+        async with semaphore:
+            image_bytes = await read_upload_limited(upload, settings.MAX_UPLOAD_BYTES)
+            if len(image_bytes) == 0:
+                raise ImageRejectedError("Empty image file")
+            return await _analyze_image_bytes(
+                user_key, image_bytes, None, None, gemini, cache, near_duplicates
+            )
+    
+    outcomes = await asyncio.gather(
+        *(analyze_one(upload) for upload in images),
+        return_exceptions=True
+    )
+    
+    # Give back what was reserved for images that needed no model call
+    model_calls = sum(
+        1 for outcome in outcomes
+        if not isinstance(outcome, BaseException) and outcome[1]
+    )
+    adjust_rate_limit(request, model_calls - len(images))
+    
+    # Match every detection of the batch in a single pass
+    analyses = [
+        None if isinstance(outcome, BaseException) else outcome[0]
+        for outcome in outcomes
+    ]
+    all_detected = [
+        detected for analysis in analyses if analysis is not None
+        for detected in analysis.foods
+    ]
+    all_matched = _match_detected_foods(all_detected, matcher)
+    
+    results = []
+    offset = 0
+    for index, (upload, outcome, analysis) in enumerate(zip(images, outcomes, analyses)):
+        if analysis is None:
+            results.append(BatchImageResult(
+                index=index,
+                filename=upload.filename,
+                success=False,
+                error=_describe_batch_error(outcome)
+            ))
+            continue
+        
+        matched_foods = all_matched[offset:offset + len(analysis.foods)]
+        offset += len(analysis.foods)
+        results.append(BatchImageResult(
+            index=index,
+            filename=upload.filename,
+            success=True,
+            analysis=_build_analysis_response(analysis, matched_foods)
+        ))
+    
+    succeeded = [result.analysis for result in results if result.analysis is not None]
+    return BatchFoodAnalysisResponse(
+        success=len(succeeded) > 0,
+        results=results,
+        total_calories=round(sum(a.total_calories for a in succeeded), 1),
+        total_protein=round(sum(a.total_protein for a in succeeded), 1),
+        total_carbs=round(sum(a.total_carbs for a in succeeded), 1),
+        total_fat=round(sum(a.total_fat for a in succeeded), 1)
+    )
+
+
+def _describe_batch_error(error: BaseException) -> str:
+    """Client-facing message for an image that failed inside a batch"""
+    return _analysis_http_exception(error).detail
+
+
+def _sse_event(event: str, data: dict) -> str:
+    """Format one Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def _replay_analysis(result: FoodAnalysisResult) -> AsyncIterator[Union[DetectedFood, FoodAnalysisResult]]:
+    """Stream an already known analysis in the same shape as a live one"""
+    for food in result.foods:
+        yield food
+    yield result
+
+
+@router.post("/analyze-food/stream")
+@limiter.limit("10/hour")
+async def analyze_food_image_stream(
+    request: Request,
+    image: UploadFile = File(...),
+    scaled_weight_g: Optional[int] = Form(None),
+    additional_context: Optional[str] = Form(None),
+    gemini: GeminiVisionService = Depends(get_gemini_service),
+    matcher: FoodMatcher = Depends(get_food_matcher),
+    cache: AnalysisCache = Depends(get_analysis_cache),
+    near_duplicates: NearDuplicateIndex = Depends(get_near_duplicate_index)
+):
+    """
+    Streaming variant of /analyze-food using Server-Sent Events
+    
+    Events:
+    - food: one matched food with its nutrition, sent as soon as the model
+      has finished describing it (``index`` gives its position)
+    - done: the complete FoodAnalysisResponse with totals
+    - error: ``{"status_code", "detail"}`` if analysis fails mid-stream
+    
+    Failures before the first food (bad upload, server busy, Gemini down)
+    are returned as regular HTTP errors. Photos analyzed recently (exact or
+    near-duplicate) are replayed at once without calling Gemini or
+    consuming rate limit.
+    """
+    owner = None
+    prepared = None
+    
+    try:
+        # Read image bytes (bounded, in chunks)
+        image_bytes = await read_upload_limited(image, settings.MAX_UPLOAD_BYTES)
+        
+        if len(image_bytes) == 0:
+            raise HTTPException(status_code=400, detail="Empty image file")
+        
+        cache_key = cache.make_key(image_bytes, scaled_weight_g, additional_context)
+        known_result = cache.get(cache_key)
+        
+        if known_result is None:
+            prepared = await gemini.prepare_image(image_bytes)
+            owner = f"{get_request_user_key(request)}:{cache.params_key(scaled_weight_g, additional_context)}"
+            near_match = near_duplicates.find(prepared.phash, owner)
+            if near_match is not None:
+                known_result, _ = near_match
+                cache.set(cache_key, known_result)
+        
+        if known_result is not None:
+            # Retry of an already analyzed photo - don't charge the rate limit
+            refund_rate_limit(request)
+            events = _replay_analysis(known_result)
+        else:
+            events = gemini.stream_food_analysis(
+                image_bytes,
+                scaled_weight_g=scaled_weight_g,
+                additional_context=additional_context,
+                prepared=prepared
+            )
+        
+        # Wait for the first food so early failures still get a proper status code
+        first_event = await events.__anext__()
         
+    except HTTPException:
+        raise
     except Exception as e:
+        raise _analysis_http_exception(e)
+    
+    async def event_stream() -> AsyncIterator[str]:
+        matched_foods: List[MatchedFood] = []
+        event = first_event
+        try:
+            while not isinstance(event, FoodAnalysisResult):
+                matched = _match_detected_foods([event], matcher)[0]
+                yield _sse_event('food', {'index': len(matched_foods), **matched.model_dump()})
+                matched_foods.append(matched)
+                event = await events.__anext__()
+            
+            if known_result is None:
+                near_duplicates.add(prepared.phash, owner, event)
+                cache.set(cache_key, event)
+            yield _sse_event('done', _build_analysis_response(event, matched_foods).model_dump())
+        except Exception as e:
+            error = _analysis_http_exception(e)
+            yield _sse_event('error', {'status_code': error.status_code, 'detail': error.detail})
+        finally:
+            await events.aclose()
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            # Stop reverse proxies from buffering the stream
+            "X-Accel-Buffering": "no"
+        }
+    )
+
+
+def get_analysis_workers() -> AnalysisWorkerPool:
+    """Dependency to get this worker's analysis job pool (started by the app on startup)"""
+    global analysis_workers
+    if analysis_workers is None:
+        queue = AnalysisJobQueue(
+            SessionLocal,
+            max_running_per_owner=settings.ANALYSIS_JOB_MAX_RUNNING_PER_USER,
+            max_pending_per_owner=settings.ANALYSIS_JOB_MAX_PENDING_PER_USER,
+            max_attempts=settings.ANALYSIS_JOB_MAX_ATTEMPTS,
+            lease_seconds=settings.ANALYSIS_JOB_LEASE_SECONDS
+        )
+        analysis_workers = AnalysisWorkerPool(
+            queue,
+            _process_analysis_job,
+            concurrency=settings.ANALYSIS_JOB_WORKERS,
+            retention_seconds=settings.ANALYSIS_JOB_RETENTION_SECONDS,
+            describe_error=_describe_job_error,
+            is_retryable=lambda e: isinstance(
+                e, (CircuitOpenError, DeadlineExceededError, ImagePoolSaturatedError)
+            )
+        )
+    return analysis_workers
+
+
+async def _process_analysis_job(job: AnalysisJob) -> str:
+    """Run one queued analysis job, returning the FoodAnalysisResponse JSON"""
+    analysis_result, _ = await _analyze_image_bytes(
+        job.owner, job.image, job.scaled_weight_g, job.additional_context,
+        get_gemini_service(), get_analysis_cache(), get_near_duplicate_index()
+    )
+    matched_foods = _match_detected_foods(analysis_result.foods, get_food_matcher())
+    return _build_analysis_response(analysis_result, matched_foods).model_dump_json()
+
+
+def _describe_job_error(error: Exception) -> Tuple[int, str]:
+    """HTTP status and message recorded for a failed job"""
+    if not isinstance(error, HTTPException):
+        error = _analysis_http_exception(error)
+    return error.status_code, error.detail
+
+
+def _job_response(job: AnalysisJob) -> AnalysisJobResponse:
+    return AnalysisJobResponse(
+        job_id=job.id,
+        status=job.status,
+        priority=job.priority,
+        attempts=job.attempts,
+        created_at=job.created_at,
+        finished_at=job.finished_at,
+        result=FoodAnalysisResponse.model_validate_json(job.result) if job.result else None,
+        error=job.error,
+        error_status=job.error_status
+    )
+
+
+@router.post("/analysis-jobs", response_model=AnalysisJobResponse, status_code=202)
+@limiter.limit("10/hour")
+async def create_analysis_job(
+    request: Request,
+    image: UploadFile = File(...),
+    scaled_weight_g: Optional[int] = Form(None),
+    additional_context: Optional[str] = Form(None),
+    priority: str = Form("normal"),
+    workers: AnalysisWorkerPool = Depends(get_analysis_workers)
+):
+    """
+    Queue a food image for analysis and return its job id immediately
+    
+    The image is stored with the job, so the client can drop the
+    connection (or switch networks) and fetch the result later from
+    GET /api/analysis-jobs/{job_id}. Use priority "low" for background
+    uploads that should not delay photos the user is waiting on.
+    """
+    if not settings.ANALYSIS_JOBS_ENABLED:
+        # No process runs workers: the job would never leave the queue
+        raise HTTPException(status_code=503, detail="Analysis jobs are disabled")
+    
+    if priority not in JOB_PRIORITIES:
         raise HTTPException(
-            status_code=500,
-            detail=f"Food analysis failed: {str(e)}"
+            status_code=400,
+            detail=f"priority must be one of: {', '.join(JOB_PRIORITIES)}"
         )
+    
+    try:
+        image_bytes = await read_upload_limited(image, settings.MAX_UPLOAD_BYTES)
+    except ImageRejectedError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    
+    if len(image_bytes) == 0:
+        raise HTTPException(status_code=400, detail="Empty image file")
+    
+    try:
+        job = await asyncio.to_thread(
+            workers.queue.enqueue,
+            get_request_user_key(request),
+            image_bytes,
+            scaled_weight_g,
+            additional_context,
+            JOB_PRIORITIES[priority]
+        )
+    except JobQueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    
+    workers.notify()
+    return _job_response(job)
+
+
+@router.get("/analysis-jobs/{job_id}", response_model=AnalysisJobResponse)
+async def get_analysis_job(
+    request: Request,
+    job_id: str,
+    wait: float = 0,
+    workers: AnalysisWorkerPool = Depends(get_analysis_workers)
+):
+    """
+    Get the state (and, once finished, the result) of an analysis job
+    
+    With ``wait`` (seconds, capped at ANALYSIS_JOB_MAX_WAIT_SECONDS) the
+    request is held until the job finishes or the wait elapses (long-poll).
+    Jobs of signed-in users are only visible to them; anonymous jobs are
+    reachable by anyone holding their (unguessable) id, since the client's
+    IP may have changed since submitting.
+    """
+    wait = min(max(wait, 0.0), settings.ANALYSIS_JOB_MAX_WAIT_SECONDS)
+    job = await workers.wait_for_job(job_id, wait)
+    
+    if job is None or (
+        job.owner.startswith("user:") and job.owner != get_request_user_key(request)
+    ):
+        raise HTTPException(status_code=404, detail="Analysis job not found")
+    
+    return _job_response(job)
+
+
+@router.get("/analyze-food/metrics")
+async def analysis_metrics():
+    """Per-worker counters for the analysis pipeline (image pool, model calls, caches)"""
+    return {
+        "vision_backend": gemini_service.model_name if gemini_service else None,
+        "image_pool": gemini_service.image_pool.stats() if gemini_service else None,
+        "model_calls": gemini_service.resilience.stats() if gemini_service else None,
+        "output_modes": gemini_service.usage.stats() if gemini_service else None,
+        "result_cache": analysis_cache.stats() if analysis_cache else None,
+        "match_cache": food_matcher.match_cache.stats() if food_matcher else None,
+        "near_duplicates": {
+            "entries": len(near_duplicate_index) if near_duplicate_index else 0
+        },
+        "in_flight": analysis_flights.stats(),
+        "jobs": await asyncio.to_thread(analysis_workers.stats) if analysis_workers else None,
+    }
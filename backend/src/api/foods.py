@@ -0,0 +1,57 @@
+"""Food Catalog API - search the catalog used for food matching"""
+from fastapi import APIRouter, Depends, Query
+from pydantic import BaseModel
+from typing import Any, Dict, List, Optional
+
+from ..services.food_matcher import FoodMatcher
+from ..services.food_search import FoodSearchIndex
+from .food_analysis import get_food_matcher
+
+
+router = APIRouter(prefix="/api/foods", tags=["foods"])
+
+
+class FoodSearchResponse(BaseModel):
+    """One page of catalog search results, best matches first"""
+    query: str
+    total: int
+    offset: int
+    limit: int
+    results: List[Dict[str, Any]]
+
+
+# Global instance, rebuilt when the matcher's catalog changes
+food_search_index: Optional[FoodSearchIndex] = None
+
+
+def get_food_search_index(matcher: FoodMatcher = Depends(get_food_matcher)) -> FoodSearchIndex:
+    """Dependency to get the search index over the matcher's catalog"""
+    global food_search_index
+    if food_search_index is None or food_search_index.catalog is not matcher.catalog:
+        food_search_index = FoodSearchIndex(matcher.catalog)
+    return food_search_index
+
+
+@router.get("/search", response_model=FoodSearchResponse)
+def search_foods(
+    q: str = Query(..., min_length=1, max_length=100, description="Text typed so far"),
+    offset: int = Query(0, ge=0, le=10_000),
+    limit: int = Query(20, ge=1, le=100),
+    index: FoodSearchIndex = Depends(get_food_search_index)
+):
+    """
+    Autocomplete over the food catalog
+    
+    Accent- and case-insensitive; every word of the query is matched as a
+    word prefix ("pol bra" finds "Pollo a la Brasa"). Results are ranked:
+    exact name, then names starting with the query, then other matches;
+    shorter names first within each group.
+    """
+    page = index.search(q, offset=offset, limit=limit)
+    return FoodSearchResponse(
+        query=q,
+        total=page.total,
+        offset=offset,
+        limit=limit,
+        results=page.foods
+    )
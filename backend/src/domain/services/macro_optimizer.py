@@ -8,13 +8,26 @@ Algorithm:
 1. Calculate remaining macros needed for the day
 2. Use dynamic programming or greedy heuristic to find optimal food combinations
 3. Consider user preferences and food availability
+
+Catalog-wide scoring runs on float64 NumPy arrays (FoodMatrix); the few
+foods that can make it into the result are then rescored with the exact
+Decimal rules, so recommendations are identical to the per-food loop.
+Foods are grouped into small buckets of similar macros whose extremes
+bound every member's score, so only buckets that can still hold a selected
+food are scored; bounds kept from a nearby earlier request (by the same or
+another user) tighten them further.
 """
 
+import threading
+from collections import OrderedDict
 from decimal import Decimal
-from typing import Optional
+from typing import Hashable, Optional, Sequence, Union
 from dataclasses import dataclass
 
+import numpy as np
+
 from ..entities.food import Food, NutritionalInfo
+from .meal_solver import MealSolver
 
 
 @dataclass
@@ -56,22 +69,144 @@ class FoodRecommendation:
         )
 
 
+class FoodMatrix:
+    """
+    Per-100g macros of a food list as float64 columns.
+
+    Converting the Decimal values is most of the cost of scoring a large
+    catalog, so build this once per catalog and pass it to
+    MacroOptimizer.recommend_foods on every request. The first request
+    also groups the foods into buckets, reused by the later ones.
+    """
+
+    def __init__(self, foods: Sequence[Food]):
+        """
+        Build the matrix.
+
+        Args:
+            foods: Foods to score, in recommendation tie-break order
+        """
+        self.foods = list(foods)
+        # Columns: calories, protein, carbs, fat (MacroOptimizer.MACRO_WEIGHTS order)
+        self.macros = np.array(
+            [
+                [
+                    float(food.calories_per_100g),
+                    float(food.protein_g),
+                    float(food.carbs_g),
+                    float(food.fat_g),
+                ]
+                for food in self.foods
+            ],
+            dtype=np.float64,
+        ).reshape(len(self.foods), 4)
+
+        self.categories: list[str] = []
+        category_codes: dict[str, int] = {}
+        codes = []
+        for food in self.foods:
+            code = category_codes.setdefault(food.category.value, len(category_codes))
+            if code == len(self.categories):
+                self.categories.append(food.category.value)
+            codes.append(code)
+        # Per food, index into categories
+        self.category_codes = np.array(codes, dtype=np.int32)
+        # Buckets of similar foods, built by the first request that needs them
+        self.buckets: Optional[_FoodBuckets] = None
+
+    def __len__(self) -> int:
+        return len(self.foods)
+
+
+@dataclass
+class _FoodBuckets:
+    """Foods split into small per-category buckets of similar macros."""
+
+    foods: np.ndarray  # Food indices (with calories), bucket by bucket
+    starts: np.ndarray  # Bucket b spans foods[starts[b]:starts[b] + sizes[b]]
+    sizes: np.ndarray
+    low: np.ndarray  # (buckets, 4) smallest per-100g macros in the bucket
+    high: np.ndarray  # (buckets, 4) largest per-100g macros in the bucket
+    categories: np.ndarray  # Category code per bucket
+
+
+@dataclass
+class _WarmStart:
+    """Bucket bounds kept from a request on a catalog."""
+
+    matrix: FoodMatrix
+    max_portion_g: Decimal
+    base: np.ndarray  # Float targets the floors were computed for
+    floors: np.ndarray  # Best penalty-free score per bucket at base, rounded down
+
+
 class MacroOptimizer:
     """
     Service for optimizing food selections to meet macro targets.
 
-    Uses greedy heuristic for real-time performance (<100ms).
-    For complex optimization, consider implementing OR-Tools integration.
+    Uses greedy heuristic for real-time performance (<100ms): portions of
+    the whole catalog are scored as one foods x portions matrix. Complete
+    meals are chosen jointly by branch and bound (MealSolver).
     """
 
-    def __init__(self, min_portion_g: Decimal = Decimal("20")):
+    # Weight of the absolute difference of each macro (protein most important)
+    MACRO_WEIGHTS = {
+        "calories": Decimal("0.1"),
+        "protein_g": Decimal("4"),
+        "carbs_g": Decimal("1"),
+        "fat_g": Decimal("2"),
+    }
+
+    # Score multiplier when a portion goes over the remaining calories
+    OVER_CALORIE_PENALTY = Decimal("1.5")
+
+    # Portion grid step and the score at which the grid scan stops early
+    PORTION_STEP_G = Decimal("10")
+    GOOD_ENOUGH_SCORE = Decimal("5")
+
+    # Granularity of the portions chosen by the exact solver; the grid
+    # above is a subset of it, so the solver never scores worse
+    PORTION_RESOLUTION_G = Decimal("1")
+
+    # Foods scored per NumPy block (bounds the foods x portions temporaries)
+    SCORING_CHUNK = 4096
+
+    # Relative error allowed between float64 and Decimal scores; float
+    # results closer than this to a decision are settled in Decimal
+    FLOAT_TOLERANCE = 1e-9
+
+    # Meal search: best-fitting foods tried per group, and the wall time
+    # after which the best meal found so far is returned
+    MEAL_CANDIDATES_PER_GROUP = 8
+    MEAL_TIME_BUDGET_S = 0.1
+
+    # Most foods per bucket of similar macros, and the share of the
+    # catalog past which a full pass is cheaper than scoring by bucket
+    BUCKET_FOODS = 32
+    WARM_START_REBASE_FRACTION = 0.25
+
+    def __init__(
+        self,
+        min_portion_g: Decimal = Decimal("20"),
+        exact_portions: bool = True,
+        max_warm_users: int = 64,
+    ):
         """
         Initialize optimizer.
 
         Args:
             min_portion_g: Minimum portion size to recommend (default 20g)
+            exact_portions: Choose portions with the exact breakpoint solver
+                (solve_portion_size) instead of the 10g grid scan
+            max_warm_users: Users whose bucket bounds are kept for warm
+                starts (least recently used are dropped; 4 bytes per
+                BUCKET_FOODS foods)
         """
         self.min_portion_g = min_portion_g
+        self.exact_portions = exact_portions
+        self.max_warm_users = max_warm_users
+        self._warm_starts: OrderedDict[Hashable, _WarmStart] = OrderedDict()
+        self._warm_lock = threading.Lock()
 
     def calculate_macro_score(
         self, food: Food, portion_g: Decimal, remaining: MacroTarget
@@ -90,8 +225,19 @@ class MacroOptimizer:
         Returns:
             Score (lower is better)
         """
-        nutrition = food.calculate_for_portion(portion_g)
+        return self.score_nutrition(food.calculate_for_portion(portion_g), remaining)
+
+    def score_nutrition(self, nutrition: NutritionalInfo, remaining: MacroTarget) -> Decimal:
+        """
+        Calculate how well a portion or a whole meal matches remaining macros.
 
+        Args:
+            nutrition: Nutrients of the portion or meal
+            remaining: Remaining macro targets
+
+        Returns:
+            Score (lower is better)
+        """
         # Calculate differences (positive = over target, negative = under)
         cal_diff = nutrition.calories - remaining.calories
         protein_diff = nutrition.protein_g - remaining.protein_g
@@ -99,16 +245,17 @@ class MacroOptimizer:
         fat_diff = nutrition.fat_g - remaining.fat_g
 
         # Weighted scoring (protein most important, then calories)
+        weights = self.MACRO_WEIGHTS
         score = (
-            abs(cal_diff) * Decimal("0.1")  # Calories weight
-            + abs(protein_diff) * Decimal("4")  # Protein weight (highly valuable)
-            + abs(carbs_diff) * Decimal("1")  # Carbs weight
-            + abs(fat_diff) * Decimal("2")  # Fat weight
+            abs(cal_diff) * weights["calories"]
+            + abs(protein_diff) * weights["protein_g"]
+            + abs(carbs_diff) * weights["carbs_g"]
+            + abs(fat_diff) * weights["fat_g"]
         )
 
         # Penalize going over targets more than going under
         if cal_diff > 0:
-            score *= Decimal("1.5")
+            score *= self.OVER_CALORIE_PENALTY
 
         return score
 
@@ -118,7 +265,8 @@ class MacroOptimizer:
         """
         Find optimal portion size for a given food.
 
-        Uses binary search to find best portion within constraints.
+        Uses solve_portion_size, or scan_portion_sizes when the optimizer
+        was created with exact_portions=False.
 
         Args:
             food: Food to optimize portion for
@@ -128,12 +276,33 @@ class MacroOptimizer:
         Returns:
             Tuple of (optimal_portion_g, score)
         """
+        if self.exact_portions:
+            return self.solve_portion_size(food, remaining, max_portion_g)
+        return self.scan_portion_sizes(food, remaining, max_portion_g)
+
+    def scan_portion_sizes(
+        self, food: Food, remaining: MacroTarget, max_portion_g: Decimal = Decimal("500")
+    ) -> tuple[Decimal, Decimal]:
+        """
+        Find a good portion size by trying 10g increments.
+
+        Stops at the first portion scoring below GOOD_ENOUGH_SCORE, so the
+        result is not necessarily the best portion of the grid.
+
+        Args:
+            food: Food to optimize portion for
+            remaining: Remaining macro targets
+            max_portion_g: Maximum portion size (default 500g)
+
+        Returns:
+            Tuple of (portion_g, score)
+        """
         best_portion = self.min_portion_g
         best_score = Decimal("inf")
 
         # Try portions from min to max in 10g increments
         current = self.min_portion_g
-        step = Decimal("10")
+        step = self.PORTION_STEP_G
 
         while current <= max_portion_g:
             score = self.calculate_macro_score(food, current, remaining)
@@ -145,16 +314,217 @@ class MacroOptimizer:
             current += step
 
             # Early exit if we found perfect match
-            if best_score < Decimal("5"):
+            if best_score < self.GOOD_ENOUGH_SCORE:
                 break
 
         return best_portion, best_score
 
+    def solve_portion_size(
+        self, food: Food, remaining: MacroTarget, max_portion_g: Decimal = Decimal("500")
+    ) -> tuple[Decimal, Decimal]:
+        """
+        Find the best portion size exactly.
+
+        The score is piecewise linear in the portion: each macro term has a
+        kink where the portion meets that macro's remaining target, and the
+        over-calorie penalty steps up right after the calorie kink. On the
+        PORTION_RESOLUTION_G lattice from min_portion_g, the minimum is
+        therefore at a lattice point next to a kink or at an end of the
+        range; only those (at most 10) portions are scored. The grid of
+        scan_portion_sizes lies on the lattice, so this never scores worse.
+
+        Args:
+            food: Food to optimize portion for
+            remaining: Remaining macro targets
+            max_portion_g: Maximum portion size (default 500g)
+
+        Returns:
+            Tuple of (optimal_portion_g, score); ties go to the smaller portion
+        """
+        steps = self._lattice_steps(max_portion_g)
+        if steps < 0:
+            return self.min_portion_g, Decimal("inf")
+
+        resolution = self.PORTION_RESOLUTION_G
+        candidates = {0, steps}
+        per_100g = (food.calories_per_100g, food.protein_g, food.carbs_g, food.fat_g)
+        for value, field in zip(per_100g, self.MACRO_WEIGHTS):
+            if value <= 0:
+                continue
+            kink = getattr(remaining, field) * Decimal("100") / value
+            below = int((kink - self.min_portion_g) // resolution)
+            candidates.update(min(max(step, 0), steps) for step in (below, below + 1))
+
+        best_portion = self.min_portion_g
+        best_score = Decimal("inf")
+        for step in sorted(candidates):
+            portion = self.min_portion_g + resolution * step
+            score = self.calculate_macro_score(food, portion, remaining)
+            if score < best_score:
+                best_score = score
+                best_portion = portion
+        return best_portion, best_score
+
+    def _lattice_steps(self, max_portion_g: Decimal) -> int:
+        """Index of the largest solver lattice portion <= max_portion_g (-1 if none)."""
+        if max_portion_g < self.min_portion_g:
+            return -1
+        return int((max_portion_g - self.min_portion_g) // self.PORTION_RESOLUTION_G)
+
+    def _portion_grid(self, max_portion_g: Decimal) -> np.ndarray:
+        """Portions tried by scan_portion_sizes, as floats."""
+        if max_portion_g < self.min_portion_g:
+            return np.zeros(0, dtype=np.float64)
+        count = int((max_portion_g - self.min_portion_g) // self.PORTION_STEP_G) + 1
+        steps = np.arange(count, dtype=np.float64)
+        return float(self.min_portion_g) + float(self.PORTION_STEP_G) * steps
+
+    def score_portions(
+        self, macros: np.ndarray, portions: np.ndarray, remaining: MacroTarget
+    ) -> np.ndarray:
+        """
+        Vectorized calculate_macro_score for every (food, portion) pair.
+
+        Args:
+            macros: (foods, 4) per-100g calories, protein, carbs, fat
+            portions: Portion sizes in grams, shared (portions,) or per
+                food (foods, portions)
+            remaining: Remaining macro targets
+
+        Returns:
+            float64 (foods, portions) scores (lower is better)
+        """
+        scores, over_calories = self._deviations(macros, portions, remaining)
+        scores[over_calories] *= float(self.OVER_CALORIE_PENALTY)
+        return scores
+
+    def _deviations(
+        self, macros: np.ndarray, portions: np.ndarray, remaining: MacroTarget
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Scores before the over-calorie penalty, and where it applies."""
+        ratios = portions / 100.0
+        scores = np.zeros((len(macros), ratios.shape[-1]), dtype=np.float64)
+        targets = zip(self._targets(remaining), self.MACRO_WEIGHTS.values())
+        for column, (target, weight) in enumerate(targets):
+            diff = macros[:, column, None] * ratios
+            diff -= target
+            if column == 0:
+                over_calories = diff > 0
+            np.abs(diff, out=diff)
+            diff *= float(weight)
+            scores += diff
+        return scores, over_calories
+
+    def _targets(self, remaining: MacroTarget) -> np.ndarray:
+        return np.array([float(getattr(remaining, field)) for field in self.MACRO_WEIGHTS])
+
+    def _solved_scores(
+        self, macros: np.ndarray, remaining: MacroTarget, max_portion_g: Decimal
+    ) -> np.ndarray:
+        """
+        Vectorized solve_portion_size scores over a whole catalog.
+
+        Kinks computed in float can land one lattice step off when they
+        fall on a lattice point, but the two neighbours scored always
+        include that point, so the scores agree within float error.
+        """
+        scores, over_calories = self._solved_deviations(macros, remaining, max_portion_g)
+        scores[over_calories] *= float(self.OVER_CALORIE_PENALTY)
+        best: np.ndarray = scores.min(axis=1)
+        return best
+
+    def _solved_scores_with_floors(
+        self, macros: np.ndarray, remaining: MacroTarget, max_portion_g: Decimal
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        _solved_scores, and each food's best score without the over-calorie
+        penalty (its kinks are the same, so the same portions are scored);
+        warm starts bound later scores with it.
+        """
+        scores, over_calories = self._solved_deviations(macros, remaining, max_portion_g)
+        floors: np.ndarray = scores.min(axis=1)
+        scores[over_calories] *= float(self.OVER_CALORIE_PENALTY)
+        best: np.ndarray = scores.min(axis=1)
+        return best, floors
+
+    def _solved_deviations(
+        self, macros: np.ndarray, remaining: MacroTarget, max_portion_g: Decimal
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """_deviations of the portions solve_portion_size tries for each food."""
+        steps = self._lattice_steps(max_portion_g)
+        if steps < 0:
+            return np.full((len(macros), 1), np.inf), np.zeros((len(macros), 1), dtype=bool)
+
+        targets = self._targets(remaining)
+        low = float(self.min_portion_g)
+        resolution = float(self.PORTION_RESOLUTION_G)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            below = np.floor((targets * 100.0 / macros - low) / resolution)
+        below = np.clip(np.where(np.isfinite(below), below, 0), 0, steps)
+
+        candidates = np.empty((len(macros), 10), dtype=np.float64)
+        candidates[:, 0] = 0
+        candidates[:, 1] = steps
+        candidates[:, 2:6] = below
+        candidates[:, 6:10] = np.minimum(below + 1, steps)
+        portions = low + resolution * candidates
+        return self._deviations(macros, portions, remaining)
+
+    def _best_portions(
+        self, macros: np.ndarray, portions: np.ndarray, remaining: MacroTarget
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Vectorized scan_portion_sizes over a whole catalog.
+
+        The scan's early exit keeps the first portion scoring below
+        GOOD_ENOUGH_SCORE (every earlier one scored more), otherwise the
+        first minimum.
+
+        Returns:
+            Tuple of (portion index, float score, ambiguous) per food;
+            ambiguous foods have a score within float error of the exit
+            threshold or of another candidate portion, so the float choice
+            may differ from the Decimal one
+        """
+        count = len(macros)
+        chosen = np.zeros(count, dtype=np.int64)
+        best = np.full(count, np.inf)
+        ambiguous = np.zeros(count, dtype=bool)
+        if not len(portions):
+            # Nothing to scan; optimize_portion_size settles the result
+            ambiguous[:] = True
+            return chosen, best, ambiguous
+
+        threshold = float(self.GOOD_ENOUGH_SCORE)
+        for start in range(0, count, self.SCORING_CHUNK):
+            block = slice(start, start + self.SCORING_CHUNK)
+            scores = self.score_portions(macros[block], portions, remaining)
+            rows = np.arange(len(scores))
+
+            good_enough = scores < threshold
+            exited = good_enough.any(axis=1)
+            index = np.where(exited, good_enough.argmax(axis=1), scores.argmin(axis=1))
+            score = scores[rows, index]
+
+            off_threshold = np.abs(scores - threshold)
+            near_threshold = (off_threshold <= threshold * self.FLOAT_TOLERANCE).any(axis=1)
+            near_best = (scores <= (score + self._tolerance(score))[:, None]).sum(axis=1) > 1
+            chosen[block] = index
+            best[block] = score
+            ambiguous[block] = near_threshold | (near_best & ~exited)
+        return chosen, best, ambiguous
+
+    def _tolerance(self, scores: Union[float, np.ndarray]) -> np.ndarray:
+        tolerance: np.ndarray = self.FLOAT_TOLERANCE * np.maximum(1.0, np.abs(scores))
+        return tolerance
+
     def recommend_foods(
         self,
-        available_foods: list[Food],
+        available_foods: Union[list[Food], FoodMatrix],
         remaining: MacroTarget,
         max_recommendations: int = 5,
+        user_id: Optional[Hashable] = None,
+        max_portion_g: Decimal = Decimal("500"),
     ) -> list[FoodRecommendation]:
         """
         Recommend foods to complete remaining macros.
@@ -164,10 +534,27 @@ class MacroOptimizer:
         2. Select top N by score
         3. Ensure variety (different categories)
 
+        Step 1 runs vectorized in float64. Only foods that can still be
+        selected in steps 2-3 (within float error of the top N or of the
+        best of their category) are rescored in Decimal, so the result is
+        the same as scoring every food with optimize_portion_size.
+
+        With a FoodMatrix and the exact portion solver, foods are scored
+        by bucket (see FoodMatrix.buckets): only buckets whose lower bound
+        lets one of their foods be selected are scored, so even a first
+        request scores a fraction of a large catalog. The bounds found are
+        kept for the user (user_id None is a shared slot); a later request
+        tightens its own with the kept bounds whose targets are nearest,
+        whichever user they belong to, so after a small change of the
+        remaining macros (a logged meal, or a similar user) fewer foods
+        still are scored. Results are the same as a full pass.
+
         Args:
-            available_foods: List of foods to choose from
+            available_foods: Foods to choose from, or a FoodMatrix of them
             remaining: Remaining macro targets
             max_recommendations: Maximum number of recommendations
+            user_id: Key of the warm-start state to update
+            max_portion_g: Maximum portion of each food (default 500g)
 
         Returns:
             List of food recommendations sorted by score (best first)
@@ -175,15 +562,95 @@ class MacroOptimizer:
         if remaining.is_complete():
             return []
 
+        matrix = (
+            available_foods
+            if isinstance(available_foods, FoodMatrix)
+            else FoodMatrix(available_foods)
+        )
+        # Skip if zero calories
+        scored = np.flatnonzero(matrix.macros[:, 0] != 0)
+        if not len(scored) or max_recommendations <= 0:
+            return []
+
+        bounded = self.exact_portions and available_foods is matrix
+        if bounded:
+            rescored = self._bounded_scores(
+                matrix, remaining, max_recommendations, max_portion_g, user_id
+            )
+            if rescored is not None:
+                scored, best = rescored
+                return self._select(
+                    matrix, scored, best, None, remaining, max_recommendations, max_portion_g
+                )
+
+        if self.exact_portions:
+            # Rescoring a candidate with the solver is cheap: no grid to reuse
+            best, floors = self._solved_scores_with_floors(
+                matrix.macros[scored], remaining, max_portion_g
+            )
+            chosen = None
+            if bounded and self._lattice_steps(max_portion_g) >= 0:
+                buckets = self._food_buckets(matrix)
+                by_food = np.empty(len(matrix))
+                by_food[scored] = floors
+                floors = np.minimum.reduceat(by_food[buckets.foods], buckets.starts)
+                self._store_warm_start(user_id, matrix, max_portion_g, remaining, floors)
+        else:
+            chosen, best, ambiguous = self._best_portions(
+                matrix.macros[scored], self._portion_grid(max_portion_g), remaining
+            )
+            for position in np.flatnonzero(ambiguous):
+                _, exact = self.scan_portion_sizes(
+                    matrix.foods[scored[position]], remaining, max_portion_g
+                )
+                best[position] = float(exact)
+            chosen = np.where(ambiguous, -1, chosen)
+        return self._select(
+            matrix, scored, best, chosen, remaining, max_recommendations, max_portion_g
+        )
+
+    def _select(
+        self,
+        matrix: FoodMatrix,
+        scored: np.ndarray,
+        best: np.ndarray,
+        chosen: Optional[np.ndarray],
+        remaining: MacroTarget,
+        max_recommendations: int,
+        max_portion_g: Decimal,
+    ) -> list[FoodRecommendation]:
+        """
+        Steps 2-3 of recommend_foods from float scores.
+
+        Args:
+            matrix: Foods being recommended from
+            scored: Ascending indices of the foods that were scored
+            best: Float score per scored food; foods left out must not be
+                able to score within float error of a selectable one
+            chosen: Grid portion index per scored food (-1 to rescan), or
+                None to solve portions exactly
+        """
+        # Anything the diversity pass can pick: the top N overall and the
+        # best of each category, widened by the float error
+        kth = min(max_recommendations, len(best)) - 1
+        cutoff = np.partition(best, kth)[kth]
+        candidates = best <= cutoff + self._tolerance(cutoff)
+        codes = matrix.category_codes[scored]
+        category_best = np.full(len(matrix.categories), np.inf)
+        np.minimum.at(category_best, codes, best)
+        candidates |= best <= (category_best + self._tolerance(category_best))[codes]
+
         recommendations: list[FoodRecommendation] = []
 
-        for food in available_foods:
-            # Skip if zero calories
-            if food.calories_per_100g == 0:
-                continue
+        for position in np.flatnonzero(candidates):
+            food = matrix.foods[scored[position]]
 
             # Find optimal portion
-            portion_g, score = self.optimize_portion_size(food, remaining)
+            if chosen is None or chosen[position] < 0:
+                portion_g, score = self.optimize_portion_size(food, remaining, max_portion_g)
+            else:
+                portion_g = self.min_portion_g + self.PORTION_STEP_G * int(chosen[position])
+                score = self.calculate_macro_score(food, portion_g, remaining)
 
             # Calculate nutrition for this portion
             nutrition = food.calculate_for_portion(portion_g)
@@ -204,12 +671,233 @@ class MacroOptimizer:
 
         return diverse_recommendations[:max_recommendations]
 
+    def _food_buckets(self, matrix: FoodMatrix) -> _FoodBuckets:
+        """The matrix's buckets, built on first use."""
+        if matrix.buckets is not None:
+            return matrix.buckets
+
+        weights = np.array([float(weight) for weight in self.MACRO_WEIGHTS.values()])
+        scored = np.flatnonzero(matrix.macros[:, 0] != 0)
+        codes = matrix.category_codes[scored]
+        foods = scored[np.argsort(codes, kind="stable")]
+        segments = np.searchsorted(np.sort(codes), np.arange(len(matrix.categories) + 1))
+
+        # Halve each category at the median of the macro that widens the
+        # bound most until buckets are small (the leaves of a k-d tree)
+        pending = [
+            (start, end, category)
+            for category, (start, end) in enumerate(zip(segments[:-1], segments[1:]))
+            if end > start
+        ]
+        buckets = []
+        while pending:
+            start, end, category = pending.pop()
+            if end - start <= self.BUCKET_FOODS:
+                buckets.append((start, end, category))
+                continue
+            macros = matrix.macros[foods[start:end]]
+            column = int(np.argmax((macros.max(axis=0) - macros.min(axis=0)) * weights))
+            middle = (end - start) // 2
+            foods[start:end] = foods[start:end][np.argpartition(macros[:, column], middle)]
+            pending += [(start, start + middle, category), (start + middle, end, category)]
+
+        buckets.sort()
+        starts = np.array([start for start, _, _ in buckets], dtype=np.int64)
+        macros = matrix.macros[foods]
+        empty = np.zeros((0, 4), dtype=np.float64)
+        matrix.buckets = _FoodBuckets(
+            foods=foods,
+            starts=starts,
+            sizes=np.diff(np.append(starts, len(foods))),
+            low=np.minimum.reduceat(macros, starts) if len(foods) else empty,
+            high=np.maximum.reduceat(macros, starts) if len(foods) else empty,
+            categories=np.array([category for _, _, category in buckets], dtype=np.int64),
+        )
+        return matrix.buckets
+
+    def _bucket_bounds(
+        self, buckets: _FoodBuckets, remaining: MacroTarget, max_portion_g: Decimal
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Lower bounds of the solver score of every food in each bucket.
+
+        At portion g, a food's macro m lies in [low_m * g, high_m * g], so
+        its term is at least weight_m times the distance from the target to
+        that interval, and the penalty applies whenever low_calories * g is
+        over the calorie target. The sum is piecewise linear in g with
+        kinks where an interval end meets its target (the penalty steps up
+        at one of them), so its minimum over the portion range is at a
+        kink or at an end of the range.
+
+        Returns:
+            Tuple of (bound per bucket, the same bound without the penalty)
+        """
+        steps = self._lattice_steps(max_portion_g)
+        targets = self._targets(remaining)
+        weights = np.array([float(weight) for weight in self.MACRO_WEIGHTS.values()])
+        smallest = float(self.min_portion_g)
+        largest = smallest + float(self.PORTION_RESOLUTION_G) * steps
+        low = buckets.low / 100.0
+        high = buckets.high / 100.0
+
+        portions = np.empty((len(low), 10), dtype=np.float64)
+        portions[:, 0] = smallest
+        portions[:, 1] = largest
+        with np.errstate(divide="ignore", invalid="ignore"):
+            portions[:, 2:6] = targets / low
+            portions[:, 6:10] = targets / high
+        portions = np.clip(np.nan_to_num(portions, nan=smallest), smallest, largest)
+
+        lowest = portions[:, :, None] * low[:, None, :]
+        highest = portions[:, :, None] * high[:, None, :]
+        distance = np.maximum(np.maximum(lowest - targets, targets - highest), 0.0)
+        bounds = distance @ weights
+        floors = bounds.min(axis=1)
+        # Only where surely over: at the calorie kink itself, float error
+        # could otherwise apply the penalty to the minimum
+        over_calories = lowest[:, :, 0] > targets[0] + self._tolerance(targets[0])
+        bounds[over_calories] *= float(self.OVER_CALORIE_PENALTY)
+        return bounds.min(axis=1), floors
+
+    def _bounded_scores(
+        self,
+        matrix: FoodMatrix,
+        remaining: MacroTarget,
+        max_recommendations: int,
+        max_portion_g: Decimal,
+        user_id: Optional[Hashable],
+    ) -> Optional[tuple[np.ndarray, np.ndarray]]:
+        """
+        Float scores of every food that can still be selected.
+
+        Each bucket's bound is the larger of its macro-extremes bound and
+        the nearest kept floor minus the slack: moving the targets by delta
+        changes any portion's penalty-free score by at most
+        sum(weight * |delta|). The most promising bucket of each category
+        and the best buckets overall (enough for the top N) are scored
+        first. That bounds each category's best and the N-th best score;
+        buckets whose bound is within float error of either are then
+        scored best first, in rounds that tighten both, until none is left.
+        The bounds found are kept for the user.
+
+        Returns:
+            Tuple of (ascending food indices, scores), or None when so much
+            of the catalog would be scored that a full pass is cheaper
+        """
+        buckets = self._food_buckets(matrix)
+        if not len(buckets.starts) or self._lattice_steps(max_portion_g) < 0:
+            return None
+        bounds, floors = self._bucket_bounds(buckets, remaining, max_portion_g)
+        state = self._warm_start(matrix, max_portion_g, remaining)
+        if state is not None:
+            weights = np.array([float(weight) for weight in self.MACRO_WEIGHTS.values()])
+            slack = float(np.abs(self._targets(remaining) - state.base) @ weights)
+            slack += float(self._tolerance(slack))
+            np.maximum(floors, state.floors.astype(np.float64) - slack, out=floors)
+            np.maximum(bounds, floors, out=bounds)
+
+        selected = np.zeros(len(bounds), dtype=bool)
+        order = np.argsort(bounds, kind="stable")
+        enough = np.searchsorted(np.cumsum(buckets.sizes[order]), max_recommendations) + 1
+        selected[order[:enough]] = True
+        by_category = np.lexsort((bounds, buckets.categories))
+        leading = np.ones(len(bounds), dtype=bool)
+        leading[1:] = np.diff(buckets.categories[by_category]) != 0
+        selected[by_category[leading]] = True
+        selected = np.flatnonzero(selected)
+
+        done = np.zeros(len(bounds), dtype=bool)
+        positions = np.zeros(0, dtype=np.int64)
+        scores = np.zeros(0, dtype=np.float64)
+        exact_floors = np.zeros(0, dtype=np.float64)
+        budget = self.WARM_START_REBASE_FRACTION * len(buckets.foods)
+        while len(selected):
+            done[selected] = True
+            more = np.concatenate(
+                [
+                    np.arange(start, start + size)
+                    for start, size in zip(buckets.starts[selected], buckets.sizes[selected])
+                ]
+            )
+            if len(positions) + len(more) > budget:
+                return None
+            more_scores, more_floors = self._solved_scores_with_floors(
+                matrix.macros[buckets.foods[more]], remaining, max_portion_g
+            )
+            positions = np.concatenate([positions, more])
+            scores = np.concatenate([scores, more_scores])
+            exact_floors = np.concatenate([exact_floors, more_floors])
+
+            kth = max_recommendations - 1
+            cutoff = np.partition(scores, kth)[kth] if len(scores) > kth else np.inf
+            category_best = np.full(len(matrix.categories), np.inf)
+            scored_buckets = np.searchsorted(buckets.starts, positions, side="right") - 1
+            np.minimum.at(category_best, buckets.categories[scored_buckets], scores)
+            limits = np.maximum(cutoff, category_best)[buckets.categories]
+            reachable = bounds - self._tolerance(bounds) <= limits + self._tolerance(limits)
+            selected = np.flatnonzero(~done & reachable)
+            # Most promising first, doubling what was scored
+            selected = selected[np.argsort(bounds[selected], kind="stable")][:done.sum()]
+
+        # Scored buckets keep their exact best floor
+        floors[done] = np.inf
+        np.minimum.at(floors, scored_buckets, exact_floors)
+        self._store_warm_start(user_id, matrix, max_portion_g, remaining, floors)
+
+        foods = buckets.foods[positions]
+        order = np.argsort(foods)
+        return foods[order], scores[order]
+
+    def _warm_start(
+        self, matrix: FoodMatrix, max_portion_g: Decimal, remaining: MacroTarget
+    ) -> Optional[_WarmStart]:
+        """The kept state for this catalog and portion range nearest the targets."""
+        with self._warm_lock:
+            states = list(self._warm_starts.values())
+        states = [
+            state
+            for state in states
+            if state.matrix is matrix and state.max_portion_g == max_portion_g
+        ]
+        if not states:
+            return None
+        # Distance in score units: the slack _bounded_scores subtracts
+        weights = np.array([float(weight) for weight in self.MACRO_WEIGHTS.values()])
+        bases = np.array([state.base for state in states])
+        return states[int(np.argmin(np.abs(bases - self._targets(remaining)) @ weights))]
+
+    def _store_warm_start(
+        self,
+        user_id: Hashable,
+        matrix: FoodMatrix,
+        max_portion_g: Decimal,
+        remaining: MacroTarget,
+        floors: np.ndarray,
+    ) -> None:
+        """Keep per-bucket floors as the user's (most recently used) warm start."""
+        if self.max_warm_users <= 0:
+            return
+        # float32 halves the state; round down so floors stay lower bounds
+        narrow = floors.astype(np.float32)
+        narrow = np.where(narrow > floors, np.nextafter(narrow, np.float32(-np.inf)), narrow)
+        state = _WarmStart(
+            matrix=matrix, max_portion_g=max_portion_g, base=self._targets(remaining), floors=narrow
+        )
+        with self._warm_lock:
+            self._warm_starts[user_id] = state
+            self._warm_starts.move_to_end(user_id)
+            while len(self._warm_starts) > self.max_warm_users:
+                self._warm_starts.popitem(last=False)
+
     def _ensure_diversity(
         self, recommendations: list[FoodRecommendation], max_count: int
     ) -> list[FoodRecommendation]:
         """
         Ensure recommendations span different food categories.
 
+        The best of each category comes first; remaining slots are filled
+        with the best scores among the rest. One pass over the list.
+
         Args:
             recommendations: Sorted list of recommendations
             max_count: Maximum recommendations to return
@@ -218,27 +906,22 @@ class MacroOptimizer:
             List with diverse food categories
         """
         diverse: list[FoodRecommendation] = []
+        fill: list[FoodRecommendation] = []
         seen_categories: set[str] = set()
 
-        # First pass: one from each category
         for rec in recommendations:
             if len(diverse) >= max_count:
                 break
 
             category = rec.food.category.value
             if category not in seen_categories:
+                # First of its category
                 diverse.append(rec)
                 seen_categories.add(category)
+            elif len(fill) < max_count:
+                fill.append(rec)
 
-        # Second pass: fill remaining slots with best scores
-        if len(diverse) < max_count:
-            for rec in recommendations:
-                if len(diverse) >= max_count:
-                    break
-                if rec not in diverse:
-                    diverse.append(rec)
-
-        return diverse
+        return diverse + fill[: max_count - len(diverse)]
 
     def suggest_meal_completion(
         self,
@@ -246,63 +929,141 @@ class MacroOptimizer:
         protein_foods: list[Food],
         carb_foods: list[Food],
         fat_foods: list[Food],
+        max_items: int = 3,
+        max_portion_g: Decimal = Decimal("500"),
+        time_budget_s: Optional[float] = None,
     ) -> dict[str, Optional[FoodRecommendation]]:
         """
         Suggest a complete meal to hit remaining macros.
 
         Strategy:
-        1. Select best protein source
-        2. Select best carb source
-        3. Select best fat source
+        1. Build a greedy meal: best protein, then best carb for what is
+           left, then best fat (portions up to max_portion_g)
+        2. Search foods and portions of all groups jointly (MealSolver),
+           trying each group's MEAL_CANDIDATES_PER_GROUP best single-food
+           fits, and keep the result if it scores better
+
+        The search stops after the time budget with the best meal found so
+        far, so the result never scores worse than the greedy meal.
 
         Args:
             remaining: Remaining macro targets
             protein_foods: Available protein sources
             carb_foods: Available carb sources
             fat_foods: Available fat sources
+            max_items: Maximum number of foods in the meal
+            max_portion_g: Maximum portion of each food (default 500g)
+            time_budget_s: Search time limit (default MEAL_TIME_BUDGET_S)
 
         Returns:
-            Dict with 'protein', 'carb', 'fat' recommendations
+            Dict with 'protein', 'carb', 'fat' recommendations; each carries
+            the score of the whole meal
         """
-        meal: dict[str, Optional[FoodRecommendation]] = {
-            "protein": None,
-            "carb": None,
-            "fat": None,
+        groups = {
+            "protein": FoodMatrix(protein_foods),
+            "carb": FoodMatrix(carb_foods),
+            "fat": FoodMatrix(fat_foods),
         }
+        meal: dict[str, Optional[FoodRecommendation]] = dict.fromkeys(groups)
+        if remaining.is_complete() or max_items <= 0:
+            return meal
 
-        # 1. Select protein
-        if protein_foods:
-            protein_recs = self.recommend_foods(protein_foods, remaining, max_recommendations=1)
-            if protein_recs:
-                meal["protein"] = protein_recs[0]
-
-                # Update remaining macros
-                nutrition = protein_recs[0].nutritional_info
-                remaining = MacroTarget(
-                    calories=remaining.calories - nutrition.calories,
-                    protein_g=remaining.protein_g - nutrition.protein_g,
-                    carbs_g=remaining.carbs_g - nutrition.carbs_g,
-                    fat_g=remaining.fat_g - nutrition.fat_g,
-                )
+        chosen = self._greedy_meal(remaining, groups, max_items, max_portion_g)
+        best_score = self._meal_score(chosen, remaining)
 
-        # 2. Select carb
-        if carb_foods:
-            carb_recs = self.recommend_foods(carb_foods, remaining, max_recommendations=1)
-            if carb_recs:
-                meal["carb"] = carb_recs[0]
-
-                nutrition = carb_recs[0].nutritional_info
-                remaining = MacroTarget(
-                    calories=remaining.calories - nutrition.calories,
-                    protein_g=remaining.protein_g - nutrition.protein_g,
-                    carbs_g=remaining.carbs_g - nutrition.carbs_g,
-                    fat_g=remaining.fat_g - nutrition.fat_g,
+        candidates = {
+            key: self._rank_foods(matrix, remaining, max_portion_g)
+            for key, matrix in groups.items()
+        }
+        solver = MealSolver(
+            targets=[float(getattr(remaining, field)) for field in self.MACRO_WEIGHTS],
+            weights=[float(weight) for weight in self.MACRO_WEIGHTS.values()],
+            over_calorie_penalty=float(self.OVER_CALORIE_PENALTY),
+            min_portion_g=float(self.min_portion_g),
+            max_portion_g=float(max_portion_g),
+            resolution_g=float(self.PORTION_RESOLUTION_G),
+            max_items=max_items,
+            time_budget_s=self.MEAL_TIME_BUDGET_S if time_budget_s is None else time_budget_s,
+        )
+        plan = solver.solve(
+            [groups[key].macros[ranked] for key, ranked in candidates.items()],
+            # Float error must not let a worse meal replace the greedy one
+            upper_bound=float(best_score) * (1 + self.FLOAT_TOLERANCE),
+        )
+        if plan is not None:
+            joint: dict[str, Optional[tuple[Food, Decimal]]] = dict.fromkeys(groups)
+            for key, choice, portion in zip(candidates, plan.choices, plan.portions_g):
+                if choice is not None:
+                    steps = round(
+                        (Decimal(str(portion)) - self.min_portion_g) / self.PORTION_RESOLUTION_G
+                    )
+                    food = groups[key].foods[candidates[key][choice]]
+                    joint[key] = (food, self.min_portion_g + self.PORTION_RESOLUTION_G * steps)
+            joint_score = self._meal_score(joint, remaining)
+            if joint_score < best_score:
+                chosen, best_score = joint, joint_score
+
+        for key, item in chosen.items():
+            if item is not None:
+                food, grams = item
+                meal[key] = FoodRecommendation(
+                    food=food, grams=grams, score=best_score,
+                    nutritional_info=food.calculate_for_portion(grams),
                 )
+        return meal
 
-        # 3. Select fat source
-        if fat_foods:
-            fat_recs = self.recommend_foods(fat_foods, remaining, max_recommendations=1)
-            if fat_recs:
-                meal["fat"] = fat_recs[0]
-
+    def _greedy_meal(
+        self,
+        remaining: MacroTarget,
+        groups: dict[str, FoodMatrix],
+        max_items: int,
+        max_portion_g: Decimal,
+    ) -> dict[str, Optional[tuple[Food, Decimal]]]:
+        """Best food of each group in turn, for the macros the previous picks left."""
+        meal: dict[str, Optional[tuple[Food, Decimal]]] = dict.fromkeys(groups)
+        picked = 0
+        for key, matrix in groups.items():
+            if picked == max_items:
+                break
+            recs = self.recommend_foods(
+                matrix, remaining, max_recommendations=1, max_portion_g=max_portion_g
+            )
+            if not recs:
+                continue
+            meal[key] = (recs[0].food, recs[0].grams)
+            picked += 1
+
+            # Update remaining macros
+            nutrition = recs[0].nutritional_info
+            remaining = MacroTarget(
+                calories=remaining.calories - nutrition.calories,
+                protein_g=remaining.protein_g - nutrition.protein_g,
+                carbs_g=remaining.carbs_g - nutrition.carbs_g,
+                fat_g=remaining.fat_g - nutrition.fat_g,
+            )
         return meal
+
+    def _rank_foods(
+        self, matrix: FoodMatrix, remaining: MacroTarget, max_portion_g: Decimal
+    ) -> np.ndarray:
+        """Indices of the best single-food fits with calories (ties keep list order)."""
+        scored = np.flatnonzero(matrix.macros[:, 0] != 0)
+        if self.exact_portions:
+            scores = self._solved_scores(matrix.macros[scored], remaining, max_portion_g)
+        else:
+            _, scores, _ = self._best_portions(
+                matrix.macros[scored], self._portion_grid(max_portion_g), remaining
+            )
+        order = scored[np.argsort(scores, kind="stable")]
+        return order[:self.MEAL_CANDIDATES_PER_GROUP]
+
+    def _meal_score(
+        self, meal: dict[str, Optional[tuple[Food, Decimal]]], remaining: MacroTarget
+    ) -> Decimal:
+        """Exact score of the combined nutrients of a meal."""
+        total = NutritionalInfo(Decimal("0"), Decimal("0"), Decimal("0"), Decimal("0"))
+        for item in meal.values():
+            if item is not None:
+                food, grams = item
+                total = total + food.calculate_for_portion(grams)
+        return self.score_nutrition(total, remaining)
@@ -0,0 +1,298 @@
+"""
+Domain Service - Meal Solver
+
+Branch-and-bound search behind MacroOptimizer.suggest_meal_completion:
+chooses at most one food per group (protein, carb, fat) and the portions
+of all of them together, minimizing the macro score of the whole meal.
+
+For a fixed set of foods the score is piecewise linear in the portions:
+each macro term has a kink on the plane where the meal meets that macro's
+target, and the over-calorie penalty steps up just past the calorie
+plane. Its minimum over the portion box is therefore at a vertex of the
+arrangement formed by those planes and the box faces, and every vertex is
+enumerated (at most C(10, 3) = 120 small linear systems for three foods).
+The best vertices are then rounded to the portion lattice.
+
+Branching walks the groups in order, trying each group's foods (best
+single-food fit first) and then skipping the group; small subtrees are
+enumerated and solved as one NumPy batch. A node or meal is pruned
+when a lower bound on every meal below it cannot beat the best meal
+found so far: foods only add nutrients, so each macro deviates at least
+by its overshoot with the chosen foods at minimum portions, or by its
+shortfall with every remaining food at maximum portions.
+"""
+
+import time
+from dataclasses import dataclass
+from itertools import combinations, product
+from typing import Iterator, Optional, Sequence
+
+import numpy as np
+
+# Slack for vertices computed in float lying on the portion box faces
+_BOX_TOLERANCE = 1e-7
+
+# Nodes with at most this many meals below them are solved in one batch
+_BATCH_MEALS = 512
+
+# Best vertices per food set rounded to the lattice (all of them for a
+# single food, whose four kinks and two ends make six)
+_ROUNDED_VERTICES = 6
+
+
+@dataclass
+class MealPlan:
+    """Foods and portions chosen by the meal solver."""
+
+    choices: list[Optional[int]]  # Per group, index into its foods (None = skipped)
+    portions_g: list[Optional[float]]
+    score: float
+    complete: bool  # Search finished within the time budget
+
+
+class MealSolver:
+    """
+    Joint food and portion selection for one meal.
+
+    Works on float64 per-100g macros (calories, protein, carbs, fat) so a
+    search explores thousands of food combinations within an interactive
+    time budget; callers rescore the returned plan exactly.
+    """
+
+    def __init__(
+        self,
+        targets: Sequence[float],
+        weights: Sequence[float],
+        over_calorie_penalty: float,
+        min_portion_g: float,
+        max_portion_g: float,
+        resolution_g: float,
+        max_items: int,
+        time_budget_s: float,
+    ):
+        """
+        Initialize solver.
+
+        Args:
+            targets: Remaining calories, protein, carbs and fat
+            weights: Weight of each macro's absolute difference
+            over_calorie_penalty: Score multiplier when calories go over
+            min_portion_g: Smallest portion of a chosen food
+            max_portion_g: Largest portion of a chosen food
+            resolution_g: Lattice step of the returned portions (from min)
+            max_items: Maximum number of foods in the meal
+            time_budget_s: Wall time after which the best meal so far is returned
+        """
+        self.targets = np.asarray(targets, dtype=np.float64)
+        self.weights = np.asarray(weights, dtype=np.float64)
+        self.over_calorie_penalty = over_calorie_penalty
+        self.min_portion_g = min_portion_g
+        self.max_portion_g = max_portion_g
+        self.resolution_g = resolution_g
+        self.lattice_steps = int((max_portion_g - min_portion_g) // resolution_g)
+        self.max_items = max_items
+        self.time_budget_s = time_budget_s
+        self._tables: dict[int, tuple[np.ndarray, np.ndarray]] = {}
+
+    def score(self, per_gram: np.ndarray, portions: np.ndarray) -> np.ndarray:
+        """
+        Macro score of meals.
+
+        Args:
+            per_gram: (..., foods, 4) macros per gram of each food in the meal
+            portions: (..., meals, foods) grams of each food
+
+        Returns:
+            (..., meals) scores (lower is better)
+        """
+        diff = portions @ per_gram - self.targets
+        scores = np.abs(diff) @ self.weights
+        penalized: np.ndarray = np.where(
+            diff[..., 0] > 0, scores * self.over_calorie_penalty, scores
+        )
+        return penalized
+
+    def best_portions(self, per_gram: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Best lattice portions for sets of foods of the same size.
+
+        Args:
+            per_gram: (sets, foods, 4) macros per gram
+
+        Returns:
+            Tuple of ((sets, foods) portions, (sets,) scores)
+        """
+        sets, count = per_gram.shape[:2]
+        if count == 0:
+            return np.zeros((sets, 0)), self.score(per_gram, np.zeros((sets, 1, 0)))[:, 0]
+
+        # Planes: the four macro kinks, then g_i = min and g_i = max per food
+        chosen, corners = self._vertex_tables(count)
+        eye = np.broadcast_to(np.eye(count), (sets, count, count))
+        normals = np.concatenate([per_gram.transpose(0, 2, 1), eye, eye], axis=1)
+        offsets = np.concatenate(
+            [self.targets, np.full(count, self.min_portion_g), np.full(count, self.max_portion_g)]
+        )
+        systems = normals[:, chosen]
+        solvable = np.abs(np.linalg.det(systems)) > 1e-12
+        # Parallel planes have no vertex; solve a placeholder and drop it
+        systems[~solvable] = np.eye(count)
+        vertices = np.linalg.solve(
+            systems, np.broadcast_to(offsets[chosen], solvable.shape + (count,))[..., None]
+        )[..., 0]
+        valid = solvable & np.all(
+            (vertices >= self.min_portion_g - _BOX_TOLERANCE)
+            & (vertices <= self.max_portion_g + _BOX_TOLERANCE),
+            axis=2,
+        )
+        vertex_scores = self.score(
+            per_gram, np.clip(vertices, self.min_portion_g, self.max_portion_g)
+        )
+        vertex_scores[~valid] = np.inf
+        top = np.argsort(vertex_scores, axis=1)[:, :_ROUNDED_VERTICES]
+        vertices = np.take_along_axis(vertices, top[..., None], axis=1)
+        valid = np.take_along_axis(valid, top, axis=1)
+
+        # Round the best vertices to each neighbouring lattice point
+        steps = np.floor((vertices - self.min_portion_g) / self.resolution_g)
+        lattice = np.clip(steps[:, :, None, :] + corners, 0, self.lattice_steps).reshape(
+            sets, -1, count
+        )
+        portions = self.min_portion_g + self.resolution_g * lattice
+        scores = self.score(per_gram, portions)
+        scores[~np.repeat(valid, len(corners), axis=1)] = np.inf
+
+        best = np.argmin(scores, axis=1)
+        rows = np.arange(sets)
+        return portions[rows, best], scores[rows, best]
+
+    def _vertex_tables(self, count: int) -> tuple[np.ndarray, np.ndarray]:
+        """Plane combinations defining the vertices, and lattice rounding offsets."""
+        if count not in self._tables:
+            self._tables[count] = (
+                np.array(list(combinations(range(4 + 2 * count), count))),
+                np.array(list(product((0, 1), repeat=count))),
+            )
+        return self._tables[count]
+
+    def solve(
+        self, groups: Sequence[np.ndarray], upper_bound: float = np.inf
+    ) -> Optional[MealPlan]:
+        """
+        Search for the best meal.
+
+        Args:
+            groups: Per group, (foods, 4) per-100g macros in the order to try them
+            upper_bound: Score a meal must beat (e.g. a greedy meal's)
+
+        Returns:
+            Best meal scoring below upper_bound, or None if none was found
+        """
+        self._groups = [
+            np.asarray(group, dtype=np.float64).reshape(-1, 4) / 100.0 for group in groups
+        ]
+        # Most any single food of the group adds per gram, per macro
+        self._group_max = [
+            group.max(axis=0) if len(group) else np.zeros(4) for group in self._groups
+        ]
+        self._deadline = time.perf_counter() + self.time_budget_s
+        self._timed_out = False
+        self._best: Optional[MealPlan] = None
+        self._best_score = upper_bound
+        if self.lattice_steps >= 0:
+            self._search(0, [])
+        if self._best is not None:
+            self._best.complete = not self._timed_out
+        return self._best
+
+    def _search(self, group: int, chosen: list[tuple[int, int]]) -> None:
+        if time.perf_counter() > self._deadline:
+            self._timed_out = True
+            return
+        per_gram = sum((self._groups[g][idx] for g, idx in chosen), np.zeros(4))
+        if len(chosen) < self.max_items:
+            extra = sum(self._group_max[group:], np.zeros(4))
+        else:
+            extra = np.zeros(4)
+        if self._lower_bounds(per_gram[None], extra)[0] >= self._best_score:
+            return
+
+        meals_below = np.prod([len(foods) + 1 for foods in self._groups[group:]])
+        if meals_below <= _BATCH_MEALS:
+            self._evaluate_all(list(self._completions(group, chosen)))
+            return
+
+        for idx in range(len(self._groups[group])):
+            chosen.append((group, idx))
+            self._search(group + 1, chosen)
+            chosen.pop()
+            if self._timed_out:
+                return
+        self._search(group + 1, chosen)
+
+    def _completions(
+        self, group: int, chosen: list[tuple[int, int]]
+    ) -> Iterator[list[tuple[int, int]]]:
+        """Every meal extending the chosen foods with later groups."""
+        if group == len(self._groups) or len(chosen) == self.max_items:
+            yield list(chosen)
+            return
+        for idx in range(len(self._groups[group])):
+            chosen.append((group, idx))
+            yield from self._completions(group + 1, chosen)
+            chosen.pop()
+        yield from self._completions(group + 1, chosen)
+
+    def _lower_bounds(self, per_gram: np.ndarray, extra: np.ndarray) -> np.ndarray:
+        """
+        Scores no meal extending each food set can beat.
+
+        Args:
+            per_gram: (sets, 4) summed macros per gram of the chosen foods
+            extra: Most the foods still to be picked can add per gram
+        """
+        lowest = per_gram * self.min_portion_g
+        highest = (per_gram + extra) * self.max_portion_g
+        deviation = np.maximum(lowest - self.targets, self.targets - highest).clip(min=0)
+        bounds = deviation @ self.weights
+        penalized: np.ndarray = np.where(
+            lowest[:, 0] > self.targets[0], bounds * self.over_calorie_penalty, bounds
+        )
+        return penalized
+
+    def _evaluate_all(self, food_sets: list[list[tuple[int, int]]]) -> None:
+        """Solve the portions of complete meals that pass the bound, by size."""
+        by_size: dict[int, list[list[tuple[int, int]]]] = {}
+        for food_set in food_sets:
+            by_size.setdefault(len(food_set), []).append(food_set)
+        for sets in by_size.values():
+            totals = np.array(
+                [
+                    sum((self._groups[g][idx] for g, idx in food_set), np.zeros(4))
+                    for food_set in sets
+                ]
+            )
+            bounds = self._lower_bounds(totals, np.zeros(4))
+            self._evaluate(
+                [food_set for food_set, bound in zip(sets, bounds) if bound < self._best_score]
+            )
+
+    def _evaluate(self, food_sets: list[list[tuple[int, int]]]) -> None:
+        """Solve the portions of food sets of the same size, keeping the best."""
+        if not food_sets:
+            return
+        per_gram = np.array(
+            [[self._groups[g][idx] for g, idx in food_set] for food_set in food_sets]
+        ).reshape(len(food_sets), -1, 4)
+        portions, scores = self.best_portions(per_gram)
+        best = int(np.argmin(scores))
+        if scores[best] < self._best_score:
+            choices: list[Optional[int]] = [None] * len(self._groups)
+            grams: list[Optional[float]] = [None] * len(self._groups)
+            for (g, idx), portion in zip(food_sets[best], portions[best]):
+                choices[g] = idx
+                grams[g] = float(portion)
+            self._best = MealPlan(
+                choices=choices, portions_g=grams, score=float(scores[best]), complete=False
+            )
+            self._best_score = float(scores[best])
@@ -2,6 +2,7 @@ from passlib.context import CryptContext
 from jose import JWTError, jwt
 from datetime import datetime, timedelta
 from typing import Optional
+from fastapi import Request
 
 from ..config.settings import settings
 
@@ -41,3 +42,20 @@ def decode_access_token(token: str) -> Optional[dict]:
         return payload
     except JWTError:
         return None
+
+def get_request_user_key(request: Request) -> str:
+    """
+    Identify the caller of a request without touching the database.
+
+    Returns "user:<id>" when a valid bearer token is present, otherwise
+    "ip:<client address>".
+    """
+    authorization = request.headers.get("authorization", "")
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() == "bearer" and token:
+        payload = decode_access_token(token)
+        if payload and payload.get("sub"):
+            return f"user:{payload['sub']}"
+
+    host = request.client.host if request.client else "unknown"
+    return f"ip:{host}"
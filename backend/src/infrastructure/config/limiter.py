@@ -1,5 +1,78 @@
+from fastapi import Request
 from slowapi import Limiter
-from slowapi.util import get_remote_address
 
-# Global limiter instance to be imported across the app
-limiter = Limiter(key_func=get_remote_address)
+from .settings import settings
+from . import rate_limit_storage  # registers the sqlite:// storage scheme
+from ..auth.security import get_request_user_key
+
+
+def _storage_uri() -> str:
+    """Where rate limit counters live, from RATE_LIMIT_STORAGE"""
+    backend = settings.RATE_LIMIT_STORAGE.lower()
+    if backend == "redis":
+        return settings.REDIS_URL
+    if backend == "sqlite":
+        return f"sqlite:///{settings.RATE_LIMIT_SQLITE_PATH}"
+    if backend == "memory":
+        return "memory://"
+    raise ValueError(f"Unknown RATE_LIMIT_STORAGE: {settings.RATE_LIMIT_STORAGE}")
+
+
+# Global limiter instance to be imported across the app. Limits apply per
+# signed-in user (per IP for anonymous requests); if Redis is unreachable,
+# workers fall back to counting in memory rather than failing requests.
+limiter = Limiter(
+    key_func=get_request_user_key,
+    storage_uri=_storage_uri(),
+    in_memory_fallback_enabled=settings.RATE_LIMIT_STORAGE.lower() == "redis",
+)
+
+
+def adjust_rate_limit(request: Request, amount: int) -> None:
+    """
+    Charge (positive amount) or give back (negative amount) hits against
+    the limit that was checked for the current request.
+    """
+    view_rate_limit = getattr(request.state, "view_rate_limit", None)
+    if not view_rate_limit or amount == 0:
+        return
+
+    limit, args = view_rate_limit
+    storage = limiter.limiter.storage
+    key = limit.key_for(*args)
+    if amount > 0:
+        storage.incr(key, limit.get_expiry(), amount=amount)
+    elif hasattr(storage, "decr"):
+        storage.decr(key, amount=-amount)
+    else:
+        # Redis storage has no decr, but INCRBY takes negative amounts
+        storage.incr(key, limit.get_expiry(), amount=amount)
+
+
+def charge_rate_limit(request: Request, amount: int) -> bool:
+    """
+    Charge more hits against the current request's limit, only if they fit.
+
+    Returns False, charging nothing, when the caller has fewer than
+    amount hits left in the window.
+    """
+    view_rate_limit = getattr(request.state, "view_rate_limit", None)
+    if not view_rate_limit or amount <= 0:
+        return True
+
+    limit, args = view_rate_limit
+    count = limiter.limiter.storage.incr(limit.key_for(*args), limit.get_expiry(), amount=amount)
+    if count > limit.amount:
+        adjust_rate_limit(request, -amount)
+        return False
+    return True
+
+
+def refund_rate_limit(request: Request) -> None:
+    """
+    Give back the hit consumed by the current request.
+
+    Used when a request turns out to be free for us (e.g. served from cache),
+    so client retries don't eat the caller's quota.
+    """
+    adjust_rate_limit(request, -1)
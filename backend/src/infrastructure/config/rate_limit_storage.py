@@ -0,0 +1,118 @@
+"""SQLite-file storage for rate limit counters shared by all workers on a host"""
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+from limits.storage import Storage
+
+
+class SQLiteStorage(Storage):
+    """
+    Fixed-window rate limit counters in a SQLite file
+
+    Registered with limits under the ``sqlite:///<path>`` scheme. Every
+    gunicorn worker opening the same file shares the same counters.
+
+    Each hit is a single UPSERT ... RETURNING statement in autocommit mode
+    on a per-thread connection, so the hot path takes no Python locks and
+    SQLite holds its write lock only for that statement. The database runs
+    in WAL mode with synchronous=NORMAL: readers never block, and commits
+    do not fsync (a power loss may forget the last hits, which is fine for
+    rate limiting). Needs SQLite >= 3.35 for RETURNING.
+    """
+
+    STORAGE_SCHEME = ["sqlite"]
+
+    # Expired windows are deleted every this many hits
+    PURGE_EVERY = 1000
+
+    def __init__(self, uri: str, wrap_exceptions: bool = False, **options: str):
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+        self.path = uri[len("sqlite:///"):]
+        if not self.path or self.path == ":memory:":
+            raise ValueError("SQLite rate limit storage needs a file path to share")
+
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+
+        self._local = threading.local()
+        self._hits = 0
+        self._connection().execute(
+            "CREATE TABLE IF NOT EXISTS rate_limits ("
+            " key TEXT PRIMARY KEY,"
+            " count INTEGER NOT NULL,"
+            " expires_at REAL NOT NULL"
+            ") WITHOUT ROWID"
+        )
+
+    @property
+    def base_exceptions(self):
+        return sqlite3.Error
+
+    def _connection(self) -> sqlite3.Connection:
+        # One connection per thread, reopened after fork (gunicorn --preload)
+        conn: Optional[sqlite3.Connection] = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def incr(self, key: str, expiry: int, amount: int = 1) -> int:
+        """Add amount to the key's current window, starting a new window if it expired"""
+        now = time.time()
+        conn = self._connection()
+        (count,) = conn.execute(
+            "INSERT INTO rate_limits (key, count, expires_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET "
+            " count = CASE WHEN expires_at <= ? THEN excluded.count ELSE count + excluded.count END,"
+            " expires_at = CASE WHEN expires_at <= ? THEN excluded.expires_at ELSE expires_at END "
+            "RETURNING count",
+            (key, amount, now + expiry, now, now),
+        ).fetchone()
+
+        self._hits += 1
+        if self._hits % self.PURGE_EVERY == 0:
+            conn.execute("DELETE FROM rate_limits WHERE expires_at <= ?", (now,))
+        return count
+
+    def decr(self, key: str, amount: int = 1) -> int:
+        """Give back hits in the key's current window (never below zero)"""
+        row = self._connection().execute(
+            "UPDATE rate_limits SET count = MAX(count - ?, 0) "
+            "WHERE key = ? AND expires_at > ? RETURNING count",
+            (amount, key, time.time()),
+        ).fetchone()
+        return row[0] if row else 0
+
+    def get(self, key: str) -> int:
+        row = self._connection().execute(
+            "SELECT count FROM rate_limits WHERE key = ? AND expires_at > ?",
+            (key, time.time()),
+        ).fetchone()
+        return row[0] if row else 0
+
+    def get_expiry(self, key: str) -> float:
+        now = time.time()
+        row = self._connection().execute(
+            "SELECT expires_at FROM rate_limits WHERE key = ? AND expires_at > ?",
+            (key, now),
+        ).fetchone()
+        return row[0] if row else now
+
+    def check(self) -> bool:
+        try:
+            self._connection().execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def reset(self) -> Optional[int]:
+        return self._connection().execute("DELETE FROM rate_limits").rowcount
+
+    def clear(self, key: str) -> None:
+        self._connection().execute("DELETE FROM rate_limits WHERE key = ?", (key,))
@@ -4,6 +4,9 @@ Configuration Settings
 Centralized configuration using Pydantic Settings for type safety.
 """
 
+import os
+import tempfile
+
 from pydantic_settings import BaseSettings
 from typing import List
 
@@ -41,9 +44,71 @@ class Settings(BaseSettings):
         "https://smart-nutrition-platform.onrender.com" # Production
     ]
 
+    # Vision backend: "gemini", "fake" (offline load tests), "record" or "replay"
+    VISION_BACKEND: str = "gemini"
+    VISION_FAKE_LATENCY_MS: float = 800.0
+    VISION_FAKE_JITTER_MS: float = 0.0
+    VISION_FAKE_RESPONSE_PATH: str = ""
+    VISION_RECORDINGS_DIR: str = "vision_recordings"
+
+    # Gemini call resilience
+    GEMINI_DEADLINE_SECONDS: float = 45.0
+    GEMINI_MAX_ATTEMPTS: int = 3
+    GEMINI_BREAKER_FAILURE_THRESHOLD: int = 5
+    GEMINI_BREAKER_RESET_SECONDS: float = 30.0
+    GEMINI_HEDGE_ENABLED: bool = False
+    GEMINI_HEDGE_MIN_DELAY_SECONDS: float = 2.0
+
+    # Gemini answer format: "prompt" (verbose prompts) or "compact"
+    # (response schema with short keys); invalid answers are re-asked
+    # at most GEMINI_REPAIR_ATTEMPTS times
+    GEMINI_OUTPUT_MODE: str = "prompt"
+    GEMINI_REPAIR_ATTEMPTS: int = 1
+
+    # Upload limits for food images
+    MAX_UPLOAD_BYTES: int = 15 * 1024 * 1024
+    MAX_IMAGE_PIXELS: int = 50_000_000
+
+    # Image decoding pool (per worker)
+    IMAGE_POOL_WORKERS: int = 2
+    IMAGE_POOL_QUEUE_DEPTH: int = 16
+
+    # Batch image analysis
+    ANALYSIS_BATCH_MAX_IMAGES: int = 10
+    ANALYSIS_BATCH_CONCURRENCY: int = 3
+
+    # Food analysis result cache (per worker)
+    ANALYSIS_CACHE_MAX_ENTRIES: int = 512
+    ANALYSIS_CACHE_TTL_SECONDS: int = 3600
+    ANALYSIS_CACHE_MAX_BYTES: int = 4 * 1024 * 1024
+
+    # Food match result cache (per worker, cleared on catalog reload)
+    FOOD_MATCH_CACHE_MAX_ENTRIES: int = 4096
+
+    # Near-duplicate photo detection (perceptual hash, per worker)
+    NEAR_DUPLICATE_MAX_DISTANCE: int = 6
+    NEAR_DUPLICATE_WINDOW_SECONDS: int = 900
+    NEAR_DUPLICATE_MAX_ENTRIES: int = 100000
+
+    # Async analysis jobs (queue stored in the database, workers per process);
+    # when disabled no workers run and POST /api/analysis-jobs answers 503
+    ANALYSIS_JOBS_ENABLED: bool = True
+    ANALYSIS_JOB_WORKERS: int = 2
+    ANALYSIS_JOB_MAX_RUNNING_PER_USER: int = 1
+    ANALYSIS_JOB_MAX_PENDING_PER_USER: int = 20
+    ANALYSIS_JOB_MAX_ATTEMPTS: int = 3
+    ANALYSIS_JOB_LEASE_SECONDS: int = 120
+    ANALYSIS_JOB_RETENTION_SECONDS: int = 86400
+    ANALYSIS_JOB_MAX_WAIT_SECONDS: int = 25
+
     # Redis (optional)
     REDIS_URL: str = "redis://localhost:6379/0"
 
+    # Rate limit counters: "sqlite" (shared by the workers of one host),
+    # "redis" (REDIS_URL, shared across hosts) or "memory" (per process)
+    RATE_LIMIT_STORAGE: str = "sqlite"
+    RATE_LIMIT_SQLITE_PATH: str = os.path.join(tempfile.gettempdir(), "smart-nutrition-ratelimits.db")
+
     # Logging
     LOG_LEVEL: str = "INFO"
 
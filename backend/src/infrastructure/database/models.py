@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Text, LargeBinary, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from ..database.database import Base
@@ -115,3 +115,33 @@ class WeightHistory(Base):
 
     # Relationship
     user = relationship("User", back_populates="weight_history")
+
+
+class AnalysisJob(Base):
+    __tablename__ = "analysis_jobs"
+
+    id = Column(String, primary_key=True)                  # random hex id, also the client's handle
+    owner = Column(String, nullable=False, index=True)     # "user:<id>" or "ip:<address>"
+    status = Column(String, nullable=False, default="queued")  # queued, running, succeeded, failed
+    priority = Column(Integer, nullable=False, default=0)  # higher runs first
+
+    image = Column(LargeBinary, nullable=True)             # dropped once the job is finished
+    scaled_weight_g = Column(Integer, nullable=True)
+    additional_context = Column(Text, nullable=True)
+
+    result = Column(Text, nullable=True)                   # FoodAnalysisResponse JSON
+    error = Column(Text, nullable=True)
+    error_status = Column(Integer, nullable=True)          # HTTP status the error maps to
+
+    attempts = Column(Integer, nullable=False, default=0)
+    available_at = Column(DateTime, nullable=False, default=datetime.utcnow)  # retry backoff
+    lease_owner = Column(String, nullable=True)            # worker currently processing it
+    lease_expires_at = Column(DateTime, nullable=True)
+
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("idx_analysis_jobs_claim", "status", "priority", "available_at"),
+    )
@@ -4,10 +4,16 @@ FastAPI Main Application
 Entry point for the Smart Nutrition Platform API.
 """
 
+from contextlib import asynccontextmanager
+
+from typing import Optional
+
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse
+from starlette.datastructures import Headers
+from starlette.exceptions import HTTPException as StarletteHTTPException
 import uvicorn
 import os
 
@@ -21,9 +27,27 @@ from src.domain.services.metabolic_calculator import MetabolicCalculator
 from src.domain.services.macro_optimizer import MacroOptimizer
 from src.api.auth import router as auth_router
 from src.api.sync import router as sync_router
-from src.api.food_analysis import router as food_analysis_router
+from src.api.food_analysis import router as food_analysis_router, get_analysis_workers
+from src.api.foods import router as foods_router
 from src.infrastructure.database.database import Base, engine
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Run this process's analysis job workers while the app is up
+
+    Starting them also recovers interrupted jobs; on exit, jobs in
+    progress are handed back to the queue.
+    """
+    if settings.ANALYSIS_JOBS_ENABLED:
+        await get_analysis_workers().start()
+    try:
+        yield
+    finally:
+        await get_analysis_workers().stop()
+
+
 # Initialize FastAPI app
 app = FastAPI(
     title=settings.APP_NAME,
@@ -31,6 +55,7 @@ app = FastAPI(
     description="Advanced nutrition management platform with metabolic calculations and intelligent food optimization",
     docs_url="/docs",
     redoc_url="/redoc",
+    lifespan=lifespan,
 )
 
 # Rate Limiting
@@ -47,9 +72,89 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Form fields and multipart boundaries allowed on top of the image bytes
+UPLOAD_FORM_OVERHEAD_BYTES = 64 * 1024
+
+
+class UploadSizeLimitMiddleware:
+    """
+    Reject oversized image uploads with 413 before the multipart body is
+    spooled to disk
+
+    Uploads are refused up front from the Content-Length header; bodies sent
+    without one (chunked transfer) are counted as they are received, and the
+    request is aborted as soon as the limit is passed.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        limit = self._limit(scope)
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        content_length = Headers(scope=scope).get("content-length", "")
+        if content_length.isdigit() and int(content_length) > limit:
+            await self._reject(scope, receive, send)
+            return
+
+        received = 0
+        exceeded = False
+        response_started = False
+
+        async def limited_receive():
+            nonlocal received, exceeded
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # Abort form parsing; whatever the app makes of it is replaced by the 413
+                    exceeded = True
+                    raise StarletteHTTPException(status_code=413, detail="Image too large")
+            return message
+
+        async def tracked_send(message):
+            nonlocal response_started
+            if exceeded and not response_started:
+                return
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, tracked_send)
+        except Exception:
+            if not exceeded or response_started:
+                raise
+        if exceeded and not response_started:
+            await self._reject(scope, receive, send)
+
+    @staticmethod
+    def _limit(scope) -> Optional[int]:
+        """Largest accepted body for an image upload request, None for other requests"""
+        path = scope.get("path", "")
+        if scope["type"] != "http" or scope["method"] != "POST" or not path.startswith(
+            ("/api/analyze-food", "/api/analysis-jobs")
+        ):
+            return None
+        max_images = settings.ANALYSIS_BATCH_MAX_IMAGES if path.endswith("/batch") else 1
+        return settings.MAX_UPLOAD_BYTES * max_images + UPLOAD_FORM_OVERHEAD_BYTES
+
+    @staticmethod
+    async def _reject(scope, receive, send):
+        response = JSONResponse(status_code=413, content={"detail": "Image too large"})
+        await response(scope, receive, send)
+
+
+app.add_middleware(UploadSizeLimitMiddleware)
+
+
 # Create database tables
 Base.metadata.create_all(bind=engine)
 
+
 # Dependency instances (will be moved to proper DI later)
 metabolic_calculator = MetabolicCalculator()
 macro_optimizer = MacroOptimizer()
@@ -58,6 +163,7 @@ macro_optimizer = MacroOptimizer()
 app.include_router(auth_router)
 app.include_router(sync_router)
 app.include_router(food_analysis_router)
+app.include_router(foods_router)
 
 
 @app.get("/")
@@ -0,0 +1,141 @@
+"""Content-addressed cache for food image analysis results"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+
+from .gemini_vision import FoodAnalysisResult
+
+
+class AnalysisCache:
+    """
+    LRU cache of Gemini analysis results keyed by image content and parameters
+
+    Entries expire after a TTL and the cache is bounded both by entry count
+    and by an approximate byte budget (size of the serialized result).
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 512,
+        ttl_seconds: float = 3600,
+        max_bytes: int = 4 * 1024 * 1024,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        """
+        Initialize cache
+
+        Args:
+            max_entries: Maximum number of cached results (0 disables the cache)
+            ttl_seconds: Seconds a result stays valid after being stored
+            max_bytes: Approximate memory budget for all cached results
+            clock: Monotonic time source (injectable for tests)
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._clock = clock
+        self._lock = threading.Lock()
+        # key -> (result, size_bytes, expires_at)
+        self._entries: "OrderedDict[str, Tuple[FoodAnalysisResult, int, float]]" = OrderedDict()
+        self._total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(
+        image_bytes: bytes,
+        scaled_weight_g: Optional[int] = None,
+        additional_context: Optional[str] = None
+    ) -> str:
+        """
+        Build a cache key from image content and analysis parameters
+
+        Parameters are normalized the same way GeminiVisionService interprets
+        them, so equivalent requests share a key.
+        """
+        digest = hashlib.sha256(image_bytes).hexdigest()
+        return f'{digest}:{AnalysisCache.params_key(scaled_weight_g, additional_context)}'
+
+    @staticmethod
+    def params_key(
+        scaled_weight_g: Optional[int] = None,
+        additional_context: Optional[str] = None
+    ) -> str:
+        """Short digest of the analysis parameters (without the image)"""
+        weight = scaled_weight_g if scaled_weight_g and scaled_weight_g > 0 else 0
+        context = (additional_context or '').strip()
+        return hashlib.sha256(f'{weight}\x00{context}'.encode('utf-8')).hexdigest()[:16]
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.max_bytes > 0
+
+    def get(self, key: str) -> Optional[FoodAnalysisResult]:
+        """Return cached result for key, or None if missing or expired"""
+        if not self.enabled:
+            return None
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            result, size, expires_at = entry
+            if self._clock() >= expires_at:
+                self._remove(key)
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return result
+
+    def set(self, key: str, result: FoodAnalysisResult) -> None:
+        """Store result under key, evicting least recently used entries if needed"""
+        if not self.enabled:
+            return
+
+        size = len(result.model_dump_json()) + len(key)
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+            self._entries[key] = (result, size, self._clock() + self.ttl_seconds)
+            self._total_bytes += size
+
+            while (
+                len(self._entries) > self.max_entries
+                or self._total_bytes > self.max_bytes
+            ):
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """Drop all cached results"""
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+
+    def stats(self) -> Dict:
+        """Cache counters for monitoring"""
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'bytes': self._total_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+    def _remove(self, key: str) -> None:
+        _, size, _ = self._entries.pop(key)
+        self._total_bytes -= size
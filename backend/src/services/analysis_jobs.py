@@ -0,0 +1,519 @@
+"""Durable, database-backed queue and worker pool for food analysis jobs"""
+import asyncio
+import logging
+import os
+import secrets
+import socket
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import func, update
+from sqlalchemy.orm import defer
+
+from ..infrastructure.database.models import AnalysisJob
+
+
+logger = logging.getLogger(__name__)
+
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+FINISHED_STATUSES = (SUCCEEDED, FAILED)
+
+
+class JobQueueFullError(Exception):
+    """The owner already has the maximum number of unfinished jobs"""
+
+
+class AnalysisJobQueue:
+    """
+    Analysis jobs stored in the application database
+
+    Workers claim jobs with a conditional UPDATE (status still 'queued'),
+    so several workers and processes can share the table without row
+    locks, which keeps it working on SQLite. A claimed job carries a
+    lease that the worker renews; jobs whose lease ran out (worker crashed
+    or restarted) go back to the queue.
+
+    Claim order: highest priority first; within a priority, the owner with
+    the fewest running jobs, then the oldest job. Owners already running
+    max_running_per_owner jobs are skipped, so one user's burst of uploads
+    cannot occupy every worker.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable,
+        max_running_per_owner: int = 1,
+        max_pending_per_owner: int = 20,
+        max_attempts: int = 3,
+        lease_seconds: float = 120.0,
+        retry_backoff_seconds: float = 5.0,
+        clock: Callable[[], datetime] = datetime.utcnow
+    ):
+        self._session_factory = session_factory
+        self.max_running_per_owner = max_running_per_owner
+        self.max_pending_per_owner = max_pending_per_owner
+        self.max_attempts = max_attempts
+        self.lease_seconds = lease_seconds
+        self.retry_backoff_seconds = retry_backoff_seconds
+        self._clock = clock
+
+    def enqueue(
+        self,
+        owner: str,
+        image_bytes: bytes,
+        scaled_weight_g: Optional[int] = None,
+        additional_context: Optional[str] = None,
+        priority: int = 0
+    ) -> AnalysisJob:
+        """
+        Store a new job
+
+        Returns:
+            The queued job (detached, without its image)
+
+        Raises:
+            JobQueueFullError: If the owner has too many unfinished jobs
+        """
+        now = self._clock()
+        with self._session_factory() as db:
+            pending = db.query(func.count(AnalysisJob.id)).filter(
+                AnalysisJob.owner == owner,
+                AnalysisJob.status.in_((QUEUED, RUNNING))
+            ).scalar()
+            if pending >= self.max_pending_per_owner:
+                raise JobQueueFullError(
+                    f"Too many unfinished analysis jobs (max {self.max_pending_per_owner})"
+                )
+
+            job = AnalysisJob(
+                id=secrets.token_hex(16),
+                owner=owner,
+                status=QUEUED,
+                priority=priority,
+                image=image_bytes,
+                scaled_weight_g=scaled_weight_g,
+                additional_context=additional_context,
+                attempts=0,
+                available_at=now,
+                created_at=now
+            )
+            db.add(job)
+            db.commit()
+            return self._detached(db, job.id, with_image=False)
+
+    def claim(self, worker_id: str) -> Optional[AnalysisJob]:
+        """
+        Lease the next job for a worker
+
+        Returns:
+            The claimed job including its image, or None if nothing is runnable
+        """
+        for _ in range(5):  # Only retried when another worker won the race
+            now = self._clock()
+            with self._session_factory() as db:
+                running = dict(
+                    db.query(AnalysisJob.owner, func.count(AnalysisJob.id))
+                    .filter(AnalysisJob.status == RUNNING)
+                    .group_by(AnalysisJob.owner)
+                    .all()
+                )
+                candidates = (
+                    db.query(AnalysisJob.owner, AnalysisJob.priority, func.min(AnalysisJob.created_at))
+                    .filter(AnalysisJob.status == QUEUED, AnalysisJob.available_at <= now)
+                    .group_by(AnalysisJob.owner, AnalysisJob.priority)
+                    .all()
+                )
+                candidates = [
+                    (owner, priority, oldest) for owner, priority, oldest in candidates
+                    if running.get(owner, 0) < self.max_running_per_owner
+                ]
+                if not candidates:
+                    return None
+
+                owner, priority, _ = min(
+                    candidates,
+                    key=lambda c: (-c[1], running.get(c[0], 0), c[2])
+                )
+                job_id = (
+                    db.query(AnalysisJob.id)
+                    .filter(
+                        AnalysisJob.owner == owner,
+                        AnalysisJob.priority == priority,
+                        AnalysisJob.status == QUEUED,
+                        AnalysisJob.available_at <= now
+                    )
+                    .order_by(AnalysisJob.created_at, AnalysisJob.id)
+                    .limit(1)
+                    .scalar()
+                )
+                if job_id is None:
+                    continue
+
+                claimed = db.execute(
+                    update(AnalysisJob)
+                    .where(AnalysisJob.id == job_id, AnalysisJob.status == QUEUED)
+                    .values(
+                        status=RUNNING,
+                        lease_owner=worker_id,
+                        lease_expires_at=now + timedelta(seconds=self.lease_seconds),
+                        attempts=AnalysisJob.attempts + 1,
+                        started_at=now
+                    )
+                )
+                db.commit()
+                if claimed.rowcount == 1:
+                    return self._detached(db, job_id, with_image=True)
+        return None
+
+    def heartbeat(self, job_id: str, worker_id: str) -> bool:
+        """Extend a job's lease; False if the worker no longer holds it"""
+        return self._update_leased(
+            job_id, worker_id,
+            lease_expires_at=self._clock() + timedelta(seconds=self.lease_seconds)
+        )
+
+    def complete(self, job_id: str, worker_id: str, result_json: str) -> bool:
+        """Store a job's result; False if the worker no longer holds its lease"""
+        return self._update_leased(
+            job_id, worker_id,
+            status=SUCCEEDED,
+            result=result_json,
+            image=None,
+            lease_owner=None,
+            lease_expires_at=None,
+            finished_at=self._clock()
+        )
+
+    def fail(
+        self,
+        job_id: str,
+        worker_id: str,
+        error: str,
+        error_status: int = 500,
+        retryable: bool = False
+    ) -> Optional[str]:
+        """
+        Record a failed attempt
+
+        Retryable failures go back to the queue after a backoff, until
+        max_attempts is reached.
+
+        Returns:
+            The job's new status, or None if the worker no longer holds its lease
+        """
+        now = self._clock()
+        with self._session_factory() as db:
+            job = db.query(AnalysisJob).options(defer(AnalysisJob.image)).filter(
+                AnalysisJob.id == job_id,
+                AnalysisJob.status == RUNNING,
+                AnalysisJob.lease_owner == worker_id
+            ).first()
+            if job is None:
+                return None
+
+            values = {'error': error, 'error_status': error_status}
+            if retryable and job.attempts < self.max_attempts:
+                backoff = self.retry_backoff_seconds * (2 ** (job.attempts - 1))
+                values.update(status=QUEUED, available_at=now + timedelta(seconds=backoff))
+            else:
+                values.update(status=FAILED, image=None, finished_at=now)
+            values.update(lease_owner=None, lease_expires_at=None)
+
+            db.execute(update(AnalysisJob).where(AnalysisJob.id == job_id).values(**values))
+            db.commit()
+            return values['status']
+
+    def release(self, job_id: str, worker_id: str) -> bool:
+        """Hand a job back to the queue untouched (graceful shutdown)"""
+        return self._update_leased(
+            job_id, worker_id,
+            status=QUEUED,
+            attempts=AnalysisJob.attempts - 1,
+            lease_owner=None,
+            lease_expires_at=None
+        )
+
+    def recover_expired(self) -> int:
+        """
+        Requeue jobs whose worker stopped renewing its lease
+
+        Jobs that already used all their attempts are failed instead, so a
+        photo that crashes workers cannot loop forever.
+
+        Returns:
+            Number of jobs recovered
+        """
+        now = self._clock()
+        with self._session_factory() as db:
+            expired = (AnalysisJob.status == RUNNING, AnalysisJob.lease_expires_at < now)
+            failed = db.execute(
+                update(AnalysisJob)
+                .where(*expired, AnalysisJob.attempts >= self.max_attempts)
+                .values(
+                    status=FAILED,
+                    error="Analysis was interrupted too many times",
+                    error_status=500,
+                    image=None,
+                    lease_owner=None,
+                    lease_expires_at=None,
+                    finished_at=now
+                )
+            ).rowcount
+            requeued = db.execute(
+                update(AnalysisJob)
+                .where(*expired)
+                .values(status=QUEUED, available_at=now, lease_owner=None, lease_expires_at=None)
+            ).rowcount
+            db.commit()
+        return failed + requeued
+
+    def purge_finished(self, older_than_seconds: float) -> int:
+        """Delete finished jobs older than the retention period"""
+        cutoff = self._clock() - timedelta(seconds=older_than_seconds)
+        with self._session_factory() as db:
+            deleted = db.query(AnalysisJob).filter(
+                AnalysisJob.status.in_(FINISHED_STATUSES),
+                AnalysisJob.finished_at < cutoff
+            ).delete(synchronize_session=False)
+            db.commit()
+        return deleted
+
+    def get(self, job_id: str) -> Optional[AnalysisJob]:
+        """Look up a job (detached, without its image)"""
+        with self._session_factory() as db:
+            return self._detached(db, job_id, with_image=False)
+
+    def stats(self) -> Dict:
+        """Number of jobs per status"""
+        with self._session_factory() as db:
+            counts = dict(
+                db.query(AnalysisJob.status, func.count(AnalysisJob.id))
+                .group_by(AnalysisJob.status)
+                .all()
+            )
+        return {status: counts.get(status, 0) for status in (QUEUED, RUNNING, SUCCEEDED, FAILED)}
+
+    def _update_leased(self, job_id: str, worker_id: str, **values) -> bool:
+        with self._session_factory() as db:
+            updated = db.execute(
+                update(AnalysisJob)
+                .where(
+                    AnalysisJob.id == job_id,
+                    AnalysisJob.status == RUNNING,
+                    AnalysisJob.lease_owner == worker_id
+                )
+                .values(**values)
+            ).rowcount
+            db.commit()
+        return updated == 1
+
+    @staticmethod
+    def _detached(db, job_id: str, with_image: bool) -> Optional[AnalysisJob]:
+        query = db.query(AnalysisJob)
+        if not with_image:
+            query = query.options(defer(AnalysisJob.image, raiseload=True))
+        job = query.filter(AnalysisJob.id == job_id).first()
+        if job is not None:
+            db.expunge(job)
+        return job
+
+
+class AnalysisWorkerPool:
+    """
+    Bounded set of asyncio workers processing jobs from an AnalysisJobQueue
+
+    Each process runs its own pool; all pools share the database queue.
+    While a job runs its lease is renewed every third of the lease time.
+    On shutdown, jobs in progress are handed back to the queue; if the
+    process dies instead, their leases expire and any pool recovers them.
+    """
+
+    def __init__(
+        self,
+        queue: AnalysisJobQueue,
+        handler: Callable[[AnalysisJob], Awaitable[str]],
+        concurrency: int = 2,
+        poll_interval_seconds: float = 1.0,
+        retention_seconds: float = 86400.0,
+        describe_error: Optional[Callable[[Exception], Tuple[int, str]]] = None,
+        is_retryable: Optional[Callable[[Exception], bool]] = None
+    ):
+        """
+        Args:
+            queue: Job queue to work on
+            handler: Coroutine function processing a job, returning its result JSON
+            concurrency: Number of jobs processed at once by this pool
+            poll_interval_seconds: How often idle workers check the queue
+            retention_seconds: How long finished jobs are kept
+            describe_error: Maps a handler error to (HTTP status, message)
+            is_retryable: Whether a handler error is worth another attempt
+        """
+        self.queue = queue
+        self.handler = handler
+        self.concurrency = max(1, concurrency)
+        self.poll_interval_seconds = poll_interval_seconds
+        self.retention_seconds = retention_seconds
+        self.describe_error = describe_error or (lambda exc: (500, str(exc)))
+        self.is_retryable = is_retryable or (lambda exc: False)
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{secrets.token_hex(4)}"
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._finished: Dict[str, asyncio.Event] = {}
+        # Long polls in progress per job; its event is dropped with the last
+        self._waiters: Dict[str, int] = {}
+        self.processed = 0
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    async def start(self) -> None:
+        """Recover interrupted jobs and start the workers"""
+        if self._tasks:
+            return
+        self._wakeup = asyncio.Event()
+        recovered = await asyncio.to_thread(self.queue.recover_expired)
+        if recovered:
+            logger.info("Recovered %d interrupted analysis jobs", recovered)
+        self._tasks = [
+            asyncio.ensure_future(self._worker_loop()) for _ in range(self.concurrency)
+        ]
+        self._tasks.append(asyncio.ensure_future(self._maintenance_loop()))
+
+    async def stop(self) -> None:
+        """Stop the workers, handing jobs in progress back to the queue"""
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def notify(self) -> None:
+        """Wake idle workers (a job was just queued)"""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def wait_for_job(self, job_id: str, timeout: float) -> Optional[AnalysisJob]:
+        """
+        Long-poll a job until it is finished or the timeout elapses
+
+        Jobs finished by this process wake the waiter immediately; jobs
+        finished by another process are seen at the next poll.
+
+        Returns:
+            The job in its latest state, or None if it does not exist
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + max(0.0, timeout)
+
+        self._waiters[job_id] = self._waiters.get(job_id, 0) + 1
+        try:
+            while True:
+                job = await asyncio.to_thread(self.queue.get, job_id)
+                remaining = deadline - loop.time()
+                if job is None or job.status in FINISHED_STATUSES or remaining <= 0:
+                    return job
+
+                finished = self._finished.setdefault(job_id, asyncio.Event())
+                try:
+                    await asyncio.wait_for(
+                        finished.wait(), min(remaining, self.poll_interval_seconds)
+                    )
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            # Jobs run by another process never pop their event here
+            self._waiters[job_id] -= 1
+            if not self._waiters[job_id]:
+                del self._waiters[job_id]
+                self._finished.pop(job_id, None)
+
+    async def _worker_loop(self) -> None:
+        while True:
+            try:
+                job = await self._claim()
+            except Exception:
+                logger.exception("Failed to claim analysis job")
+                job = None
+
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval_seconds)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            try:
+                await self._run_job(job)
+            except Exception:
+                # E.g. the database failed while recording the outcome; the
+                # lease expires and the job is recovered, the worker goes on
+                logger.exception("Failed to finish analysis job %s", job.id)
+
+    async def _claim(self) -> Optional[AnalysisJob]:
+        claim = asyncio.ensure_future(asyncio.to_thread(self.queue.claim, self.worker_id))
+        try:
+            return await asyncio.shield(claim)
+        except asyncio.CancelledError:
+            # Shutting down: the claim still runs in its thread, so hand
+            # back whatever it takes instead of leaving it leased to us
+            try:
+                job = await claim
+            except Exception:
+                job = None
+            if job is not None:
+                await asyncio.to_thread(self.queue.release, job.id, self.worker_id)
+            raise
+
+    async def _run_job(self, job: AnalysisJob) -> None:
+        heartbeat = asyncio.ensure_future(self._heartbeat(job.id))
+        try:
+            result_json = await self.handler(job)
+        except asyncio.CancelledError:
+            # Shutting down: let another worker pick it up right away
+            await asyncio.to_thread(self.queue.release, job.id, self.worker_id)
+            raise
+        except Exception as exc:
+            status_code, message = self.describe_error(exc)
+            await asyncio.to_thread(
+                self.queue.fail, job.id, self.worker_id, message,
+                status_code, self.is_retryable(exc)
+            )
+        else:
+            await asyncio.to_thread(self.queue.complete, job.id, self.worker_id, result_json)
+        finally:
+            heartbeat.cancel()
+            self.processed += 1
+
+        finished = self._finished.pop(job.id, None)
+        if finished is not None:
+            finished.set()
+
+    async def _heartbeat(self, job_id: str) -> None:
+        while True:
+            await asyncio.sleep(self.queue.lease_seconds / 3)
+            if not await asyncio.to_thread(self.queue.heartbeat, job_id, self.worker_id):
+                logger.warning("Lost lease on analysis job %s", job_id)
+                return
+
+    async def _maintenance_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.queue.lease_seconds / 2)
+            try:
+                await asyncio.to_thread(self.queue.recover_expired)
+                await asyncio.to_thread(self.queue.purge_finished, self.retention_seconds)
+            except Exception:
+                logger.exception("Analysis job maintenance failed")
+
+    def stats(self) -> Dict:
+        """Pool state and per-status job counts for monitoring"""
+        return {
+            'worker_id': self.worker_id,
+            'running': self.running,
+            'concurrency': self.concurrency,
+            'processed': self.processed,
+            'jobs': self.queue.stats(),
+        }
@@ -0,0 +1,65 @@
+"""Compact, schema-constrained layout for the model's food analysis answer"""
+from typing import Dict
+
+
+# Short key -> FoodAnalysisResult / DetectedFood field
+COMPACT_FOOD_KEYS = {
+    'n': 'name',
+    'g': 'estimated_grams',
+    'p': 'preparation',
+    'c': 'confidence',
+}
+COMPACT_FOODS_KEY = 'f'
+COMPACT_DESCRIPTION_KEY = 'd'
+
+# Sent as response_schema together with response_mime_type=application/json.
+# Foods come first so streamed answers can be parsed before the description.
+COMPACT_RESPONSE_SCHEMA = {
+    'type': 'OBJECT',
+    'properties': {
+        COMPACT_FOODS_KEY: {
+            'type': 'ARRAY',
+            'items': {
+                'type': 'OBJECT',
+                'properties': {
+                    'n': {'type': 'STRING'},
+                    'g': {'type': 'INTEGER'},
+                    'p': {'type': 'STRING'},
+                    'c': {'type': 'NUMBER'},
+                },
+                'required': ['n', 'g', 'p', 'c'],
+                'propertyOrdering': ['n', 'g', 'p', 'c'],
+            },
+        },
+        COMPACT_DESCRIPTION_KEY: {'type': 'STRING'},
+    },
+    'required': [COMPACT_FOODS_KEY, COMPACT_DESCRIPTION_KEY],
+    'propertyOrdering': [COMPACT_FOODS_KEY, COMPACT_DESCRIPTION_KEY],
+}
+
+
+def expand_food(item: Dict) -> Dict:
+    """Compact food item -> DetectedFood fields (unknown keys are kept as-is)"""
+    return {COMPACT_FOOD_KEYS.get(key, key): value for key, value in item.items()}
+
+
+def expand_analysis(data: Dict) -> Dict:
+    """Compact answer -> FoodAnalysisResult fields; verbose answers pass through"""
+    if COMPACT_FOODS_KEY not in data:
+        return data
+    return {
+        'foods': [expand_food(item) for item in data[COMPACT_FOODS_KEY]],
+        'meal_description': data.get(COMPACT_DESCRIPTION_KEY, ''),
+    }
+
+
+def compact_analysis(data: Dict) -> Dict:
+    """FoodAnalysisResult fields -> compact answer"""
+    verbose_keys = {field: key for key, field in COMPACT_FOOD_KEYS.items()}
+    return {
+        COMPACT_FOODS_KEY: [
+            {verbose_keys.get(key, key): value for key, value in food.items()}
+            for food in data['foods']
+        ],
+        COMPACT_DESCRIPTION_KEY: data['meal_description'],
+    }
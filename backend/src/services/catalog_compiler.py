@@ -0,0 +1,414 @@
+"""
+Build step that compiles the frontend food data into the backend catalog
+
+Parses the exported literals of frontend/src/data/foods.ts and
+recipes.ts, adds the backend-only generic foods of catalog_supplement.json
+("Papa", "Pan", "Huevos": names Gemini reports that the frontend only has
+in specific forms), validates every entry with the Food entity rules and
+writes the runtime catalog (food_database.json, readable fallback) plus
+the compiled, memory-mapped catalog with its search indexes (catalog_file).
+
+A manifest records the content hashes of the sources and of this module;
+when they (and the catalog format version) are unchanged and the outputs
+exist, the build is skipped. The manifest and food_catalog.bin are not
+committed, so a fresh checkout (CI, a deploy) always compiles; the skip
+only saves repeated builds in the same output directory. Every output is
+replaced atomically, so a failed build leaves the previous ones intact.
+
+    python -m src.services.catalog_compiler [--force]
+"""
+import hashlib
+import json
+import os
+import re
+import sys
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from ..domain.entities.food import Food, FoodCategory
+from .catalog_file import FORMAT_VERSION, database_hash, open_atomic, write_catalog_file
+from .text_normalization import fold
+
+
+BACKEND_DIR = os.path.normpath(os.path.join(os.path.dirname(__file__), '..', '..'))
+FRONTEND_DATA_DIR = os.path.normpath(os.path.join(BACKEND_DIR, '..', 'frontend', 'src', 'data'))
+DEFAULT_SOURCES = (
+    os.path.join(FRONTEND_DATA_DIR, 'foods.ts'),
+    os.path.join(FRONTEND_DATA_DIR, 'recipes.ts'),
+    os.path.join(BACKEND_DIR, 'catalog_supplement.json'),
+)
+
+DATABASE_FILENAME = 'food_database.json'
+CATALOG_FILENAME = 'food_catalog.bin'
+MANIFEST_FILENAME = 'food_catalog.manifest.json'
+
+# Frontend category -> Food entity category (used for validation only;
+# the catalog keeps the frontend names, which the matcher boosts rely on)
+ENTITY_CATEGORIES = {
+    'protein': FoodCategory.PROTEIN,
+    'carbs': FoodCategory.CARBS,
+    'fats': FoodCategory.FATS,
+    'vegetables': FoodCategory.VEGETABLES,
+    'fruits': FoodCategory.FRUITS,
+    'dairy': FoodCategory.DAIRY,
+    'snacks': FoodCategory.PREPARED_DISHES,
+    'peruvian': FoodCategory.PREPARED_DISHES,
+    'recipe': FoodCategory.PREPARED_DISHES,
+}
+
+# Mixed categories also get "protein" when protein supplies at least this
+# share of the calories (lomo saltado, queso, barra de proteína), as the
+# hand-written catalog did; the matcher boosts those for "a la plancha"
+MIXED_CATEGORIES = ('peruvian', 'recipe', 'dairy', 'snacks')
+PROTEIN_CALORIE_SHARE = 0.2
+
+
+class CatalogBuildError(Exception):
+    """Raised when a source cannot be parsed or holds invalid foods"""
+
+
+# ---------------------------------------------------------------------------
+# JavaScript literal parsing
+# ---------------------------------------------------------------------------
+
+_TOKEN = re.compile(r'''
+    (?P<space>\s+|//[^\n]*|/\*.*?\*/)
+  | (?P<string>'(?:[^'\\\n]|\\.)*'|"(?:[^"\\\n]|\\.)*"|`(?:[^`\\$]|\\.)*`)
+  | (?P<number>-?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)
+  | (?P<name>[A-Za-z_$][\w$]*)
+  | (?P<punct>[{}\[\]:,])
+''', re.VERBOSE | re.DOTALL)
+
+_ESCAPES = {'n': '\n', 't': '\t', 'r': '\r', 'b': '\b', 'f': '\f', 'v': '\v', '0': '\0'}
+
+_NAMED_VALUES = {'true': True, 'false': False, 'null': None, 'undefined': None}
+
+_EXPORT = re.compile(r'export\s+const\s+([A-Za-z_$][\w$]*)\s*(?::[^=;]+)?=\s*')
+
+
+def _unescape(body: str) -> str:
+    def replace(match: 're.Match') -> str:
+        escaped = match.group(1)
+        if escaped[0] == 'u':
+            return chr(int(escaped[1:], 16))
+        return _ESCAPES.get(escaped, escaped)
+    return re.sub(r'\\(u[0-9a-fA-F]{4}|.)', replace, body, flags=re.DOTALL)
+
+
+class _LiteralParser:
+    """Recursive-descent parser for JSON-like JavaScript literals"""
+
+    def __init__(self, source: str, pos: int):
+        self.source = source
+        self.pos = pos
+
+    def error(self, message: str) -> CatalogBuildError:
+        line = self.source.count('\n', 0, self.pos) + 1
+        return CatalogBuildError(f'line {line}: {message}')
+
+    def next_token(self) -> Tuple[str, str]:
+        while True:
+            match = _TOKEN.match(self.source, self.pos)
+            if not match:
+                snippet = self.source[self.pos:self.pos + 20]
+                raise self.error(f'unsupported syntax near {snippet!r}')
+            self.pos = match.end()
+            if match.lastgroup != 'space':
+                return match.lastgroup, match.group()
+
+    def peek(self) -> Tuple[str, str]:
+        pos = self.pos
+        token = self.next_token()
+        self.pos = pos
+        return token
+
+    def expect(self, punct: str) -> None:
+        kind, text = self.next_token()
+        if text != punct:
+            raise self.error(f'expected {punct!r}, found {text!r}')
+
+    def value(self) -> Any:
+        kind, text = self.next_token()
+        if text == '{':
+            return self.object()
+        if text == '[':
+            return self.array()
+        if kind == 'string':
+            return _unescape(text[1:-1])
+        if kind == 'number':
+            number = float(text)
+            return int(number) if number.is_integer() and re.fullmatch(r'-?\d+', text) else number
+        if kind == 'name' and text in _NAMED_VALUES:
+            return _NAMED_VALUES[text]
+        raise self.error(f'unsupported value {text!r} (only literals can be compiled)')
+
+    def object(self) -> Dict[str, Any]:
+        result = {}
+        while True:
+            kind, text = self.next_token()
+            if text == '}':
+                return result
+            if kind == 'string':
+                key = _unescape(text[1:-1])
+            elif kind in ('name', 'number'):
+                key = text
+            else:
+                raise self.error(f'expected a property name, found {text!r}')
+            self.expect(':')
+            result[key] = self.value()
+            kind, text = self.next_token()
+            if text == '}':
+                return result
+            if text != ',':
+                raise self.error(f"expected ',' or '}}', found {text!r}")
+
+    def array(self) -> List[Any]:
+        result = []
+        while True:
+            if self.peek()[1] == ']':
+                self.next_token()
+                return result
+            result.append(self.value())
+            kind, text = self.next_token()
+            if text == ']':
+                return result
+            if text != ',':
+                raise self.error(f"expected ',' or ']', found {text!r}")
+
+
+def parse_ts_exports(source: str) -> Dict[str, Any]:
+    """
+    Values of the `export const name = <literal>` declarations of a TS module
+
+    Type annotations are skipped; exports whose value is not an array or
+    object literal (functions, expressions) are ignored.
+
+    Raises:
+        CatalogBuildError: If a literal uses syntax the parser does not support
+    """
+    exports = {}
+    for match in _EXPORT.finditer(source):
+        if source[match.end():match.end() + 1] not in ('[', '{'):
+            continue
+        exports[match.group(1)] = _LiteralParser(source, match.end()).value()
+    return exports
+
+
+# ---------------------------------------------------------------------------
+# Source records -> catalog records
+# ---------------------------------------------------------------------------
+
+def _categories(primary: str, calories: float, protein: float) -> List[str]:
+    categories = [primary]
+    if primary in MIXED_CATEGORIES and calories > 0 and protein * 4 >= PROTEIN_CALORIE_SHARE * calories:
+        categories.append('protein')
+    return categories
+
+
+def foods_from_ts(items: Sequence[Dict]) -> List[Dict]:
+    """Catalog records for the FoodItem entries of foods.ts"""
+    records = []
+    for item in items:
+        records.append({
+            'id': item['id'],
+            'name': item['name'],
+            'category': _categories(item['category'], item['caloriesPer100g'], item['proteinPer100g']),
+            'emoji': item.get('emoji', ''),
+            'calories': item['caloriesPer100g'],
+            'protein': item['proteinPer100g'],
+            'carbs': item['carbsPer100g'],
+            'fat': item['fatPer100g'],
+            'fiber': item.get('fiberPer100g', 0),
+        })
+    return records
+
+
+def recipes_from_ts(recipes: Sequence[Dict]) -> List[Dict]:
+    """Catalog records for the recipes of recipes.ts, totals scaled to 100 g"""
+    records = []
+    for recipe in recipes:
+        grams = sum(ingredient['grams'] for ingredient in recipe['ingredients'])
+        if grams <= 0:
+            raise CatalogBuildError(f"recipe {recipe['id']}: ingredients weigh {grams} g")
+        scale = 100 / grams
+        calories = round(recipe['totalCalories'] * scale, 1)
+        protein = round(recipe['totalProtein'] * scale, 1)
+        records.append({
+            'id': recipe['id'],
+            'name': recipe['name'],
+            'category': _categories('recipe', calories, protein),
+            'emoji': recipe.get('emoji', ''),
+            'calories': calories,
+            'protein': protein,
+            'carbs': round(recipe['totalCarbs'] * scale, 1),
+            'fat': round(recipe['totalFat'] * scale, 1),
+            'fiber': 0,
+        })
+    return records
+
+
+def validate_records(records: Sequence[Dict]) -> None:
+    """
+    Check every record with the Food entity rules and for unique ids
+
+    Raises:
+        CatalogBuildError: Listing every invalid record
+    """
+    problems = []
+    seen = set()
+    for record in records:
+        label = record.get('id') or record.get('name') or '<unnamed>'
+        if record['id'] in seen:
+            problems.append(f'{label}: duplicate id')
+        seen.add(record['id'])
+        if not record['name'].strip():
+            problems.append(f'{label}: empty name')
+        try:
+            category = ENTITY_CATEGORIES[record['category'][0]]
+            values = [
+                Decimal(str(record[field])) for field in ('calories', 'protein', 'carbs', 'fat', 'fiber')
+            ]
+            Food(
+                name=record['name'],
+                category=category,
+                calories_per_100g=values[0],
+                protein_g=values[1],
+                carbs_g=values[2],
+                fat_g=values[3],
+                fiber_g=values[4],
+                source='frontend',
+            )
+        except KeyError as e:
+            problems.append(f'{label}: unknown category or missing field {e}')
+        except (ValueError, ArithmeticError) as e:
+            problems.append(f'{label}: {e}')
+    if problems:
+        raise CatalogBuildError('Invalid catalog entries:\n  ' + '\n  '.join(problems))
+
+
+# ---------------------------------------------------------------------------
+# Incremental build
+# ---------------------------------------------------------------------------
+
+@dataclass
+class CompileResult:
+    """Outcome of compile_catalog"""
+    compiled: bool
+    foods: int
+    manifest: Dict
+
+
+def _source_hashes(sources: Sequence[str]) -> Dict[str, str]:
+    hashes = {}
+    for path in sources:
+        with open(path, 'rb') as f:
+            hashes[os.path.basename(path)] = hashlib.sha256(f.read()).hexdigest()
+    return hashes
+
+
+def _compiler_hash() -> str:
+    """Changes to how records are derived must invalidate previous builds"""
+    with open(__file__, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def load_records(sources: Sequence[str]) -> List[Dict]:
+    """
+    Parse and validate the catalog records of the given sources
+
+    A TypeScript source contributes its `foodDatabase` and/or `recipes`
+    export. A JSON source is a supplement of records in the catalog format;
+    its entries are skipped when an earlier source has the same id or
+    (folded) name.
+
+    Raises:
+        CatalogBuildError: If a source cannot be parsed or has invalid entries
+    """
+    records: List[Dict] = []
+    for path in sources:
+        with open(path, 'r', encoding='utf-8') as f:
+            source = f.read()
+        try:
+            if path.endswith('.json'):
+                ids = {record['id'] for record in records}
+                names = {fold(record['name']) for record in records}
+                records.extend(
+                    {**record, 'fiber': record.get('fiber', 0)} for record in json.loads(source)
+                    if record['id'] not in ids and fold(record['name']) not in names
+                )
+                continue
+            exports = parse_ts_exports(source)
+            if 'foodDatabase' in exports:
+                records.extend(foods_from_ts(exports['foodDatabase']))
+            if 'recipes' in exports:
+                records.extend(recipes_from_ts(exports['recipes']))
+        except (CatalogBuildError, KeyError, TypeError, ValueError) as e:
+            raise CatalogBuildError(f'{path}: {e}') from e
+    validate_records(records)
+    return records
+
+
+def compile_catalog(
+    sources: Sequence[str] = DEFAULT_SOURCES,
+    output_dir: str = BACKEND_DIR,
+    force: bool = False
+) -> CompileResult:
+    """
+    Compile the sources into food_database.json and food_catalog.bin
+
+    Args:
+        sources: TypeScript data modules
+        output_dir: Directory for the outputs and the manifest
+        force: Rebuild even if the manifest says the outputs are current
+
+    Returns:
+        CompileResult (compiled is False when the build was skipped)
+
+    Raises:
+        CatalogBuildError: If a source cannot be parsed or has invalid entries
+    """
+    manifest = {
+        'compiler': _compiler_hash(),
+        'format_version': FORMAT_VERSION,
+        'sources': _source_hashes(sources),
+    }
+    manifest_path = os.path.join(output_dir, MANIFEST_FILENAME)
+    database_path = os.path.join(output_dir, DATABASE_FILENAME)
+    catalog_path = os.path.join(output_dir, CATALOG_FILENAME)
+
+    previous: Optional[Dict] = None
+    if os.path.exists(manifest_path):
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            previous = json.load(f)
+    if (
+        not force
+        and previous is not None
+        and {key: previous.get(key) for key in manifest} == manifest
+        and os.path.exists(database_path)
+        and os.path.exists(catalog_path)
+    ):
+        return CompileResult(compiled=False, foods=previous.get('foods', 0), manifest=previous)
+
+    records = load_records(sources)
+    with open_atomic(database_path, 'w', encoding='utf-8') as f:
+        json.dump(records, f, ensure_ascii=False, indent=2)
+    manifest['database'] = database_hash(database_path)
+    write_catalog_file(catalog_path, records, metadata=manifest)
+
+    # Written last: an interrupted build is redone next time
+    manifest['foods'] = len(records)
+    with open_atomic(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    return CompileResult(compiled=True, foods=len(records), manifest=manifest)
+
+
+if __name__ == '__main__':
+    try:
+        result = compile_catalog(force='--force' in sys.argv[1:])
+    except CatalogBuildError as e:
+        sys.exit(f'Catalog build failed: {e}')
+    if result.compiled:
+        print(f'Compiled {result.foods} foods into {DATABASE_FILENAME} and {CATALOG_FILENAME}')
+    else:
+        print(f'Food catalog is up to date ({result.foods} foods)')
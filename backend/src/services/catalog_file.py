@@ -0,0 +1,254 @@
+"""
+Compiled binary food catalog, memory-mapped by every worker
+
+Layout (little-endian):
+
+    header    magic, format version, CRC-32 of everything after the
+              header, offset and length of the section table
+    table     JSON: name, dtype, shape and offset of every section, plus
+              free-form metadata
+    sections  raw array bytes, each 64-byte aligned
+
+Sections hold the FoodCatalog columns ('catalog.*') and the indexes built
+for them ('matcher.*', 'search.*'). Opening a file maps it read-only and
+wraps the sections with np.frombuffer, so nothing is parsed or copied:
+the pages live in the OS page cache and are shared by every process that
+maps the file, and only the small Python-side tables (trigram dict,
+spelling vocabulary) are rebuilt per worker.
+
+The metadata records the SHA-256 of the food_database.json the file was
+built from ('database'), so a loader can tell when the JSON has been
+edited or rebuilt since and the compiled file is stale.
+"""
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import zlib
+from contextlib import contextmanager
+from typing import IO, Dict, Iterable, Iterator, Optional, Tuple
+
+import numpy as np
+
+from .food_catalog import FoodCatalog, sub_arrays
+from .food_matcher import FoodMatcher
+from .food_search import FoodSearchIndex
+
+
+MAGIC = b'SNPCATLG'
+
+# Bump whenever a section's layout or the way an index is built changes
+# (tokenization, trigram padding, spelling deletes...): files of another
+# version are rejected and must be recompiled.
+FORMAT_VERSION = 2
+
+# Permissions of written files: mkstemp creates them 0600, but workers may
+# run as another user than the build and must be able to map them
+FILE_MODE = 0o644
+
+# magic, version, crc32, table offset, table length
+_HEADER = struct.Struct('<8sIIQQ')
+_ALIGNMENT = 64
+
+
+class CatalogFileError(Exception):
+    """Raised when a compiled catalog file is missing, corrupt, stale or of another version"""
+
+
+def database_hash(path: str) -> str:
+    """SHA-256 of a food_database.json, as recorded in the catalog metadata"""
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def _aligned(offset: int) -> int:
+    return -(-offset // _ALIGNMENT) * _ALIGNMENT
+
+
+@contextmanager
+def open_atomic(path: str, mode: str = 'wb', **kwargs) -> Iterator[IO]:
+    """
+    Open a temporary file next to path that replaces it once written
+
+    Readers see either the old or the complete new file; if the block
+    raises, path is left untouched. The file gets FILE_MODE.
+
+    Args:
+        path: Destination file
+        mode: Write mode ('wb', or 'w' with an encoding)
+        **kwargs: Passed to open (e.g. encoding)
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.catalog-', suffix='.tmp')
+    try:
+        with os.fdopen(fd, mode, **kwargs) as f:
+            yield f
+        os.chmod(tmp_path, FILE_MODE)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def write_catalog_file(
+    path: str,
+    food_database: Iterable[Dict],
+    metadata: Optional[Dict] = None
+) -> FoodCatalog:
+    """
+    Build the catalog and its indexes and write them as one binary file
+
+    The file is written next to its destination and renamed over it, so
+    workers opening it concurrently see either the old or the new file.
+
+    Args:
+        path: Destination file
+        food_database: Food items (food_database.json format)
+        metadata: JSON-serializable values stored with the file
+
+    Returns:
+        The freshly built catalog
+    """
+    catalog = FoodCatalog.from_records(food_database)
+    arrays = {f'catalog.{name}': array for name, array in catalog.export_arrays().items()}
+    arrays.update(
+        (f'matcher.{name}', array) for name, array in FoodMatcher(catalog, cache_entries=0).export_arrays().items()
+    )
+    arrays.update(
+        (f'search.{name}', array) for name, array in FoodSearchIndex(catalog).export_arrays().items()
+    )
+
+    sections = []
+    offset = 0
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        sections.append((name, array, offset))
+        offset = _aligned(offset + array.nbytes)
+
+    table = json.dumps({
+        'sections': [
+            {
+                'name': name,
+                'dtype': array.dtype.str,
+                'shape': list(array.shape),
+                'offset': section_offset,
+            }
+            for name, array, section_offset in sections
+        ],
+        'metadata': metadata or {},
+    }).encode('utf-8')
+    data_start = _aligned(_HEADER.size + len(table))
+
+    with open_atomic(path) as f:
+        f.write(b'\0' * _HEADER.size)
+        crc = 0
+        for chunk in (table, b'\0' * (data_start - _HEADER.size - len(table))):
+            f.write(chunk)
+            crc = zlib.crc32(chunk, crc)
+        position = data_start
+        for name, array, section_offset in sections:
+            padding = b'\0' * (data_start + section_offset - position)
+            body = array.tobytes()
+            for chunk in (padding, body):
+                f.write(chunk)
+                crc = zlib.crc32(chunk, crc)
+            position = data_start + section_offset + len(body)
+        f.seek(0)
+        f.write(_HEADER.pack(MAGIC, FORMAT_VERSION, crc, _HEADER.size, len(table)))
+    return catalog
+
+
+def read_catalog_arrays(path: str, verify: bool = True) -> Tuple[Dict[str, np.ndarray], Dict]:
+    """
+    Memory-map a compiled catalog file
+
+    Args:
+        path: File written by write_catalog_file
+        verify: Check the CRC-32 (reads every page once)
+
+    Returns:
+        Tuple of (read-only arrays by section name, metadata)
+
+    Raises:
+        CatalogFileError: If the file cannot be read, has another format
+            version or fails validation
+    """
+    try:
+        with open(path, 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError) as e:
+        raise CatalogFileError(f'Cannot map catalog file {path}: {e}') from e
+
+    if len(mapped) < _HEADER.size:
+        raise CatalogFileError(f'{path} is too short to be a catalog file')
+    magic, version, crc, table_offset, table_length = _HEADER.unpack_from(mapped, 0)
+    if magic != MAGIC:
+        raise CatalogFileError(f'{path} is not a compiled catalog file')
+    if version != FORMAT_VERSION:
+        raise CatalogFileError(
+            f'{path} has catalog format version {version}, expected {FORMAT_VERSION}; recompile it'
+        )
+    if verify:
+        with memoryview(mapped) as view:
+            actual = zlib.crc32(view[_HEADER.size:])
+        if actual != crc:
+            raise CatalogFileError(f'{path} failed its checksum; recompile it')
+
+    try:
+        table = json.loads(mapped[table_offset:table_offset + table_length].decode('utf-8'))
+        data_start = _aligned(table_offset + table_length)
+        arrays = {}
+        for section in table['sections']:
+            dtype = np.dtype(section['dtype'])
+            count = int(np.prod(section['shape'], dtype=np.int64))
+            if count == 0:
+                arrays[section['name']] = np.zeros(section['shape'], dtype=dtype)
+                continue
+            arrays[section['name']] = np.frombuffer(
+                mapped, dtype=dtype, count=count, offset=data_start + section['offset']
+            ).reshape(section['shape'])
+    except (ValueError, KeyError, TypeError) as e:
+        raise CatalogFileError(f'{path} has an invalid section table: {e}') from e
+    return arrays, table['metadata']
+
+
+def load_catalog_file(
+    path: str,
+    verify: bool = True,
+    database_path: Optional[str] = None
+) -> FoodCatalog:
+    """
+    Open a compiled catalog with its prebuilt matcher and search indexes
+
+    Args:
+        path: File written by write_catalog_file
+        verify: Check the CRC-32 (reads every page once)
+        database_path: food_database.json the file must have been built from
+
+    Raises:
+        CatalogFileError: See read_catalog_arrays; also if database_path
+            exists and its hash differs from the one the file was built from
+    """
+    arrays, metadata = read_catalog_arrays(path, verify=verify)
+    if database_path is not None and os.path.exists(database_path):
+        if metadata.get('database') != database_hash(database_path):
+            raise CatalogFileError(f'{path} was not built from the current {database_path}; recompile it')
+    prebuilt = {name: array for name, array in arrays.items() if not name.startswith('catalog.')}
+    try:
+        return FoodCatalog.from_arrays(sub_arrays(arrays, 'catalog'), prebuilt=prebuilt)
+    except KeyError as e:
+        raise CatalogFileError(f'{path} is missing section {e}') from e
+
+
+if __name__ == '__main__':
+    # python -m src.services.catalog_file food_database.json food_catalog.bin
+    if len(sys.argv) != 3:
+        sys.exit('usage: python -m src.services.catalog_file <food_database.json> <output.bin>')
+    with open(sys.argv[1], 'r', encoding='utf-8') as f:
+        foods = json.load(f)
+    written = write_catalog_file(sys.argv[2], foods, metadata={'database': database_hash(sys.argv[1])})
+    print(f'Wrote {len(written)} foods to {sys.argv[2]}')
@@ -0,0 +1,268 @@
+"""Columnar in-memory food catalog shared by matching, search and nutrition math"""
+from typing import Dict, Iterable, Iterator, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+
+# Per-100g nutrient columns, in the column order of FoodCatalog.nutrients
+NUTRIENT_COLUMNS = ('calories', 'protein', 'carbs', 'fat', 'fiber')
+
+# float32 values are restored to this many decimals before use; exact for
+# per-100g values below ~1000 with at most 4 decimals (2.7, 0.35, 884)
+NUTRIENT_DECIMALS = 4
+
+
+def sub_arrays(arrays: Dict[str, np.ndarray], prefix: str) -> Dict[str, np.ndarray]:
+    """Arrays named '<prefix>.<name>', keyed by name"""
+    start = len(prefix) + 1
+    return {name[start:]: array for name, array in arrays.items() if name.startswith(f'{prefix}.')}
+
+
+def default_food_id(name: str) -> str:
+    """Id used for catalog entries that do not define one"""
+    return name.lower().replace(' ', '-')
+
+
+class StringTable:
+    """
+    Immutable list of strings stored as one UTF-8 buffer plus offsets
+
+    A Python str costs ~50 bytes of object overhead before its characters;
+    here each extra string costs its UTF-8 bytes and one 8-byte offset.
+    Supports len() and indexing, so sorted tables can be bisected.
+    """
+
+    def __init__(self, strings: Iterable[str]):
+        encoded = [text.encode('utf-8') for text in strings]
+        self.data = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+        self.offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(chunk) for chunk in encoded], out=self.offsets[1:])
+
+    @classmethod
+    def from_arrays(cls, data: np.ndarray, offsets: np.ndarray) -> 'StringTable':
+        """Table over existing buffers (e.g. memory-mapped), without copying"""
+        table = cls.__new__(cls)
+        table.data = data
+        table.offsets = offsets
+        return table
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, idx: int) -> str:
+        return self.data[self.offsets[idx]:self.offsets[idx + 1]].tobytes().decode('utf-8')
+
+    def __iter__(self) -> Iterator[str]:
+        for idx in range(len(self)):
+            yield self[idx]
+
+    @property
+    def nbytes(self) -> int:
+        return self.data.nbytes + self.offsets.nbytes
+
+    def export_arrays(self, name: str) -> Dict[str, np.ndarray]:
+        return {f'{name}.data': self.data, f'{name}.offsets': self.offsets}
+
+    @classmethod
+    def from_exported(cls, arrays: Dict[str, np.ndarray], name: str) -> 'StringTable':
+        return cls.from_arrays(arrays[f'{name}.data'], arrays[f'{name}.offsets'])
+
+
+class FoodCatalog:
+    """
+    Read-only food catalog in columnar form
+
+    Nutrients are one float32 (foods x NUTRIENT_COLUMNS) matrix in column
+    order, so every nutrient is a contiguous float32 array and the
+    nutrition of any set of (food index, grams) pairs is a single gather
+    and multiply. Ids and names live in StringTables; category lists and
+    emojis, which repeat across foods, are interned into small tables and
+    referenced by an integer code per food. Foods are identified by their
+    integer index.
+
+    Values are restored to NUTRIENT_DECIMALS decimals whenever they are
+    read, so 0.3 g of fat scaled to 150 g is 0.45 -> 0.4 as with the
+    original float64 dicts, not 0.45000002 -> 0.5. Dict records in the
+    catalog's source format are only built on demand (food()), for API
+    responses.
+
+    A catalog loaded from a compiled file (catalog_file) also carries the
+    indexes built for it; FoodMatcher and FoodSearchIndex use those
+    (prebuilt()) instead of building their own.
+    """
+
+    def __init__(
+        self,
+        ids: Sequence[str],
+        names: Sequence[str],
+        nutrients: np.ndarray,
+        category_lists: Sequence[Tuple[str, ...]],
+        category_codes: np.ndarray,
+        emojis: Sequence[str],
+        emoji_codes: np.ndarray,
+        prebuilt: Optional[Dict[str, np.ndarray]] = None
+    ):
+        """
+        Build a catalog from its columns (see from_records)
+
+        Args:
+            ids: Food id per food
+            names: Display name per food
+            nutrients: (foods, len(NUTRIENT_COLUMNS)) values per 100g
+            category_lists: Interned category lists
+            category_codes: Per food, index into category_lists
+            emojis: Interned emojis; '' means the food has none
+            emoji_codes: Per food, index into emojis
+            prebuilt: Exported index arrays, keyed '<index>.<array>'
+        """
+        self.ids = ids if isinstance(ids, StringTable) else StringTable(ids)
+        self.names = names if isinstance(names, StringTable) else StringTable(names)
+        self.nutrients = np.asfortranarray(nutrients, dtype=np.float32).reshape(
+            len(self.names), len(NUTRIENT_COLUMNS)
+        )
+        self.category_lists = [tuple(categories) for categories in category_lists]
+        self.category_codes = np.asarray(category_codes, dtype=np.uint32)
+        self.emojis = list(emojis)
+        self.emoji_codes = np.asarray(emoji_codes, dtype=np.uint32)
+        self._prebuilt = prebuilt or {}
+
+    @classmethod
+    def from_records(cls, foods: Iterable[Dict]) -> 'FoodCatalog':
+        """
+        Build a catalog from food dicts (the food_database.json format)
+
+        Args:
+            foods: Items with name, per-100g nutrients and optional id,
+                category list and emoji; missing nutrients count as 0
+        """
+        ids, names, rows, category_codes, emoji_codes = [], [], [], [], []
+        category_table: Dict[Tuple[str, ...], int] = {}
+        emoji_table: Dict[str, int] = {'': 0}
+
+        for food in foods:
+            names.append(food['name'])
+            ids.append(food.get('id') or default_food_id(food['name']))
+            rows.append([food.get(column, 0) for column in NUTRIENT_COLUMNS])
+
+            categories = tuple(food.get('category', []))
+            category_codes.append(category_table.setdefault(categories, len(category_table)))
+
+            emoji = food.get('emoji') or ''
+            emoji_codes.append(emoji_table.setdefault(emoji, len(emoji_table)))
+
+        return cls(
+            ids=ids,
+            names=names,
+            nutrients=np.array(rows, dtype=np.float32).reshape(len(names), len(NUTRIENT_COLUMNS)),
+            category_lists=list(category_table),
+            category_codes=np.array(category_codes, dtype=np.uint32),
+            emojis=list(emoji_table),
+            emoji_codes=np.array(emoji_codes, dtype=np.uint32)
+        )
+
+    @classmethod
+    def coerce(cls, foods: Union['FoodCatalog', Iterable[Dict]]) -> 'FoodCatalog':
+        """The catalog itself, or one built from food dicts"""
+        return foods if isinstance(foods, FoodCatalog) else cls.from_records(foods)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def export_arrays(self) -> Dict[str, np.ndarray]:
+        """Columns as named arrays (inverse of from_arrays)"""
+        arrays = {
+            'nutrients': np.ascontiguousarray(self.nutrients.T),
+            'category_codes': self.category_codes,
+            'emoji_codes': self.emoji_codes,
+        }
+        arrays.update(self.ids.export_arrays('ids'))
+        arrays.update(self.names.export_arrays('names'))
+        # Category lists are stored one per string, categories separated by newlines
+        arrays.update(StringTable('\n'.join(categories) for categories in self.category_lists).export_arrays('category_lists'))
+        arrays.update(StringTable(self.emojis).export_arrays('emojis'))
+        return arrays
+
+    @classmethod
+    def from_arrays(
+        cls,
+        arrays: Dict[str, np.ndarray],
+        prebuilt: Optional[Dict[str, np.ndarray]] = None
+    ) -> 'FoodCatalog':
+        """
+        Catalog over exported arrays, without copying the per-food columns
+
+        Args:
+            arrays: Output of export_arrays (possibly memory-mapped)
+            prebuilt: Exported index arrays to attach
+        """
+        return cls(
+            ids=StringTable.from_exported(arrays, 'ids'),
+            names=StringTable.from_exported(arrays, 'names'),
+            # Stored nutrient-major, which is the column order of the (foods, nutrients) view
+            nutrients=arrays['nutrients'].T,
+            category_lists=[
+                tuple(categories.split('\n')) if categories else ()
+                for categories in StringTable.from_exported(arrays, 'category_lists')
+            ],
+            category_codes=arrays['category_codes'],
+            emojis=list(StringTable.from_exported(arrays, 'emojis')),
+            emoji_codes=arrays['emoji_codes'],
+            prebuilt=prebuilt
+        )
+
+    def prebuilt(self, index: str) -> Optional[Dict[str, np.ndarray]]:
+        """Arrays exported by the named index for this catalog, if it came with them"""
+        return sub_arrays(self._prebuilt, index) or None
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory held by the per-food columns"""
+        return (
+            self.ids.nbytes + self.names.nbytes + self.nutrients.nbytes
+            + self.category_codes.nbytes + self.emoji_codes.nbytes
+        )
+
+    def column(self, nutrient: str) -> np.ndarray:
+        """Contiguous float32 per-100g values of one nutrient (a view, not restored)"""
+        return self.nutrients[:, NUTRIENT_COLUMNS.index(nutrient)]
+
+    def per_100g(self, indices: Sequence[int]) -> np.ndarray:
+        """float64 per-100g nutrients of the given foods, restored to their decimals"""
+        values = self.nutrients[np.asarray(indices, dtype=np.int64)].astype(np.float64)
+        return np.round(values, NUTRIENT_DECIMALS, out=values)
+
+    def has_category(self, category: str) -> np.ndarray:
+        """Boolean mask of the foods in a category"""
+        in_list = np.array([category in categories for categories in self.category_lists], dtype=bool)
+        return in_list[self.category_codes] if len(in_list) else np.zeros(len(self), dtype=bool)
+
+    def food(self, idx: int) -> Dict:
+        """Food as a dict in the source format (new dict on every call)"""
+        idx = int(idx)
+        record = {
+            'id': self.ids[idx],
+            'name': self.names[idx],
+            'category': list(self.category_lists[self.category_codes[idx]]),
+        }
+        emoji = self.emojis[self.emoji_codes[idx]]
+        if emoji:
+            record['emoji'] = emoji
+        for column, value in zip(NUTRIENT_COLUMNS, self.per_100g([idx])[0].tolist()):
+            record[column] = value
+        return record
+
+    def nutrition(self, indices: Sequence[int], grams: Sequence[float]) -> np.ndarray:
+        """
+        Nutrients of (food index, grams) pairs in one vectorized multiply
+
+        Args:
+            indices: Food index per pair
+            grams: Amount in grams per pair
+
+        Returns:
+            float64 array of shape (len(indices), len(NUTRIENT_COLUMNS))
+        """
+        ratios = np.asarray(grams, dtype=np.float64) / 100.0
+        values = self.per_100g(indices)
+        values *= ratios[:, None]
+        return values
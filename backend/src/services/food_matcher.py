@@ -1,55 +1,258 @@
 """Food matching utilities to match detected foods with database"""
-from typing import List, Dict, Optional, Tuple
-from difflib import SequenceMatcher
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Iterable, List, Dict, Optional, Sequence, Set, Tuple, Union
+
+import numpy as np
+
+from .food_catalog import FoodCatalog, StringTable, sub_arrays
+from .spell_correction import SpellingIndex
+from .text_normalization import fold, tokens, trigrams
+
+
+# Nutrients reported per match (the first FoodCatalog columns)
+NUTRIENT_FIELDS = ('calories', 'protein', 'carbs', 'fat')
+
+
+@dataclass
+class FoodMatch:
+    """A detection matched to a catalog food, with nutrition for its grams"""
+    food: Dict
+    score: float
+    nutrition: Dict
+
+
+class MatchCache:
+    """
+    LRU cache of the best (food index, score) per normalized query
+
+    Values do not depend on min_confidence (the threshold is applied on
+    read), so one entry serves every caller. clear() starts a new
+    generation; results computed against the previous catalog are not
+    stored.
+    """
+
+    def __init__(self, max_entries: int = 4096):
+        """
+        Initialize cache
+
+        Args:
+            max_entries: Maximum number of cached queries (0 disables the cache)
+        """
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        # (folded name, boost kind) -> (food index or -1, score)
+        self._entries: "OrderedDict[Tuple[str, int], Tuple[int, float]]" = OrderedDict()
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Tuple[str, int]) -> Optional[Tuple[int, float]]:
+        """Return the cached match for key, or None if missing"""
+        if self.max_entries <= 0:
+            return None
+
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Tuple[str, int], value: Tuple[int, float], generation: int) -> None:
+        """Store a match computed during `generation`, evicting the least recently used"""
+        if self.max_entries <= 0:
+            return
+
+        with self._lock:
+            if generation != self.generation:
+                return
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """Drop all cached matches (the catalog changed)"""
+        with self._lock:
+            self._entries.clear()
+            self.generation += 1
+
+    def stats(self) -> Dict:
+        """Cache counters for monitoring"""
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+        }
 
 
 class FoodMatcher:
-    """Match AI-detected foods with database entries"""
+    """
+    Match AI-detected foods with database entries
+    
+    Names are compared by the cosine similarity of their accent-folded
+    character trigram sets, so partial and inflected words still match
+    ("pollito" ~ "pollo", "tallarín" ~ "Tallarines Verdes"). Candidates
+    come from a trigram inverted index: the posting lists of the query's
+    trigrams are merged to count the shared trigrams of every food that
+    shares at least one, which costs time proportional to those postings
+    rather than to the catalog size.
+    
+    Words of the detected name that are not in the catalog vocabulary are
+    also corrected to the closest catalog word within two edits ("galina"),
+    using a symmetric-delete index. The corrected name is scored too, but
+    it only counts when it picks the same food as the name as written, and
+    it loses CORRECTION_PENALTY per edit: valid words missing from the
+    catalog ("pizza", "galleta") are often close to an unrelated one.
+    
+    The best match of every (folded name, preparation kind) is kept in an
+    LRU MatchCache, so a name seen before costs one dict lookup. reload()
+    swaps the catalog and invalidates the cache.
+    """
+    
+    # Added to the name similarity when the preparation fits the food
+    PREPARATION_BOOST = 0.1
+    
+    # Subtracted from the score of a spelling-corrected name per edit
+    CORRECTION_PENALTY = 0.3
     
-    def __init__(self, food_database: List[Dict]):
+    # Merge posting lists by sorting while they hold fewer than
+    # 1/DENSE_MERGE_RATIO entries per catalog food, else count densely
+    DENSE_MERGE_RATIO = 8
+    
+    # Queries scored together per dense block in match_many (bounds memory)
+    DENSE_BLOCK_ROWS = 2
+    
+    def __init__(
+        self,
+        food_database: Union[FoodCatalog, Iterable[Dict]],
+        cache_entries: int = 4096
+    ):
         """
         Initialize matcher with food database
         
         Args:
-            food_database: List of food items from frontend database
+            food_database: Columnar catalog, or food items from frontend database
+            cache_entries: Size of the match result cache (0 disables it)
         """
-        self.food_database = food_database
+        self.catalog = FoodCatalog.coerce(food_database)
+        self.match_cache = MatchCache(cache_entries)
         self._build_search_index()
     
-    def _build_search_index(self):
-        """Build keyword index for faster searching"""
-        self.search_index = {}
+    def reload(self, food_database: Union[FoodCatalog, Iterable[Dict]]) -> None:
+        """
+        Replace the catalog, rebuilding the indexes and dropping cached matches
         
-        for food in self.food_database:
-            # Extract searchable keywords from food name
-            keywords = self._extract_keywords(food['name'])
-            food_id = food.get('id', food['name'].lower().replace(' ', '-'))
-            
-            for keyword in keywords:
-                if keyword not in self.search_index:
-                    self.search_index[keyword] = []
-                self.search_index[keyword].append({
-                    'id': food_id,
-                    'name': food['name'],
-                    'food': food
-                })
+        Args:
+            food_database: New columnar catalog or list of food items
+        """
+        self.catalog = FoodCatalog.coerce(food_database)
+        self._build_search_index()
+        self.match_cache.clear()
     
-    def _extract_keywords(self, text: str) -> List[str]:
-        """Extract searchable keywords from text"""
-        # Normalize and split
-        text = text.lower()
+    def _build_search_index(self):
+        """Build the trigram inverted index and per-food boost columns"""
+        prebuilt = self.catalog.prebuilt('matcher')
+        if prebuilt is not None:
+            self._load_search_index(prebuilt)
+            return
         
-        # Common words to ignore
-        stop_words = {'de', 'con', 'en', 'la', 'el', 'a', 'al', 'y', 'o'}
+        postings: Dict[str, List[int]] = {}
+        words: List[str] = []
+        n = len(self.catalog)
+        gram_counts = np.ones(n, dtype=np.float32)
+        # Fried: in "fats" or "frito" in the name; protein: in "protein"
+        fried = self.catalog.has_category('fats')
+        protein = self.catalog.has_category('protein')
         
-        words = text.split()
-        keywords = [w for w in words if w not in stop_words and len(w) > 2]
+        for idx, name in enumerate(self.catalog.names):
+            grams = trigrams(name)
+            words.extend(set(tokens(name)))
+            gram_counts[idx] = max(len(grams), 1)
+            for gram in grams:
+                postings.setdefault(gram, []).append(idx)
+            if 'frito' in name.lower():
+                fried[idx] = True
         
-        return keywords
+        # Posting lists are sorted by construction (foods are visited in order)
+        self.trigram_index = {
+            gram: np.array(ids, dtype=np.int32) for gram, ids in postings.items()
+        }
+        self._inverse_norms = 1.0 / np.sqrt(gram_counts)
+        self._fried = fried
+        self._protein = protein
+        self._build_boost_table()
+        self.spelling = SpellingIndex(words)
     
-    def _calculate_similarity(self, str1: str, str2: str) -> float:
-        """Calculate similarity ratio between two strings"""
-        return SequenceMatcher(None, str1.lower(), str2.lower()).ratio()
+    def _build_boost_table(self):
+        """Boost columns by kind: none, fried, grilled, fried and grilled"""
+        fried = self._fried * np.float32(self.PREPARATION_BOOST)
+        protein = self._protein * np.float32(self.PREPARATION_BOOST)
+        self._boost_table = np.stack([
+            np.zeros(len(self.catalog), dtype=np.float32),
+            fried,
+            protein,
+            np.maximum(fried, protein),
+        ])
+    
+    def export_arrays(self) -> Dict[str, np.ndarray]:
+        """Search index as named arrays, for compiled catalog files"""
+        grams = list(self.trigram_index)
+        offsets = np.zeros(len(grams) + 1, dtype=np.int64)
+        np.cumsum([len(self.trigram_index[gram]) for gram in grams], out=offsets[1:])
+        arrays = {
+            'gram_offsets': offsets,
+            'postings': (
+                np.concatenate([self.trigram_index[gram] for gram in grams])
+                if grams else np.zeros(0, dtype=np.int32)
+            ),
+            'inverse_norms': self._inverse_norms,
+            'fried': self._fried,
+            'protein': self._protein,
+        }
+        arrays.update(StringTable(grams).export_arrays('grams'))
+        arrays.update({f'spelling.{name}': array for name, array in self.spelling.export_arrays().items()})
+        return arrays
+    
+    def _load_search_index(self, arrays: Dict[str, np.ndarray]):
+        """Use exported arrays; posting lists stay views into them"""
+        offsets = arrays['gram_offsets'].tolist()
+        postings = arrays['postings']
+        self.trigram_index = {
+            gram: postings[offsets[i]:offsets[i + 1]]
+            for i, gram in enumerate(StringTable.from_exported(arrays, 'grams'))
+        }
+        self._inverse_norms = arrays['inverse_norms']
+        self._fried = arrays['fried']
+        self._protein = arrays['protein']
+        self._build_boost_table()
+        self.spelling = SpellingIndex.from_arrays(sub_arrays(arrays, 'spelling'))
+    
+    @staticmethod
+    def _preparation_kind(preparation: str) -> int:
+        """Row of _boost_table for a preparation: "frito" favours fried foods, "plancha"/"asado" proteins"""
+        if not preparation:
+            return 0
+        
+        # If detected as fried and food is in "fats" or has "frito" in name
+        fried = 'frito' in preparation
+        
+        # If detected as grilled and food is protein
+        grilled = 'plancha' in preparation or 'asado' in preparation
+        
+        return int(fried) + 2 * int(grilled)
     
     def match_food(
         self, 
@@ -68,58 +271,224 @@ class FoodMatcher:
         Returns:
             Tuple of (food_dict, confidence_score) or None if no match
         """
-        detected_keywords = self._extract_keywords(detected_name)
-        candidates = []
-        
-        # Find candidates that share keywords
-        for keyword in detected_keywords:
-            if keyword in self.search_index:
-                candidates.extend(self.search_index[keyword])
-        
-        # Remove duplicates
-        seen = set()
-        unique_candidates = []
-        for candidate in candidates:
-            if candidate['id'] not in seen:
-                seen.add(candidate['id'])
-                unique_candidates.append(candidate)
-        
-        # Score each candidate
-        best_match = None
-        best_score = 0.0
-        
-        for candidate in unique_candidates:
-            # Calculate base similarity
-            name_similarity = self._calculate_similarity(detected_name, candidate['name'])
-            
-            # Boost score if preparation matches category
-            prep_boost = 0.0
-            if preparation:
-                food = candidate['food']
-                category = food.get('category', [])
-                
-                # If detected as fried and food is in "fats" or has "frito" in name
-                if 'frito' in preparation and (
-                    'fats' in category or 'frito' in candidate['name'].lower()
-                ):
-                    prep_boost = 0.1
-                
-                # If detected as grilled and food is protein
-                if ('plancha' in preparation or 'asado' in preparation) and 'protein' in category:
-                    prep_boost = 0.1
-            
-            final_score = min(name_similarity + prep_boost, 1.0)
-            
-            if final_score > best_score:
-                best_score = final_score
-                best_match = candidate['food']
+        key = (fold(detected_name), self._preparation_kind(preparation))
+        cached = self.match_cache.get(key)
+        if cached is None:
+            generation = self.match_cache.generation
+            cached = self._best_match(*key)
+            self.match_cache.set(key, cached, generation)
         
         # Return match only if above threshold
-        if best_match and best_score >= min_confidence:
-            return (best_match, best_score)
+        food_idx, best_score = cached
+        if food_idx >= 0 and best_score >= min_confidence:
+            return (self.catalog.food(food_idx), best_score)
         
         return None
     
+    def _best_match(self, folded_name: str, kind: int) -> Tuple[int, float]:
+        """Best (food index, score) for a folded name, or (-1, 0.0) if no food shares a trigram"""
+        match = self._score_query(trigrams(folded_name), kind)
+        corrected, edits = self.spelling.correct_with_edits(folded_name)
+        if edits:
+            match = self._trust_correction(match, self._score_query(trigrams(corrected), kind), edits)
+        return match
+    
+    def _trust_correction(
+        self, match: Tuple[int, float], corrected: Tuple[int, float], edits: int
+    ) -> Tuple[int, float]:
+        """
+        Combine the match of a name with the match of its spelling correction
+        
+        The correction may raise the score of the food the name already
+        matches (minus CORRECTION_PENALTY per edit), never pick another one.
+        """
+        if corrected[0] != match[0]:
+            return match
+        return (match[0], max(match[1], corrected[1] - self.CORRECTION_PENALTY * edits))
+    
+    def _score_query(self, query: Set[str], kind: int) -> Tuple[int, float]:
+        """Best (food index, score) for a trigram set, or (-1, 0.0) if no food shares one"""
+        lists = [self.trigram_index[gram] for gram in query if gram in self.trigram_index]
+        if not lists:
+            return (-1, 0.0)
+        
+        # Posting-list merge: shared trigram count of every candidate food.
+        # Short lists are merged by sorting; long ones (common trigrams in a
+        # large catalog) are counted into a dense array, which is cheaper
+        # than extracting the candidates.
+        postings = np.concatenate(lists)
+        if len(postings) * self.DENSE_MERGE_RATIO < len(self.catalog):
+            candidates, shared = np.unique(postings, return_counts=True)
+        else:
+            candidates = slice(None)
+            shared = np.bincount(postings, minlength=len(self.catalog))
+        
+        # Cosine similarity of the trigram sets
+        scores = shared * self._inverse_norms[candidates]
+        scores *= 1.0 / np.sqrt(len(query))
+        
+        if kind:
+            scores += self._boost_table[kind][candidates]
+        np.minimum(scores, 1.0, out=scores)
+        
+        # Ties go to the earliest catalog entry
+        best = int(np.argmax(scores))
+        food_idx = best if isinstance(candidates, slice) else int(candidates[best])
+        return (food_idx, float(scores[best]))
+    
+    def match_many(
+        self,
+        detections: Sequence[Tuple[str, str, int]],
+        min_confidence: float = 0.5
+    ) -> List[Optional[FoodMatch]]:
+        """
+        Match all detections of an analysis at once, with their nutrition
+        
+        Same results as calling match_food and calculate_nutrition per
+        detection. Each distinct (folded name, boost kind) is looked up in
+        the match cache once; the misses are matched together by
+        _best_matches, and nutrition for all matches is one multiply.
+        
+        Args:
+            detections: (name, preparation, grams) per detected food
+            min_confidence: Minimum confidence threshold
+            
+        Returns:
+            A FoodMatch or None (no match) per detection, in order
+        """
+        results: List[Optional[FoodMatch]] = [None] * len(detections)
+        
+        # One query per distinct folded name and boost kind; cached ones are
+        # answered directly, the rest become rows of the merge below
+        best: Dict[Tuple[str, int], Tuple[int, float]] = {}
+        detection_keys = []
+        misses: List[Tuple[str, int]] = []
+        for name, preparation, _ in detections:
+            key = (fold(name), self._preparation_kind(preparation))
+            if key not in best:
+                cached = self.match_cache.get(key)
+                if cached is None:
+                    cached = (-1, 0.0)
+                    misses.append(key)
+                best[key] = cached
+            detection_keys.append(key)
+        
+        if misses:
+            generation = self.match_cache.generation
+            for key, match in zip(misses, self._best_matches(misses)):
+                best[key] = match
+                self.match_cache.set(key, match, generation)
+        
+        # Nutrition for every matched detection in one multiply
+        matched = [
+            i for i, key in enumerate(detection_keys)
+            if best[key][0] >= 0 and best[key][1] >= min_confidence
+        ]
+        if not matched:
+            return results
+        matched_foods = [best[detection_keys[i]][0] for i in matched]
+        nutrition = self.catalog.nutrition(
+            matched_foods, [detections[i][2] for i in matched]
+        )[:, :len(NUTRIENT_FIELDS)].tolist()
+        
+        for i, food_idx, values in zip(matched, matched_foods, nutrition):
+            results[i] = FoodMatch(
+                food=self.catalog.food(food_idx),
+                score=best[detection_keys[i]][1],
+                nutrition={
+                    field: round(value, 1) for field, value in zip(NUTRIENT_FIELDS, values)
+                }
+            )
+        return results
+    
+    def _best_matches(self, keys: List[Tuple[str, int]]) -> List[Tuple[int, float]]:
+        """
+        _best_match for many (folded name, boost kind) keys in one merge
+        
+        The posting lists of every key are merged into one (query, food)
+        shared-trigram matrix that is scored, boosted and reduced to each
+        query's best food with a few NumPy operations (sparse for short
+        postings, dense row blocks for long ones). Spelling corrections are
+        extra rows, combined with their key's row as in _best_match.
+        """
+        corrections: Dict[str, Tuple[str, int]] = {}
+        queries = [(trigrams(folded_name), kind) for folded_name, kind in keys]
+        # (key row, corrected row, edits)
+        corrected_rows: List[Tuple[int, int, int]] = []
+        for row, (folded_name, kind) in enumerate(keys):
+            if folded_name not in corrections:
+                corrections[folded_name] = self.spelling.correct_with_edits(folded_name)
+            corrected, edits = corrections[folded_name]
+            if edits:
+                corrected_rows.append((row, len(queries), edits))
+                queries.append((trigrams(corrected), kind))
+        
+        matches = self._score_queries(queries)
+        for row, corrected_row, edits in corrected_rows:
+            matches[row] = self._trust_correction(matches[row], matches[corrected_row], edits)
+        return matches[:len(keys)]
+    
+    def _score_queries(self, queries: List[Tuple[Set[str], int]]) -> List[Tuple[int, float]]:
+        """_score_query for many (trigram set, boost kind) rows in one merge"""
+        lists, list_rows, query_sizes, kinds = [], [], [], []
+        for row, (query, kind) in enumerate(queries):
+            for gram in query:
+                if gram in self.trigram_index:
+                    lists.append(self.trigram_index[gram])
+                    list_rows.append(row)
+            query_sizes.append(max(len(query), 1))
+            kinds.append(kind)
+        
+        n_rows = len(queries)
+        if not lists:
+            return [(-1, 0.0)] * n_rows
+        
+        # Merge every query's posting lists into (row, food) shared-trigram
+        # counts: sparse when the postings are short, else dense row blocks
+        n = len(self.catalog)
+        pairs = np.repeat(np.array(list_rows, dtype=np.int64), [len(ids) for ids in lists]) * n
+        pairs += np.concatenate(lists)
+        inverse_sizes = 1.0 / np.sqrt(np.array(query_sizes, dtype=np.int64))
+        kinds = np.array(kinds, dtype=np.int64)
+        boost_table = self._boost_table
+        
+        if len(pairs) * self.DENSE_MERGE_RATIO < n_rows * n:
+            pairs, shared = np.unique(pairs, return_counts=True)
+            rows, foods = np.divmod(pairs, n)
+            
+            # Cosine similarity plus preparation boost, as in match_food
+            scores = shared * self._inverse_norms[foods]
+            scores *= inverse_sizes[rows]
+            scores += boost_table[kinds[rows], foods]
+            np.minimum(scores, 1.0, out=scores)
+            
+            # Best food per row: highest score, ties to the earliest catalog entry
+            order = np.lexsort((foods, -scores, rows))
+            firsts = order[np.flatnonzero(np.r_[True, np.diff(rows[order]) != 0])]
+            best_food = np.full(n_rows, -1, dtype=np.int64)
+            best_score = np.zeros(n_rows)
+            best_food[rows[firsts]] = foods[firsts]
+            best_score[rows[firsts]] = scores[firsts]
+        else:
+            best_food = np.empty(n_rows, dtype=np.int64)
+            best_score = np.empty(n_rows)
+            # Pairs are grouped by row; score DENSE_BLOCK_ROWS rows at a time
+            bounds = np.searchsorted(pairs, np.arange(n_rows + 1, dtype=np.int64) * n)
+            for start in range(0, n_rows, self.DENSE_BLOCK_ROWS):
+                stop = min(start + self.DENSE_BLOCK_ROWS, n_rows)
+                block = pairs[bounds[start]:bounds[stop]] - start * n
+                shared = np.bincount(block, minlength=(stop - start) * n).reshape(stop - start, n)
+                scores = shared * self._inverse_norms
+                scores *= inverse_sizes[start:stop, None]
+                scores += boost_table[kinds[start:stop]]
+                np.minimum(scores, 1.0, out=scores)
+                best_food[start:stop] = np.argmax(scores, axis=1)
+                best_score[start:stop] = scores[np.arange(stop - start), best_food[start:stop]]
+            # Queries without any known trigram have no match
+            best_food[np.diff(bounds) == 0] = -1
+        
+        return list(zip(best_food.tolist(), best_score.tolist()))
+    
     def calculate_nutrition(self, food: Dict, grams: int) -> Dict:
         """
         Calculate nutritional values for given grams
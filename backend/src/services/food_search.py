@@ -0,0 +1,235 @@
+"""Prefix search over the food catalog for autocomplete"""
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Sequence, Tuple, Union
+
+import numpy as np
+
+from .food_catalog import FoodCatalog, StringTable
+from .text_normalization import STOP_WORDS, fold, tokens
+
+
+# Sorts after every folded character, so bisect_left(keys, prefix + _PREFIX_END)
+# is the end of the range of keys starting with prefix
+_PREFIX_END = '￿'
+
+# Result classes, best first
+EXACT_NAME = 0
+NAME_PREFIX = 1
+WORD_PREFIX = 2
+
+
+@dataclass
+class FoodSearchPage:
+    """One page of ranked search results"""
+    foods: List[Dict]
+    total: int
+
+
+class FoodSearchIndex:
+    """
+    Accent- and case-folded prefix index over food names
+
+    Two sorted arrays are searched with bisect: the folded full names and
+    every (word, food) pair. Each query word is treated as a prefix, so
+    "pol bra" finds "Pollo a la Brasa". Completed stop words are ignored,
+    but the word being typed never is ("a" may become "arroz", "pollo a"
+    "pollo a la brasa"), so name words include stop words. Results are ranked by class
+    (exact name, name starts with the query, a word starts with it), then
+    by shorter name, then alphabetically; every food's position in that
+    static order is precomputed, so ranking a query's candidates is one
+    integer key per candidate.
+
+    A query costs two bisects per word plus work proportional to the
+    number of foods matching its most selective word, never a scan of
+    the catalog. Single-word prefixes matching many words (the first
+    letters typed) have their first CACHED_RESULTS results precomputed,
+    so those cost a dict lookup.
+    """
+
+    # Word prefixes with more entries than this get precomputed results
+    HEAVY_PREFIX_ENTRIES = 512
+    CACHED_RESULTS = 100
+
+    def __init__(self, food_database: Union[FoodCatalog, Iterable[Dict]]):
+        """
+        Build the index
+
+        Args:
+            food_database: Catalog (same one FoodMatcher uses) or food items
+        """
+        self.catalog = FoodCatalog.coerce(food_database)
+        prebuilt = self.catalog.prebuilt('search')
+        if prebuilt is not None:
+            self._load_arrays(prebuilt)
+            return
+
+        n = len(self.catalog)
+        folded_names = [fold(name) for name in self.catalog.names]
+
+        # Static order: shorter names first, then alphabetical
+        order = sorted(range(n), key=lambda i: (len(folded_names[i]), folded_names[i]))
+        self._static_rank = np.empty(n, dtype=np.int64)
+        self._static_rank[order] = np.arange(n)
+
+        names = sorted((name, idx) for idx, name in enumerate(folded_names))
+        self._names = [name for name, _ in names]
+        self._name_pos = np.empty(n, dtype=np.int64)
+        self._name_pos[[idx for _, idx in names]] = np.arange(len(names))
+
+        words = sorted(
+            (word, idx)
+            for idx, name in enumerate(folded_names)
+            # Stop words too: "pollo a" is on its way to "Pollo a la Brasa"
+            for word in set(name.split())
+        )
+        self._words = [word for word, _ in words]
+        self._word_foods = np.array([idx for _, idx in words], dtype=np.int64)
+        self._build_heavy_prefixes()
+
+    def __len__(self) -> int:
+        return len(self.catalog)
+
+    def export_arrays(self) -> Dict[str, np.ndarray]:
+        """Index as named arrays, for compiled catalog files"""
+        prefixes = list(self._heavy)
+        ranked = [self._heavy[prefix][0] for prefix in prefixes]
+        offsets = np.zeros(len(prefixes) + 1, dtype=np.int64)
+        np.cumsum([len(foods) for foods in ranked], out=offsets[1:])
+        arrays = {
+            'static_rank': self._static_rank,
+            'name_pos': self._name_pos,
+            'word_foods': self._word_foods,
+            'heavy_offsets': offsets,
+            'heavy_ranked': np.concatenate(ranked) if ranked else np.zeros(0, dtype=np.int64),
+            'heavy_totals': np.array([self._heavy[prefix][1] for prefix in prefixes], dtype=np.int64),
+        }
+        arrays.update(StringTable(self._names).export_arrays('names'))
+        arrays.update(StringTable(self._words).export_arrays('words'))
+        arrays.update(StringTable(prefixes).export_arrays('heavy_prefixes'))
+        return arrays
+
+    def _load_arrays(self, arrays: Dict[str, np.ndarray]) -> None:
+        """Use exported arrays; the sorted names and words are bisected in place"""
+        self._static_rank = arrays['static_rank']
+        self._name_pos = arrays['name_pos']
+        self._word_foods = arrays['word_foods']
+        self._names = StringTable.from_exported(arrays, 'names')
+        self._words = StringTable.from_exported(arrays, 'words')
+        offsets = arrays['heavy_offsets'].tolist()
+        ranked = arrays['heavy_ranked']
+        self._heavy = {
+            prefix: (ranked[offsets[i]:offsets[i + 1]], total)
+            for i, (prefix, total) in enumerate(zip(
+                StringTable.from_exported(arrays, 'heavy_prefixes'),
+                arrays['heavy_totals'].tolist()
+            ))
+        }
+
+    @staticmethod
+    def _query_words(query: str) -> List[str]:
+        """Query words to match as prefixes: stop words only count while being typed"""
+        words = fold(query).split()
+        if not words or query[-1:].isspace():
+            return tokens(query)
+        return [word for word in words[:-1] if word not in STOP_WORDS] + words[-1:]
+
+    @staticmethod
+    def _prefix_range(keys: Sequence[str], prefix: str) -> Tuple[int, int]:
+        return bisect_left(keys, prefix), bisect_left(keys, prefix + _PREFIX_END)
+
+    def _rank(self, words: List[str], folded: str, needed: int) -> Tuple[np.ndarray, int]:
+        """First `needed` ranked food indices for the query words, and the match count"""
+        # Candidates come from the most selective word; the others filter them
+        ranges = sorted(
+            (self._prefix_range(self._words, word) for word in words),
+            key=lambda r: r[1] - r[0]
+        )
+        lo, hi = ranges[0]
+        candidates = self._word_foods[lo:hi]
+        for lo, hi in ranges[1:]:
+            if not len(candidates):
+                break
+            has_word = np.zeros(len(self.catalog), dtype=bool)
+            has_word[self._word_foods[lo:hi]] = True
+            candidates = candidates[has_word[candidates]]
+        candidates = np.unique(candidates)
+
+        total = len(candidates)
+        if total == 0:
+            return candidates, 0
+
+        # Class from the name positions: [exact_lo, exact_hi) holds names equal
+        # to the query, [exact_lo, prefix_hi) names starting with it
+        exact_lo = bisect_left(self._names, folded)
+        exact_hi = bisect_right(self._names, folded)
+        prefix_hi = bisect_left(self._names, folded + _PREFIX_END)
+        pos = self._name_pos[candidates]
+        result_class = np.full(total, WORD_PREFIX, dtype=np.int64)
+        result_class[(pos >= exact_lo) & (pos < prefix_hi)] = NAME_PREFIX
+        result_class[(pos >= exact_lo) & (pos < exact_hi)] = EXACT_NAME
+
+        keys = result_class * len(self.catalog) + self._static_rank[candidates]
+
+        # Only the first `needed` results need ordering
+        needed = min(needed, total)
+        if needed < total:
+            top = np.argpartition(keys, needed - 1)[:needed]
+        else:
+            top = np.arange(total)
+        return candidates[top[np.argsort(keys[top], kind='stable')]], total
+
+    def _build_heavy_prefixes(self) -> None:
+        """
+        Precompute the first results of every word prefix with a long range
+
+        Prefixes of the same length have disjoint ranges, so at most
+        len(words) / HEAVY_PREFIX_ENTRIES prefixes per length are heavy,
+        and a prefix can only be heavy if its parent is.
+        """
+        vocabulary: Dict[str, int] = {}
+        for word in self._words:
+            vocabulary[word] = vocabulary.get(word, 0) + 1
+
+        self._heavy: Dict[str, Tuple[np.ndarray, int]] = {}
+        parents = {''}
+        length = 0
+        while parents:
+            length += 1
+            counts: Dict[str, int] = {}
+            for word, count in vocabulary.items():
+                if len(word) >= length and word[:length - 1] in parents:
+                    prefix = word[:length]
+                    counts[prefix] = counts.get(prefix, 0) + count
+            parents = {prefix for prefix, count in counts.items() if count > self.HEAVY_PREFIX_ENTRIES}
+            for prefix in parents:
+                self._heavy[prefix] = self._rank([prefix], prefix, self.CACHED_RESULTS)
+
+    def search(self, query: str, offset: int = 0, limit: int = 20) -> FoodSearchPage:
+        """
+        Ranked foods matching a (partial) query
+
+        Args:
+            query: What the user has typed so far
+            offset: Number of ranked results to skip
+            limit: Maximum number of results to return
+
+        Returns:
+            FoodSearchPage with the requested slice and the total match count
+        """
+        folded = fold(query)
+        words = self._query_words(query)
+        if not folded or not words or limit <= 0:
+            return FoodSearchPage(foods=[], total=0)
+
+        needed = offset + limit
+        cached = self._heavy.get(folded) if len(words) == 1 else None
+        if cached is not None and needed <= len(cached[0]):
+            ranked, total = cached
+        else:
+            ranked, total = self._rank(words, folded, needed)
+
+        return FoodSearchPage(
+            foods=[self.catalog.food(idx) for idx in ranked[offset:needed]],
+            total=total
+        )
@@ -1,11 +1,66 @@
 """Gemini Vision Service for Food Recognition"""
+import asyncio
 import base64
+import hashlib
 import json
 import io
-from typing import List, Dict, Optional
+import re
+from dataclasses import dataclass
+from typing import AsyncIterator, List, Dict, Optional, Tuple, Union
 from PIL import Image
-from google import genai
-from pydantic import BaseModel
+import httpx
+from google.genai import errors as genai_errors
+from pydantic import BaseModel, ValidationError
+
+from .analysis_schema import COMPACT_FOODS_KEY, COMPACT_RESPONSE_SCHEMA, expand_analysis, expand_food
+from .image_hash import dhash
+from .image_pool import ImagePreparationPool
+from .image_decoding import decode_image
+from .metrics import OutputModeRecorder
+from .resilience import ResilientCaller, CircuitOpenError, DeadlineExceededError
+from .stream_parser import IncrementalArrayParser
+from .vision_backends import VisionBackend, GeminiBackend, ModelResponse
+
+
+# HTTP statuses worth retrying: timeouts, throttling and transient server errors
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+
+# Output modes: the verbose prompts with an inline JSON example, or the
+# short prompts with a response schema and compact keys (see analysis_schema)
+OUTPUT_MODE_PROMPT = 'prompt'
+OUTPUT_MODE_COMPACT = 'compact'
+OUTPUT_MODES = (OUTPUT_MODE_PROMPT, OUTPUT_MODE_COMPACT)
+
+# Standard Latin American portions, shared by the verbose and compact prompts
+PORTION_REFERENCES = """- Arroz cocido: porción estándar = 150-200g (cubre ~1/3 del plato)
+- Pollo/carne: porción estándar = 120-150g (tamaño palma de la mano)
+- Ensalada/verduras: porción estándar = 80-120g
+- Papa/tubérculo cocido: porción estándar = 150-200g
+- Menestras/legumbres cocidas: porción estándar = 120-160g
+- Pan: una unidad = 30-50g
+- Huevo: una unidad = 50-60g
+- Pasta cocida: porción estándar = 180-220g
+- Sopa/caldo: un plato = 300-400ml"""
+
+# Appended to the prompt when the model is asked again after an unusable answer
+REPAIR_INSTRUCTION = """
+
+Tu respuesta anterior no era JSON válido con el formato pedido. Responde de nuevo SOLO con el JSON, sin texto adicional."""
+
+_CODE_FENCE = re.compile(r'^```[a-zA-Z]*\s*|\s*```$')
+_TRAILING_COMMA = re.compile(r',\s*([}\]])')
+
+
+class ResponseParseError(Exception):
+    """The model's answer could not be turned into a FoodAnalysisResult"""
+
+
+def is_retryable_gemini_error(exc: BaseException) -> bool:
+    """Whether a Gemini call failure is transient and worth retrying"""
+    if isinstance(exc, genai_errors.APIError):
+        return exc.code in RETRYABLE_STATUS_CODES
+    return isinstance(exc, (ConnectionError, httpx.TransportError))
 
 
 class DetectedFood(BaseModel):
@@ -22,16 +77,68 @@ class FoodAnalysisResult(BaseModel):
     meal_description: str
 
 
+@dataclass
+class PreparedImage:
+    """Image ready to send to the model, plus its perceptual hash and digest"""
+    image: Image.Image
+    phash: int
+    digest: str = ''
+
+
 class GeminiVisionService:
     """Service to analyze food images using Gemini Vision API"""
     
-    def __init__(self, api_key: str):
-        """Initialize Gemini Vision service with API key"""
-        # New google-genai SDK uses a Client object
-        self.client = genai.Client(api_key=api_key)
-        self.model_name = 'gemini-2.5-flash'
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        image_pool: Optional[ImagePreparationPool] = None,
+        max_image_pixels: int = 50_000_000,
+        resilience: Optional[ResilientCaller] = None,
+        backend: Optional[VisionBackend] = None,
+        output_mode: str = OUTPUT_MODE_PROMPT,
+        repair_attempts: int = 1
+    ):
+        """
+        Initialize Gemini Vision service with API key
+        
+        Args:
+            api_key: Gemini API key (only needed for the default Gemini backend)
+            image_pool: Worker pool for image decoding (a small default pool if omitted)
+            max_image_pixels: Reject source images with more pixels than this
+            resilience: Deadline/retry/breaker policy for model calls
+            backend: Model backend (real Gemini if omitted; see vision_backends)
+            output_mode: 'prompt' (verbose prompts) or 'compact' (response schema, short keys)
+            repair_attempts: Times to re-ask the model after an unparseable answer
+        """
+        if output_mode not in OUTPUT_MODES:
+            raise ValueError(f"Unknown output mode: {output_mode}")
+        self.backend = backend or GeminiBackend(api_key)
+        self.model_name = self.backend.model_name
+        self.image_pool = image_pool or ImagePreparationPool()
+        self.max_image_pixels = max_image_pixels
+        self.resilience = resilience or ResilientCaller(is_retryable=is_retryable_gemini_error)
+        self.output_mode = output_mode
+        self.repair_attempts = max(0, repair_attempts)
+        self.usage = OutputModeRecorder()
+    
+    @property
+    def response_schema(self) -> Optional[Dict]:
+        """Schema sent with each call in compact mode"""
+        return COMPACT_RESPONSE_SCHEMA if self.output_mode == OUTPUT_MODE_COMPACT else None
+    
+    async def prepare_image(self, image_bytes: bytes) -> PreparedImage:
+        """
+        Decode and downscale an upload, computing its perceptual hash
+        
+        Runs on the image pool so large photos don't block the event loop.
+        
+        Raises:
+            ImagePoolSaturatedError: If too many images are already queued
+            ImageRejectedError: If the upload is not a valid, acceptably sized image
+        """
+        return await self.image_pool.run(self._prepare_image, image_bytes)
     
-    def _prepare_image(self, image_bytes: bytes, max_size: int = 1024) -> Image.Image:
+    def _prepare_image(self, image_bytes: bytes, max_size: int = 1024) -> PreparedImage:
         """
         Prepare image for analysis: resize if needed to save bandwidth
         
@@ -40,24 +147,16 @@ class GeminiVisionService:
             max_size: Maximum dimension (width or height) in pixels
             
         Returns:
-            PIL Image object
+            PreparedImage with the PIL Image, its dHash and the upload's SHA-256
         """
-        # Create BytesIO from bytes and ensure position is at start
-        img_io = io.BytesIO(image_bytes)
-        img_io.seek(0)
-        img = Image.open(img_io)
-        
-        # Convert to RGB if needed (handle PNG with alpha, etc.)
-        if img.mode != 'RGB':
-            img = img.convert('RGB')
-        
-        # Resize if too large
-        if max(img.size) > max_size:
-            ratio = max_size / max(img.size)
-            new_size = tuple(int(dim * ratio) for dim in img.size)
-            img = img.resize(new_size, Image.Resampling.LANCZOS)
-        
-        return img
+        # Decodes JPEGs at reduced scale and rejects oversized images early
+        img = decode_image(image_bytes, max_size=max_size, max_pixels=self.max_image_pixels)
+        
+        return PreparedImage(
+            image=img,
+            phash=dhash(img),
+            digest=hashlib.sha256(image_bytes).hexdigest()
+        )
     
     def _build_analysis_prompt(self, additional_context: Optional[str] = None) -> str:
         """Build the prompt for Gemini to analyze food images - optimized for consistency"""
@@ -83,15 +182,7 @@ Analiza esta imagen de comida siguiendo ESTRICTAMENTE este proceso paso a paso.
 
 ## PASO 3: Estimar Gramos (SÉ CONSISTENTE)
 Usa estas REFERENCIAS ESTÁNDAR para estimar gramos:
-- Arroz cocido: porción estándar = 150-200g (cubre ~1/3 del plato)
-- Pollo/carne: porción estándar = 120-150g (tamaño palma de la mano)
-- Ensalada/verduras: porción estándar = 80-120g
-- Papa/tubérculo cocido: porción estándar = 150-200g
-- Menestras/legumbres cocidas: porción estándar = 120-160g
-- Pan: una unidad = 30-50g
-- Huevo: una unidad = 50-60g
-- Pasta cocida: porción estándar = 180-220g
-- Sopa/caldo: un plato = 300-400ml
+{PORTION_REFERENCES}
 
 REGLA DE ORO: Si el alimento cubre ~1/4 del plato, usa el extremo inferior del rango. Si cubre ~1/2, usa el extremo superior.
 
@@ -101,28 +192,28 @@ REGLA DE ORO: Si el alimento cubre ~1/4 del plato, usa el extremo inferior del r
 - 0.5-0.6: Alimento difícil de identificar con certeza
 
 ## FORMATO DE RESPUESTA (SOLO JSON, SIN TEXTO):
-{
+{{
   "foods": [
-    {
+    {{
       "name": "nombre del alimento en español",
       "estimated_grams": número_entero,
       "preparation": "tipo de preparación",
       "confidence": 0.0 a 1.0
-    }
+    }}
   ],
   "meal_description": "descripción breve del plato"
-}
+}}
 
 ## EJEMPLO - Almuerzo peruano típico:
-{
+{{
   "foods": [
-    {"name": "arroz blanco", "estimated_grams": 180, "preparation": "cocido", "confidence": 0.95},
-    {"name": "pollo guisado", "estimated_grams": 140, "preparation": "guisado", "confidence": 0.85},
-    {"name": "papa amarilla", "estimated_grams": 120, "preparation": "sancochado", "confidence": 0.80},
-    {"name": "ensalada criolla", "estimated_grams": 60, "preparation": "crudo", "confidence": 0.75}
+    {{"name": "arroz blanco", "estimated_grams": 180, "preparation": "cocido", "confidence": 0.95}},
+    {{"name": "pollo guisado", "estimated_grams": 140, "preparation": "guisado", "confidence": 0.85}},
+    {{"name": "papa amarilla", "estimated_grams": 120, "preparation": "sancochado", "confidence": 0.80}},
+    {{"name": "ensalada criolla", "estimated_grams": 60, "preparation": "crudo", "confidence": 0.75}}
   ],
   "meal_description": "Almuerzo de arroz con pollo guisado, papa y ensalada"
-}
+}}
 
 IMPORTANTE: Sé CONSERVADOR y CONSISTENTE. Ante la duda, usa las porciones estándar listadas arriba.
 SOLO devuelve el JSON. Sin explicaciones ni texto adicional.
@@ -177,55 +268,201 @@ IMPORTANTE: Los gramos estimados deben sumar ~{total_weight_g}g.
 SOLO devuelve el JSON. Sin explicaciones ni texto adicional.
 """
 
-    async def analyze_food_image(self, image_bytes: bytes, scaled_weight_g: Optional[int] = None, additional_context: Optional[str] = None) -> FoodAnalysisResult:
+    def _build_compact_prompt(self, scaled_weight_g: Optional[int], additional_context: Optional[str] = None) -> str:
+        """Short prompt for compact mode: the response schema replaces the format prose and example"""
+        
+        context_block = ""
+        if additional_context:
+            context_block = f"\nIncluye OBLIGATORIAMENTE como alimento adicional esta información confirmada por el usuario: {additional_context}"
+        
+        output_block = "Responde solo JSON: f=alimentos (n=nombre en español, g=gramos enteros, p=preparación, c=confianza 0-1), d=descripción breve del plato."
+        
+        if scaled_weight_g and scaled_weight_g > 0:
+            return f"""Eres nutricionista experto en composición de alimentos.{context_block}
+Peso total en balanza: exactamente {scaled_weight_g}g. Identifica cada alimento visible (platos peruanos por su nombre) y su preparación, estima su porcentaje del total y calcula sus gramos; deben sumar ~{scaled_weight_g}g.
+{output_block}"""
+        
+        return f"""Eres nutricionista experto en porciones latinoamericanas.{context_block}
+Identifica cada alimento visible (platos peruanos por su nombre) y su preparación (cocido, frito, a la plancha, crudo, sancochado, al horno, salteado).
+Estima gramos tomando un plato estándar de ~26cm como referencia y estas porciones:
+{PORTION_REFERENCES}
+Si cubre ~1/4 del plato usa el extremo inferior del rango; si cubre ~1/2, el superior. Ante la duda, sé conservador.
+Confianza: 0.9-1.0 claro, 0.7-0.8 parcialmente oculto, 0.5-0.6 incierto.
+{output_block}"""
+
+    def _build_prompt(self, scaled_weight_g: Optional[int], additional_context: Optional[str]) -> str:
+        """Select the prompt: exact scale weight if provided, else visual estimation"""
+        if self.output_mode == OUTPUT_MODE_COMPACT:
+            return self._build_compact_prompt(scaled_weight_g, additional_context)
+        if scaled_weight_g and scaled_weight_g > 0:
+            return self._build_scale_prompt(scaled_weight_g, additional_context)
+        return self._build_analysis_prompt(additional_context)
+    
+    def _parse_response(self, response_text: str) -> FoodAnalysisResult:
+        """
+        Parse and validate the model's JSON answer (verbose or compact keys)
+        
+        Cheap local repairs are tried before giving up: markdown fences,
+        prose around the JSON object and trailing commas.
+        
+        Raises:
+            ResponseParseError: If the answer is not a valid analysis
+        """
+        # Remove markdown code blocks if present
+        response_text = _CODE_FENCE.sub('', response_text.strip())
+        
+        # Parse JSON
+        try:
+            result_dict = json.loads(response_text)
+        except json.JSONDecodeError:
+            start, end = response_text.find('{'), response_text.rfind('}')
+            try:
+                result_dict = json.loads(_TRAILING_COMMA.sub(r'\1', response_text[start:end + 1]))
+            except json.JSONDecodeError:
+                raise ResponseParseError(f"Failed to parse Gemini response as JSON: {response_text[:200]}")
+        
+        # Validate and create result object
+        try:
+            return FoodAnalysisResult(**expand_analysis(result_dict))
+        except (TypeError, ValidationError) as e:
+            raise ResponseParseError(f"Gemini response does not match the analysis format: {e}")
+    
+    async def _generate(self, prompt: str, img: Image.Image, digest: str) -> ModelResponse:
+        """One backend call, recorded under the current output mode"""
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        response = await self.backend.generate(prompt, img, digest, self.response_schema)
+        self.usage.record_call(self.output_mode, loop.time() - started, response.output_tokens)
+        return response
+    
+    async def analyze_food_image(self, image_bytes: bytes, scaled_weight_g: Optional[int] = None, additional_context: Optional[str] = None, prepared: Optional[PreparedImage] = None) -> FoodAnalysisResult:
         """
         Analyze food image using Gemini Vision
         
         Args:
             image_bytes: Raw image bytes
+            prepared: Already prepared image (skips decoding image_bytes again)
             
         Returns:
             FoodAnalysisResult with detected foods
             
         Raises:
+            CircuitOpenError: If the model endpoint is currently considered down
+            DeadlineExceededError: If the model did not answer in time
             Exception: If analysis fails
         """
         try:
             # Prepare image
-            img = self._prepare_image(image_bytes)
+            if prepared is None:
+                prepared = await self.prepare_image(image_bytes)
+            img = prepared.image
+            prompt = self._build_prompt(scaled_weight_g, additional_context)
+            digest = prepared.digest or hashlib.sha256(image_bytes).hexdigest()
             
-            # Select prompt based on mode
-            if scaled_weight_g and scaled_weight_g > 0:
-                prompt = self._build_scale_prompt(scaled_weight_g, additional_context)
-            else:
-                prompt = self._build_analysis_prompt(additional_context)
+            # Call the vision backend, bounded by deadline, retries and circuit breaker;
+            # unparseable answers are re-asked at most repair_attempts times
+            attempt = 0
+            while True:
+                response = await self.resilience.call(
+                    lambda: self._generate(prompt, img, digest)
+                )
+                try:
+                    return self._parse_response(response.text)
+                except ResponseParseError:
+                    repairing = attempt < self.repair_attempts
+                    self.usage.record_parse_failure(self.output_mode, repaired=repairing)
+                    if not repairing:
+                        raise
+                    attempt += 1
+                    if attempt == 1:
+                        prompt += REPAIR_INSTRUCTION
             
-            # Call Gemini Vision API (async with new google-genai SDK)
-            response = await self.client.aio.models.generate_content(
-                model=self.model_name,
-                contents=[prompt, img]
-            )
+        except (CircuitOpenError, DeadlineExceededError):
+            raise
+        except Exception as e:
+            raise Exception(f"Food analysis failed: {str(e)}")
+    
+    async def stream_food_analysis(self, image_bytes: bytes, scaled_weight_g: Optional[int] = None, additional_context: Optional[str] = None, prepared: Optional[PreparedImage] = None) -> AsyncIterator[Union[DetectedFood, FoodAnalysisResult]]:
+        """
+        Analyze food image, yielding each detected food as soon as it is complete
+        
+        The response is streamed from the backend and parsed incrementally.
+        Opening the stream (up to its first chunk) goes through the usual
+        retry/breaker policy; once text has been received the call is no
+        longer retried. The overall deadline still applies. Foods already
+        yielded cannot be taken back, so a streamed answer is never re-asked.
+        
+        Args:
+            image_bytes: Raw image bytes
+            prepared: Already prepared image (skips decoding image_bytes again)
             
-            # Extract JSON from response
-            response_text = response.text.strip()
+        Yields:
+            Each DetectedFood in order, then the complete FoodAnalysisResult last
             
-            # Remove markdown code blocks if present
-            if response_text.startswith('```json'):
-                response_text = response_text.replace('```json', '').replace('```', '').strip()
-            elif response_text.startswith('```'):
-                response_text = response_text.replace('```', '').strip()
+        Raises:
+            CircuitOpenError: If the model endpoint is currently considered down
+            DeadlineExceededError: If the model did not answer in time
+            Exception: If analysis fails
+        """
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        
+        try:
+            if prepared is None:
+                prepared = await self.prepare_image(image_bytes)
+            img = prepared.image
+            prompt = self._build_prompt(scaled_weight_g, additional_context)
+            digest = prepared.digest or hashlib.sha256(image_bytes).hexdigest()
             
-            # Parse JSON
-            try:
-                result_dict = json.loads(response_text)
-            except json.JSONDecodeError as e:
-                raise Exception(f"Failed to parse Gemini response as JSON: {response_text[:200]}")
+            async def open_stream() -> Tuple[str, AsyncIterator[str]]:
+                stream = self.backend.generate_stream(prompt, img, digest, self.response_schema)
+                try:
+                    first_chunk = await stream.__anext__()
+                except StopAsyncIteration:
+                    first_chunk = ''
+                except BaseException:
+                    await stream.aclose()
+                    raise
+                return first_chunk, stream
+            
+            first_chunk, stream = await self.resilience.call(open_stream, record_latency=False)
+            compact = self.output_mode == OUTPUT_MODE_COMPACT
+            parser = IncrementalArrayParser(COMPACT_FOODS_KEY if compact else 'foods')
             
-            # Validate and create result object
-            result = FoodAnalysisResult(**result_dict)
+            def detected(item: Dict) -> DetectedFood:
+                return DetectedFood(**(expand_food(item) if compact else item))
             
-            return result
+            try:
+                for item in parser.feed(first_chunk):
+                    yield detected(item)
+                
+                # The deadline is enforced per chunk: a timeout scope left
+                # open across yields would cancel whichever task consumed
+                # the first food, not the one reading the stream now
+                while True:
+                    remaining = self.resilience.deadline_seconds - (loop.time() - started)
+                    try:
+                        chunk = await asyncio.wait_for(anext(stream), max(0.0, remaining))
+                    except StopAsyncIteration:
+                        break
+                    for item in parser.feed(chunk):
+                        yield detected(item)
+            except TimeoutError:
+                raise DeadlineExceededError(
+                    f"Model call exceeded {self.resilience.deadline_seconds:.0f}s deadline"
+                )
+            finally:
+                await stream.aclose()
+            
+            self.usage.record_call(self.output_mode, loop.time() - started, None)
+            try:
+                yield self._parse_response(parser.text)
+            except ResponseParseError:
+                self.usage.record_parse_failure(self.output_mode, repaired=False)
+                raise
             
+        except (CircuitOpenError, DeadlineExceededError):
+            raise
         except Exception as e:
             raise Exception(f"Food analysis failed: {str(e)}")
     
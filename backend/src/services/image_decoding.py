@@ -0,0 +1,115 @@
+"""Safe, size-limited decoding of uploaded meal photos"""
+import io
+import warnings
+from typing import Tuple
+
+from fastapi import UploadFile
+from PIL import Image, UnidentifiedImageError
+
+
+UPLOAD_CHUNK_BYTES = 64 * 1024
+
+
+class ImageRejectedError(Exception):
+    """Upload is not an image we are willing to process"""
+    status_code = 400
+
+
+class ImageTooLargeError(ImageRejectedError):
+    """Upload exceeds the byte or pixel limits"""
+    status_code = 413
+
+
+async def read_upload_limited(upload: UploadFile, max_bytes: int) -> bytes:
+    """
+    Read an uploaded file in chunks, aborting as soon as it exceeds max_bytes
+
+    Args:
+        upload: FastAPI upload
+        max_bytes: Maximum accepted size in bytes
+
+    Returns:
+        File contents
+
+    Raises:
+        ImageTooLargeError: If the upload is larger than max_bytes
+    """
+    if upload.size is not None and upload.size > max_bytes:
+        raise ImageTooLargeError(f"Image larger than {max_bytes // (1024 * 1024)} MB")
+
+    chunks = []
+    total = 0
+    while True:
+        chunk = await upload.read(UPLOAD_CHUNK_BYTES)
+        if not chunk:
+            break
+        total += len(chunk)
+        if total > max_bytes:
+            raise ImageTooLargeError(f"Image larger than {max_bytes // (1024 * 1024)} MB")
+        chunks.append(chunk)
+    return b''.join(chunks)
+
+
+def target_size(size: Tuple[int, int], max_size: int) -> Tuple[int, int]:
+    """Size after shrinking so the longest side is at most max_size"""
+    if max(size) <= max_size:
+        return size
+    ratio = max_size / max(size)
+    return tuple(max(1, int(dim * ratio)) for dim in size)
+
+
+def decode_image(image_bytes: bytes, max_size: int, max_pixels: int) -> Image.Image:
+    """
+    Decode an image straight to (close to) its final size
+
+    Only the header is parsed before the pixel-count check, so oversized or
+    decompression-bomb images are rejected before any pixel data is
+    decoded. JPEGs are then decoded at 1/2, 1/4 or 1/8 scale via draft(),
+    and the remaining downscale uses reduce() before the final LANCZOS
+    resample.
+
+    Args:
+        image_bytes: Raw image bytes
+        max_size: Maximum dimension (width or height) of the result
+        max_pixels: Maximum width * height of the source image
+
+    Returns:
+        RGB image whose longest side is at most max_size
+
+    Raises:
+        ImageRejectedError: If the data is not a decodable image
+        ImageTooLargeError: If the image has more than max_pixels pixels
+    """
+    try:
+        with warnings.catch_warnings():
+            # We enforce our own (stricter) pixel limit below
+            warnings.simplefilter('ignore', Image.DecompressionBombWarning)
+            img = Image.open(io.BytesIO(image_bytes))
+    except Image.DecompressionBombError:
+        raise ImageTooLargeError("Image dimensions too large")
+    except (UnidentifiedImageError, OSError, ValueError):
+        raise ImageRejectedError("File is not a supported image")
+
+    width, height = img.size
+    if width * height > max_pixels:
+        raise ImageTooLargeError(f"Image has more than {max_pixels} pixels")
+
+    new_size = target_size(img.size, max_size)
+
+    try:
+        if new_size != img.size:
+            # No-op for formats other than JPEG
+            img.draft('RGB', new_size)
+
+        # Convert to RGB if needed (handle PNG with alpha, etc.)
+        if img.mode != 'RGB':
+            img = img.convert('RGB')
+
+        if img.size != new_size:
+            img = img.resize(new_size, Image.Resampling.LANCZOS, reducing_gap=3.0)
+        else:
+            img.load()
+    except (OSError, ValueError, SyntaxError):
+        raise ImageRejectedError("Image data is corrupt or truncated")
+
+    return img
@@ -0,0 +1,180 @@
+"""Perceptual hashing and near-duplicate lookup for meal photos"""
+import threading
+import time
+from collections import deque
+from itertools import combinations
+from typing import Any, Callable, Deque, Dict, List, Optional, Set, Tuple
+
+from PIL import Image
+
+
+HASH_BITS = 64
+
+
+def dhash(img: Image.Image, hash_size: int = 8) -> int:
+    """
+    Compute a difference hash (dHash) of an image
+
+    The image is reduced to a (hash_size + 1) x hash_size grayscale thumbnail
+    and each bit records whether a pixel is brighter than its right neighbour.
+    Recompression, rescaling and small shifts barely change the result.
+
+    Args:
+        img: PIL image (any mode)
+        hash_size: Hash side length; 8 gives a 64-bit hash
+
+    Returns:
+        Hash as an unsigned integer
+    """
+    thumb = img.convert('L').resize((hash_size + 1, hash_size), Image.Resampling.BILINEAR)
+    pixels = thumb.tobytes()
+    width = hash_size + 1
+
+    value = 0
+    for row in range(hash_size):
+        offset = row * width
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+def hamming_distance(a: int, b: int) -> int:
+    """Number of differing bits between two hashes"""
+    return (a ^ b).bit_count()
+
+
+class NearDuplicateIndex:
+    """
+    In-memory multi-index hash (MIH) table for Hamming-distance search
+
+    Each 64-bit hash is split into ``chunks`` substrings, each indexed in its
+    own dict. By the pigeonhole principle, two hashes within distance ``r``
+    agree within ``r // chunks`` bits on at least one substring, so a lookup
+    probes only the few substring neighbours instead of scanning all entries.
+    Buckets are keyed by (owner, substring), so a lookup only ever touches
+    the owner's own entries. Entries expire after a time window.
+    """
+
+    def __init__(
+        self,
+        max_distance: int = 6,
+        window_seconds: float = 900,
+        max_entries: int = 100_000,
+        chunks: int = 4,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        """
+        Initialize index
+
+        Args:
+            max_distance: Largest Hamming distance considered a near-duplicate
+            window_seconds: How long an entry can be matched after insertion
+            max_entries: Upper bound on stored entries (oldest evicted first)
+            chunks: Number of hash substrings (must divide 64)
+            clock: Monotonic time source (injectable for tests)
+        """
+        if HASH_BITS % chunks:
+            raise ValueError("chunks must divide 64")
+
+        self.max_distance = max_distance
+        self.window_seconds = window_seconds
+        self.max_entries = max_entries
+        self._clock = clock
+        self._chunks = chunks
+        self._chunk_bits = HASH_BITS // chunks
+        self._chunk_mask = (1 << self._chunk_bits) - 1
+        self._probe_radius = max_distance // chunks
+        self._probe_masks = self._build_probe_masks()
+
+        self._lock = threading.Lock()
+        self._tables: List[Dict[Tuple[str, int], Set[int]]] = [{} for _ in range(chunks)]
+        # entry_id -> (hash, owner, inserted_at, payload)
+        self._entries: Dict[int, Tuple[int, str, float, Any]] = {}
+        self._order: Deque[Tuple[float, int]] = deque()
+        self._next_id = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add(self, image_hash: int, owner: str, payload: Any) -> None:
+        """Insert a hash with its payload for an owner"""
+        if self.max_entries <= 0:
+            return
+
+        now = self._clock()
+        with self._lock:
+            self._expire(now)
+
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = (image_hash, owner, now, payload)
+            self._order.append((now, entry_id))
+            for table, chunk in zip(self._tables, self._split(image_hash)):
+                table.setdefault((owner, chunk), set()).add(entry_id)
+
+            while len(self._entries) > self.max_entries:
+                _, oldest_id = self._order.popleft()
+                self._remove(oldest_id)
+
+    def find(self, image_hash: int, owner: str) -> Optional[Tuple[Any, int]]:
+        """
+        Find the closest recent entry of an owner within max_distance
+
+        Returns:
+            Tuple of (payload, distance) or None if there is no near-duplicate
+        """
+        now = self._clock()
+        with self._lock:
+            self._expire(now)
+
+            best: Optional[Tuple[Any, int]] = None
+            seen: Set[int] = set()
+            for table, chunk in zip(self._tables, self._split(image_hash)):
+                for mask in self._probe_masks:
+                    for entry_id in table.get((owner, chunk ^ mask), ()):
+                        if entry_id in seen:
+                            continue
+                        seen.add(entry_id)
+
+                        stored_hash, _, _, payload = self._entries[entry_id]
+                        distance = hamming_distance(image_hash, stored_hash)
+                        if distance <= self.max_distance and (
+                            best is None or distance < best[1]
+                        ):
+                            best = (payload, distance)
+            return best
+
+    def _build_probe_masks(self) -> List[int]:
+        """All chunk bit-flip masks with at most probe_radius bits set"""
+        masks = []
+        for radius in range(self._probe_radius + 1):
+            for bits in combinations(range(self._chunk_bits), radius):
+                mask = 0
+                for bit in bits:
+                    mask |= 1 << bit
+                masks.append(mask)
+        return masks
+
+    def _split(self, image_hash: int) -> List[int]:
+        return [
+            (image_hash >> (i * self._chunk_bits)) & self._chunk_mask
+            for i in range(self._chunks)
+        ]
+
+    def _expire(self, now: float) -> None:
+        cutoff = now - self.window_seconds
+        while self._order and self._order[0][0] <= cutoff:
+            _, entry_id = self._order.popleft()
+            self._remove(entry_id)
+
+    def _remove(self, entry_id: int) -> None:
+        entry = self._entries.pop(entry_id, None)
+        if entry is None:
+            return
+        image_hash, owner = entry[0], entry[1]
+        for table, chunk in zip(self._tables, self._split(image_hash)):
+            bucket = table.get((owner, chunk))
+            if bucket is not None:
+                bucket.discard(entry_id)
+                if not bucket:
+                    del table[(owner, chunk)]
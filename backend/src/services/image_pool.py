@@ -0,0 +1,92 @@
+"""Bounded worker pool for CPU-bound image preparation"""
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, TypeVar
+
+from .metrics import LatencyRecorder
+
+
+T = TypeVar('T')
+
+
+class ImagePoolSaturatedError(Exception):
+    """Raised when the image preparation queue is full"""
+
+
+class ImagePreparationPool:
+    """
+    Runs image decode/resize off the event loop
+
+    Uses threads rather than processes: Pillow releases the GIL while
+    decoding and resampling, and PIL images don't have to be pickled back.
+    Work beyond ``max_workers + max_queue`` pending jobs is rejected up
+    front instead of piling up behind slow uploads.
+    """
+
+    def __init__(self, max_workers: int = 2, max_queue: int = 16):
+        """
+        Initialize pool
+
+        Args:
+            max_workers: Number of decoding threads
+            max_queue: Jobs allowed to wait for a free thread
+        """
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix='image-prep'
+        )
+        self._lock = threading.Lock()
+        self._pending = 0
+        self.rejected = 0
+        self.queue_wait = LatencyRecorder()
+        self.decode_time = LatencyRecorder()
+
+    async def run(self, fn: Callable[..., T], *args) -> T:
+        """
+        Run fn(*args) on a pool thread and await its result
+
+        Raises:
+            ImagePoolSaturatedError: If the queue is already full
+        """
+        with self._lock:
+            if self._pending >= self.max_workers + self.max_queue:
+                self.rejected += 1
+                raise ImagePoolSaturatedError("Image processing queue is full")
+            self._pending += 1
+
+        submitted_at = time.perf_counter()
+
+        def timed_call() -> T:
+            started_at = time.perf_counter()
+            self.queue_wait.record(started_at - submitted_at)
+            try:
+                return fn(*args)
+            finally:
+                self.decode_time.record(time.perf_counter() - started_at)
+
+        # Release the slot when the job really finishes (or is cancelled
+        # before starting), not when the awaiting request goes away
+        future = self._executor.submit(timed_call)
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+    def _release(self, _future) -> None:
+        with self._lock:
+            self._pending -= 1
+
+    def stats(self) -> Dict:
+        """Pool counters and timings for monitoring"""
+        return {
+            'workers': self.max_workers,
+            'max_queue': self.max_queue,
+            'pending': self._pending,
+            'rejected': self.rejected,
+            'queue_wait': self.queue_wait.stats(),
+            'decode_time': self.decode_time.stats(),
+        }
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False)
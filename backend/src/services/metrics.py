@@ -0,0 +1,124 @@
+"""Lightweight in-process latency metrics"""
+import threading
+from collections import deque
+from typing import Deque, Dict, Optional
+
+
+class LatencyRecorder:
+    """
+    Records durations and reports count, mean, max and recent percentiles
+
+    Percentiles are computed over a sliding window of the most recent
+    samples, so they follow current behaviour rather than all-time history.
+    """
+
+    def __init__(self, window: int = 1024):
+        self._lock = threading.Lock()
+        self._recent: Deque[float] = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds: float) -> None:
+        """Add one duration sample (in seconds)"""
+        with self._lock:
+            self._recent.append(seconds)
+            self.count += 1
+            self.total += seconds
+            if seconds > self.max:
+                self.max = seconds
+
+    def percentile(self, pct: float) -> float:
+        """Percentile (0-100) of the recent window, 0.0 if there are no samples"""
+        with self._lock:
+            samples = sorted(self._recent)
+        if not samples:
+            return 0.0
+        rank = min(len(samples) - 1, int(round(pct / 100 * (len(samples) - 1))))
+        return samples[rank]
+
+    def stats(self) -> Dict:
+        """Summary in milliseconds for monitoring"""
+        return {
+            'count': self.count,
+            'mean_ms': round(self.total / self.count * 1000, 3) if self.count else 0.0,
+            'p50_ms': round(self.percentile(50) * 1000, 3),
+            'p95_ms': round(self.percentile(95) * 1000, 3),
+            'max_ms': round(self.max * 1000, 3),
+        }
+
+
+class OutputModeRecorder:
+    """
+    Per output mode model usage: output tokens, latency, parse failures, repairs
+
+    Lets the compact schema-constrained mode be compared with the verbose
+    prompt mode on live traffic (or on the fake/replay backends).
+    """
+
+    def __init__(self, window: int = 1024):
+        self._lock = threading.Lock()
+        self._window = window
+        self._modes: Dict[str, Dict] = {}
+
+    def _mode(self, mode: str) -> Dict:
+        entry = self._modes.get(mode)
+        if entry is None:
+            entry = self._modes[mode] = {
+                'calls': 0,
+                'token_calls': 0,
+                'output_tokens': 0,
+                'parse_failures': 0,
+                'repairs': 0,
+                'latency': LatencyRecorder(self._window),
+            }
+        return entry
+
+    def record_call(self, mode: str, seconds: float, output_tokens: Optional[int]) -> None:
+        """One model call; output_tokens is None when the backend reports no usage"""
+        with self._lock:
+            entry = self._mode(mode)
+            entry['calls'] += 1
+            if output_tokens is not None:
+                entry['token_calls'] += 1
+                entry['output_tokens'] += output_tokens
+        entry['latency'].record(seconds)
+
+    def record_parse_failure(self, mode: str, repaired: bool) -> None:
+        """An answer failed to parse; repaired if a re-ask was spent on it"""
+        with self._lock:
+            entry = self._mode(mode)
+            entry['parse_failures'] += 1
+            if repaired:
+                entry['repairs'] += 1
+
+    def stats(self) -> Dict:
+        """Per-mode summary, plus compact-vs-prompt deltas once both have calls"""
+        with self._lock:
+            modes = {mode: dict(entry) for mode, entry in self._modes.items()}
+
+        summary = {}
+        for mode, entry in modes.items():
+            latency = entry.pop('latency').stats()
+            token_calls = entry.pop('token_calls')
+            entry['mean_output_tokens'] = (
+                round(entry.pop('output_tokens') / token_calls, 1) if token_calls else None
+            )
+            entry['latency'] = latency
+            summary[mode] = entry
+
+        baseline, compact = summary.get('prompt'), summary.get('compact')
+        if baseline and compact and baseline['calls'] and compact['calls']:
+            deltas = {
+                'mean_latency_ms': round(compact['latency']['mean_ms'] - baseline['latency']['mean_ms'], 3),
+                'p95_latency_ms': round(compact['latency']['p95_ms'] - baseline['latency']['p95_ms'], 3),
+            }
+            if baseline['mean_output_tokens'] and compact['mean_output_tokens'] is not None:
+                deltas['mean_output_tokens'] = round(
+                    compact['mean_output_tokens'] - baseline['mean_output_tokens'], 1
+                )
+                deltas['output_tokens_pct'] = round(
+                    100 * deltas['mean_output_tokens'] / baseline['mean_output_tokens'], 1
+                )
+            summary['compact_vs_prompt'] = deltas
+        return summary
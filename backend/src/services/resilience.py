@@ -0,0 +1,279 @@
+"""Deadlines, retries, circuit breaking and hedging for upstream model calls"""
+import asyncio
+import random
+import threading
+import time
+from typing import Awaitable, Callable, Dict, Optional, TypeVar
+
+from .metrics import LatencyRecorder
+
+
+T = TypeVar('T')
+
+
+class CircuitOpenError(Exception):
+    """Raised without calling upstream while the circuit breaker is open"""
+
+
+class DeadlineExceededError(Exception):
+    """Raised when a call (including its retries) runs past its deadline"""
+
+
+class CircuitBreaker:
+    """
+    Classic closed / open / half-open circuit breaker
+
+    After ``failure_threshold`` consecutive failures the breaker opens and
+    calls fail fast for ``reset_timeout`` seconds. Then a limited number of
+    trial calls is let through (half-open); a success closes the breaker,
+    a failure opens it again, and a cancelled trial frees its slot.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        half_open_max_calls: int = 1,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._half_open_calls = 0
+        self.successes = 0
+        self.failures = 0
+        self.rejected = 0
+        self.times_opened = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._refresh()
+            return self._state
+
+    def allow(self) -> None:
+        """
+        Reserve permission for one upstream call
+
+        Raises:
+            CircuitOpenError: If the breaker is open (or half-open and busy)
+        """
+        with self._lock:
+            self._refresh()
+            if self._state == self.OPEN or (
+                self._state == self.HALF_OPEN
+                and self._half_open_calls >= self.half_open_max_calls
+            ):
+                self.rejected += 1
+                raise CircuitOpenError("Upstream model temporarily unavailable")
+            if self._state == self.HALF_OPEN:
+                self._half_open_calls += 1
+
+    def release(self) -> None:
+        """Give back a call reserved by allow() that ended without a verdict (cancelled)"""
+        with self._lock:
+            if self._state == self.HALF_OPEN and self._half_open_calls > 0:
+                self._half_open_calls -= 1
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.successes += 1
+            self._consecutive_failures = 0
+            self._half_open_calls = 0
+            self._state = self.CLOSED
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            self._consecutive_failures += 1
+            if self._state == self.HALF_OPEN or (
+                self._consecutive_failures >= self.failure_threshold
+            ):
+                if self._state != self.OPEN:
+                    self.times_opened += 1
+                self._state = self.OPEN
+                self._opened_at = self._clock()
+                self._half_open_calls = 0
+
+    def _refresh(self) -> None:
+        if self._state == self.OPEN and self._clock() - self._opened_at >= self.reset_timeout:
+            self._state = self.HALF_OPEN
+            self._half_open_calls = 0
+
+    def stats(self) -> Dict:
+        """State and counters for monitoring"""
+        return {
+            'state': self.state,
+            'consecutive_failures': self._consecutive_failures,
+            'successes': self.successes,
+            'failures': self.failures,
+            'rejected': self.rejected,
+            'times_opened': self.times_opened,
+        }
+
+
+class ResilientCaller:
+    """
+    Wraps upstream calls with a deadline, retries, a breaker and hedging
+
+    - The deadline covers the whole call, retries and backoff included.
+    - Retryable errors (as decided by ``is_retryable``) are retried with
+      exponential backoff and full jitter, while time remains.
+    - Every attempt goes through the circuit breaker; retryable errors and
+      timeouts count as breaker failures. Other errors (e.g. bad request)
+      prove the upstream is answering and count as successes.
+    - With hedging enabled, a second identical attempt starts if the first
+      has not answered after the recent p95 latency; the first to succeed
+      wins and the other is cancelled.
+    """
+
+    def __init__(
+        self,
+        deadline_seconds: float = 60.0,
+        max_attempts: int = 3,
+        base_backoff_seconds: float = 0.5,
+        max_backoff_seconds: float = 8.0,
+        is_retryable: Optional[Callable[[BaseException], bool]] = None,
+        breaker: Optional[CircuitBreaker] = None,
+        hedge: bool = False,
+        hedge_min_delay_seconds: float = 1.0,
+        hedge_min_samples: int = 20,
+        rng: Optional[random.Random] = None
+    ):
+        self.deadline_seconds = deadline_seconds
+        self.max_attempts = max(1, max_attempts)
+        self.base_backoff_seconds = base_backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self.is_retryable = is_retryable or (lambda exc: isinstance(exc, ConnectionError))
+        self.breaker = breaker or CircuitBreaker()
+        self.hedge = hedge
+        self.hedge_min_delay_seconds = hedge_min_delay_seconds
+        self.hedge_min_samples = hedge_min_samples
+        self.latency = LatencyRecorder()
+        self._rng = rng or random.Random()
+        self.retries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.deadlines_exceeded = 0
+
+    async def call(self, fn: Callable[[], Awaitable[T]], record_latency: bool = True) -> T:
+        """
+        Call fn() with deadline, retries, breaker and hedging applied
+
+        Args:
+            fn: Zero-argument coroutine function performing one attempt
+            record_latency: Feed the attempt latency into the hedging p95
+                (off for calls that are not full round trips, e.g. opening
+                a stream)
+
+        Raises:
+            CircuitOpenError: If the breaker rejects the call
+            DeadlineExceededError: If no attempt succeeded before the deadline
+            Exception: The last upstream error if it is not retryable or
+                attempts are exhausted
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.deadline_seconds
+
+        for attempt in range(self.max_attempts):
+            self.breaker.allow()
+            remaining = deadline - loop.time()
+
+            try:
+                result = await asyncio.wait_for(self._attempt(fn, record_latency), remaining)
+            except asyncio.TimeoutError:
+                self.breaker.record_failure()
+                self.deadlines_exceeded += 1
+                raise DeadlineExceededError(
+                    f"Model call exceeded {self.deadline_seconds:.0f}s deadline"
+                )
+            except Exception as exc:
+                if not self.is_retryable(exc):
+                    self.breaker.record_success()
+                    raise
+                self.breaker.record_failure()
+
+                backoff = self._backoff(attempt)
+                if attempt + 1 >= self.max_attempts or loop.time() + backoff >= deadline:
+                    raise
+                self.retries += 1
+                await asyncio.sleep(backoff)
+                continue
+            except BaseException:
+                # Cancelled (client gone, caller timed out): says nothing
+                # about the upstream, but must not keep a half-open slot
+                self.breaker.release()
+                raise
+
+            self.breaker.record_success()
+            return result
+
+        raise AssertionError("unreachable")
+
+    def _backoff(self, attempt: int) -> float:
+        """Exponential backoff with full jitter"""
+        ceiling = min(self.max_backoff_seconds, self.base_backoff_seconds * (2 ** attempt))
+        return self._rng.uniform(0, ceiling)
+
+    def hedge_delay(self) -> Optional[float]:
+        """Seconds to wait before hedging, or None if hedging is off / not warmed up"""
+        if not self.hedge or self.latency.count < self.hedge_min_samples:
+            return None
+        return max(self.hedge_min_delay_seconds, self.latency.percentile(95))
+
+    async def _attempt(self, fn: Callable[[], Awaitable[T]], record_latency: bool = True) -> T:
+        started = time.perf_counter()
+        delay = self.hedge_delay()
+
+        if delay is None:
+            result = await fn()
+        else:
+            result = await self._hedged(fn, delay)
+
+        if record_latency:
+            self.latency.record(time.perf_counter() - started)
+        return result
+
+    async def _hedged(self, fn: Callable[[], Awaitable[T]], delay: float) -> T:
+        primary = asyncio.ensure_future(fn())
+        tasks = {primary}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done:
+                self.hedges += 1
+                tasks.add(asyncio.ensure_future(fn()))
+
+            while True:
+                done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    tasks.discard(task)
+                    if task.exception() is None:
+                        if task is not primary:
+                            self.hedge_wins += 1
+                        return task.result()
+                    if not tasks:
+                        # Every attempt failed: surface the last error
+                        raise task.exception()
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def stats(self) -> Dict:
+        """Breaker state and counters for monitoring"""
+        return {
+            'breaker': self.breaker.stats(),
+            'latency': self.latency.stats(),
+            'retries': self.retries,
+            'hedges': self.hedges,
+            'hedge_wins': self.hedge_wins,
+            'deadlines_exceeded': self.deadlines_exceeded,
+        }
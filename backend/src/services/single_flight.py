@@ -0,0 +1,62 @@
+"""Coalescing of identical concurrent async calls"""
+import asyncio
+from typing import Awaitable, Callable, Dict, Tuple, TypeVar
+
+
+T = TypeVar('T')
+
+
+class SingleFlight:
+    """
+    Runs at most one call per key at a time; concurrent callers share it
+
+    The shared call runs as its own task, and every caller awaits it
+    through asyncio.shield: a caller that is cancelled (e.g. the client
+    disconnected) stops waiting, but the call keeps running for the
+    others and still completes its side effects.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.started = 0
+        self.coalesced = 0
+
+    async def run(self, key: str, fn: Callable[[], Awaitable[T]]) -> Tuple[T, bool]:
+        """
+        Await fn() for key, joining an identical call already in flight
+
+        Args:
+            key: Identity of the call (same key = same result)
+            fn: Zero-argument coroutine function performing the call
+
+        Returns:
+            Tuple of (result, joined) where joined is True if this caller
+            reused a call started by someone else
+        """
+        task = self._inflight.get(key)
+        joined = task is not None
+
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+            self.started += 1
+        else:
+            self.coalesced += 1
+
+        return await asyncio.shield(task), joined
+
+    def _finish(self, key: str, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Mark the exception as retrieved even if every waiter went away
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> Dict:
+        """Counters for monitoring"""
+        return {
+            'in_flight': len(self._inflight),
+            'started': self.started,
+            'coalesced': self.coalesced,
+        }
@@ -0,0 +1,194 @@
+"""Typo-tolerant correction of food name words (symmetric delete / SymSpell)"""
+import hashlib
+from itertools import combinations
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+from .food_catalog import StringTable
+from .text_normalization import STOP_WORDS, fold
+
+
+def _delete_key(text: str) -> int:
+    """Stable 63-bit hash of a delete variant (same value in every process)"""
+    digest = hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'little') >> 1
+
+
+def edit_distance(a: str, b: str, max_distance: int) -> int:
+    """
+    Optimal string alignment distance (Levenshtein plus adjacent swaps)
+
+    Stops early and returns max_distance + 1 once the distance is known
+    to exceed max_distance.
+    """
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    previous2: List[int] = []
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > max_distance:
+            return max_distance + 1
+        previous2, previous = previous, current
+    return previous[len(b)]
+
+
+class SpellingIndex:
+    """
+    Symmetric-delete dictionary over catalog words
+
+    Every vocabulary word is indexed under all strings obtained by deleting
+    up to max_distance characters from its first prefix_length characters.
+    A query word generates its own deletes the same way; any vocabulary
+    word within max_distance edits shares at least one of them, so a
+    handful of lookups replaces a scan of the vocabulary. Candidates are
+    then verified with the real edit distance.
+
+    Delete variants are stored as 64-bit hashes in one sorted NumPy array
+    (a collision only adds a candidate that verification rejects), so
+    memory is 12 bytes per variant and bounded by
+    len(vocabulary) * sum(C(prefix_length, d) for d <= max_distance).
+    """
+
+    def __init__(self, words: Iterable[str], max_distance: int = 2, prefix_length: int = 7):
+        """
+        Build the index
+
+        Args:
+            words: Vocabulary occurrences (repeats count as frequency)
+            max_distance: Largest correction, in edits
+            prefix_length: Only this many leading characters generate deletes
+        """
+        self.max_distance = max_distance
+        self.prefix_length = prefix_length
+
+        frequency: Dict[str, int] = {}
+        for word in words:
+            frequency[word] = frequency.get(word, 0) + 1
+        self.vocabulary = sorted(frequency)
+        self.frequency = frequency
+
+        keys: List[int] = []
+        word_ids: List[int] = []
+        for word_id, word in enumerate(self.vocabulary):
+            for variant in self._deletes(word, max_distance):
+                keys.append(_delete_key(variant))
+                word_ids.append(word_id)
+
+        order = np.argsort(np.array(keys, dtype=np.int64), kind='stable')
+        self._keys = np.array(keys, dtype=np.int64)[order]
+        self._word_ids = np.array(word_ids, dtype=np.int32)[order]
+
+    def export_arrays(self) -> Dict[str, np.ndarray]:
+        """Index as named arrays (inverse of from_arrays)"""
+        arrays = {
+            'params': np.array([self.max_distance, self.prefix_length], dtype=np.int64),
+            'frequency': np.array([self.frequency[word] for word in self.vocabulary], dtype=np.int64),
+            'keys': self._keys,
+            'word_ids': self._word_ids,
+        }
+        arrays.update(StringTable(self.vocabulary).export_arrays('vocabulary'))
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray]) -> 'SpellingIndex':
+        """Index over exported arrays; only the vocabulary is copied into Python objects"""
+        index = cls.__new__(cls)
+        index.max_distance, index.prefix_length = (int(value) for value in arrays['params'])
+        index.vocabulary = list(StringTable.from_exported(arrays, 'vocabulary'))
+        index.frequency = dict(zip(index.vocabulary, arrays['frequency'].tolist()))
+        index._keys = arrays['keys']
+        index._word_ids = arrays['word_ids']
+        return index
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def _deletes(self, word: str, max_distance: int) -> Set[str]:
+        """The word's prefix with 0..max_distance characters deleted"""
+        prefix = word[:self.prefix_length]
+        variants = {prefix}
+        for count in range(1, min(max_distance, len(prefix)) + 1):
+            for positions in combinations(range(len(prefix)), count):
+                variants.add(''.join(ch for i, ch in enumerate(prefix) if i not in positions))
+        return variants
+
+    def allowed_distance(self, word: str) -> int:
+        """Short words tolerate fewer edits (1 up to 4 letters, none up to 2)"""
+        if len(word) <= 2:
+            return 0
+        if len(word) <= 4:
+            return min(1, self.max_distance)
+        return self.max_distance
+
+    def lookup(self, word: str) -> Optional[str]:
+        """
+        Closest vocabulary word (fewest edits, then most frequent)
+
+        Returns:
+            The word itself if known, its correction, or None if nothing
+            is within the allowed distance
+        """
+        closest = self._closest(word)
+        return closest[0] if closest else None
+
+    def _closest(self, word: str) -> Optional[Tuple[str, int]]:
+        """lookup() with the number of edits to the returned word"""
+        if word in self.frequency:
+            return (word, 0)
+        max_distance = self.allowed_distance(word)
+        if max_distance == 0 or not len(self._keys):
+            return None
+
+        query = np.array(
+            [_delete_key(variant) for variant in self._deletes(word, max_distance)],
+            dtype=np.int64
+        )
+        starts = np.searchsorted(self._keys, query, side='left')
+        ends = np.searchsorted(self._keys, query, side='right')
+        candidates = {
+            int(word_id)
+            for start, end in zip(starts, ends) if end > start
+            for word_id in self._word_ids[start:end]
+        }
+
+        best = None
+        best_key = None
+        for word_id in candidates:
+            candidate = self.vocabulary[word_id]
+            distance = edit_distance(word, candidate, max_distance)
+            if distance > max_distance:
+                continue
+            key = (distance, -self.frequency[candidate], candidate)
+            if best_key is None or key < best_key:
+                best, best_key = candidate, key
+        return (best, best_key[0]) if best is not None else None
+
+    def correct(self, text: str) -> str:
+        """Folded text with each unknown word replaced by its correction, if any"""
+        return self.correct_with_edits(text)[0]
+
+    def correct_with_edits(self, text: str) -> Tuple[str, int]:
+        """
+        correct() with the total number of edits it made
+
+        Callers use the count to trust a corrected text less: a valid word
+        missing from the catalog ("pizza") can still be within two edits of
+        an unrelated one ("pina").
+        """
+        words = []
+        edits = 0
+        for word in fold(text).split():
+            if word not in STOP_WORDS:
+                closest = self._closest(word)
+                if closest:
+                    word, distance = closest
+                    edits += distance
+            words.append(word)
+        return ' '.join(words), edits
@@ -0,0 +1,107 @@
+"""Incremental extraction of array items from a streamed JSON response"""
+import json
+from typing import Dict, List, Optional
+
+
+class IncrementalArrayParser:
+    """
+    Pulls complete objects out of a top-level JSON array while it streams
+
+    Fed the model's response text chunk by chunk, it returns every object
+    of ``{"<array_key>": [ {...}, {...} ]}`` as soon as its closing brace
+    arrives, without waiting for the rest of the document. Anything before
+    the first '{' (e.g. a markdown code fence) is ignored. Each character
+    is scanned exactly once, so total work is linear in the response size.
+    """
+
+    def __init__(self, array_key: str = 'foods'):
+        self.array_key = array_key
+        self._chunks: List[str] = []
+        self._buffer = ''
+        self._pos = 0
+        self._started = False
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._string_start = 0
+        self._last_key: Optional[str] = None
+        self._array_depth: Optional[int] = None
+        self._item_start: Optional[int] = None
+        self.items_emitted = 0
+
+    @property
+    def text(self) -> str:
+        """Everything fed so far"""
+        return ''.join(self._chunks)
+
+    def feed(self, chunk: str) -> List[Dict]:
+        """
+        Consume the next piece of the response
+
+        Args:
+            chunk: Next fragment of response text
+
+        Returns:
+            Objects of the array completed by this chunk, in order
+
+        Raises:
+            json.JSONDecodeError: If a completed item is not valid JSON
+        """
+        self._chunks.append(chunk)
+        self._buffer += chunk
+        completed = []
+
+        buffer = self._buffer
+        for pos in range(self._pos, len(buffer)):
+            char = buffer[pos]
+
+            if not self._started:
+                if char != '{':
+                    continue
+                self._started = True
+
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == '\\':
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        # Top-level strings: keys and values alike; the one
+                        # right before '[' is the key of that array
+                        self._last_key = buffer[self._string_start + 1:pos]
+                continue
+
+            if char == '"':
+                self._in_string = True
+                self._string_start = pos
+            elif char in '{[':
+                self._depth += 1
+                if char == '[' and self._depth == 2 and self._last_key == self.array_key:
+                    self._array_depth = 2
+                elif char == '{' and self._array_depth is not None and self._depth == 3:
+                    self._item_start = pos
+            elif char in '}]':
+                if char == '}' and self._item_start is not None and self._depth == 3:
+                    completed.append(json.loads(buffer[self._item_start:pos + 1]))
+                    self._item_start = None
+                elif char == ']' and self._array_depth is not None and self._depth == 2:
+                    self._array_depth = None
+                self._depth -= 1
+
+        self._pos = len(buffer)
+
+        # Only an unfinished item needs to be kept around
+        keep_from = self._item_start if self._item_start is not None else self._pos
+        if self._in_string and self._depth == 1:
+            keep_from = min(keep_from, self._string_start)
+        self._buffer = buffer[keep_from:]
+        self._pos -= keep_from
+        if self._item_start is not None:
+            self._item_start -= keep_from
+        if self._in_string:
+            self._string_start -= keep_from
+
+        self.items_emitted += len(completed)
+        return completed
@@ -0,0 +1,42 @@
+"""Accent- and case-folded normalization of food names for indexing and search"""
+import re
+import unicodedata
+from typing import List, Set
+
+
+# Spanish connectives that carry no meaning in a food name
+STOP_WORDS = frozenset({'de', 'con', 'en', 'la', 'el', 'a', 'al', 'y', 'o'})
+
+_NON_ALNUM = re.compile(r'[^a-z0-9]+')
+
+
+def fold(text: str) -> str:
+    """
+    Lowercase, strip accents and collapse punctuation to single spaces
+
+    "Ají de Gallina" and "aji  de gallina" both fold to "aji de gallina";
+    "Palta/Aguacate" folds to "palta aguacate". ñ folds to n.
+    """
+    decomposed = unicodedata.normalize('NFKD', text.lower())
+    stripped = ''.join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return _NON_ALNUM.sub(' ', stripped).strip()
+
+
+def tokens(text: str) -> List[str]:
+    """Folded words of a name, without stop words"""
+    return [word for word in fold(text).split() if word not in STOP_WORDS]
+
+
+def trigrams(text: str) -> Set[str]:
+    """
+    Character trigrams of each folded word, padded with one space per side
+
+    The padding makes word starts and ends count, so "pollo" and "pollito"
+    share " po", "pol" and "oll" but not the ending.
+    """
+    grams = set()
+    for word in tokens(text):
+        padded = f' {word} '
+        for i in range(len(padded) - 2):
+            grams.add(padded[i:i + 3])
+    return grams
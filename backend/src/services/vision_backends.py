@@ -0,0 +1,346 @@
+"""Vision model backends: real Gemini, a local fake, and record/replay"""
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import AsyncIterator, Dict, Optional
+
+from PIL import Image
+from google import genai
+from google.genai import types
+
+from .analysis_schema import compact_analysis
+
+
+# Returned by the fake backend unless a canned response is configured
+DEFAULT_FAKE_RESPONSE = {
+    "foods": [
+        {"name": "arroz blanco", "estimated_grams": 180, "preparation": "cocido", "confidence": 0.95},
+        {"name": "pollo guisado", "estimated_grams": 140, "preparation": "guisado", "confidence": 0.85},
+        {"name": "papa amarilla", "estimated_grams": 120, "preparation": "sancochado", "confidence": 0.80},
+        {"name": "ensalada criolla", "estimated_grams": 60, "preparation": "crudo", "confidence": 0.75}
+    ],
+    "meal_description": "Almuerzo de arroz con pollo guisado, papa y ensalada"
+}
+
+
+class RecordingNotFoundError(Exception):
+    """Replay backend has no recorded response for this image and prompt"""
+
+
+@dataclass
+class ModelResponse:
+    """Raw model answer plus its output token count (None if unknown)"""
+    text: str
+    output_tokens: Optional[int] = None
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token) for backends without usage data"""
+    return max(1, len(text) // 4)
+
+
+class VisionBackend(ABC):
+    """
+    Something that answers a prompt about an image with raw model text
+
+    GeminiVisionService handles image preparation, prompts, retries and
+    parsing; a backend only performs the model call itself.
+    """
+
+    model_name: str = 'unknown'
+
+    @abstractmethod
+    async def generate(
+        self,
+        prompt: str,
+        image: Image.Image,
+        image_digest: str,
+        response_schema: Optional[Dict] = None
+    ) -> ModelResponse:
+        """
+        Run the model on one image
+
+        Args:
+            prompt: Full analysis prompt
+            image: Prepared (downscaled RGB) image
+            image_digest: Stable hex digest identifying the uploaded image
+            response_schema: If set, constrain the answer to JSON of this schema
+
+        Returns:
+            Raw response text (expected to contain the analysis JSON) and usage
+        """
+
+    async def generate_stream(
+        self,
+        prompt: str,
+        image: Image.Image,
+        image_digest: str,
+        response_schema: Optional[Dict] = None
+    ) -> AsyncIterator[str]:
+        """
+        Run the model on one image, yielding the response text as it arrives
+
+        Backends without native streaming yield the whole response at once.
+        """
+        response = await self.generate(prompt, image, image_digest, response_schema)
+        yield response.text
+
+
+class GeminiBackend(VisionBackend):
+    """Calls the Gemini API through the google-genai SDK"""
+
+    def __init__(self, api_key: str, model_name: str = 'gemini-2.5-flash'):
+        # New google-genai SDK uses a Client object
+        self.client = genai.Client(api_key=api_key)
+        self.model_name = model_name
+
+    @staticmethod
+    def _config(response_schema: Optional[Dict]) -> Optional[types.GenerateContentConfig]:
+        if response_schema is None:
+            return None
+        return types.GenerateContentConfig(
+            response_mime_type='application/json',
+            response_schema=response_schema
+        )
+
+    async def generate(
+        self,
+        prompt: str,
+        image: Image.Image,
+        image_digest: str,
+        response_schema: Optional[Dict] = None
+    ) -> ModelResponse:
+        response = await self.client.aio.models.generate_content(
+            model=self.model_name,
+            contents=[prompt, image],
+            config=self._config(response_schema)
+        )
+        usage = response.usage_metadata
+        return ModelResponse(
+            text=response.text or '',
+            output_tokens=usage.candidates_token_count if usage else None
+        )
+
+    async def generate_stream(
+        self,
+        prompt: str,
+        image: Image.Image,
+        image_digest: str,
+        response_schema: Optional[Dict] = None
+    ) -> AsyncIterator[str]:
+        stream = await self.client.aio.models.generate_content_stream(
+            model=self.model_name,
+            contents=[prompt, image],
+            config=self._config(response_schema)
+        )
+        async for chunk in stream:
+            if chunk.text:
+                yield chunk.text
+
+
+class FakeVisionBackend(VisionBackend):
+    """
+    Deterministic offline backend for load tests and benchmarks
+
+    Always answers with the same canned JSON after a configurable delay,
+    in the compact layout when a response schema is requested. Token
+    counts are estimated from the text length.
+
+    The optional jitter is derived from the image digest, so a given
+    image always takes the same time and benchmark runs are repeatable.
+    When streaming, the delay is spread evenly over chunks of
+    ``stream_chunk_chars`` characters.
+    """
+
+    model_name = 'fake'
+
+    def __init__(
+        self,
+        latency_seconds: float = 0.0,
+        jitter_seconds: float = 0.0,
+        response: Optional[Dict] = None,
+        stream_chunk_chars: int = 48
+    ):
+        self.latency_seconds = latency_seconds
+        self.jitter_seconds = jitter_seconds
+        self.stream_chunk_chars = max(1, stream_chunk_chars)
+        response = response or DEFAULT_FAKE_RESPONSE
+        self.response_text = json.dumps(response, ensure_ascii=False)
+        self.compact_response_text = json.dumps(
+            compact_analysis(response), ensure_ascii=False, separators=(',', ':')
+        )
+        self.calls = 0
+
+    @classmethod
+    def from_file(cls, path: str, **kwargs) -> 'FakeVisionBackend':
+        """Load the canned response from a JSON file"""
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(response=json.load(f), **kwargs)
+
+    def latency_for(self, image_digest: str) -> float:
+        """Simulated latency for an image"""
+        if not self.jitter_seconds:
+            return self.latency_seconds
+        fraction = int(image_digest[:8] or '0', 16) / 0xFFFFFFFF
+        return self.latency_seconds + fraction * self.jitter_seconds
+
+    def text_for(self, response_schema: Optional[Dict]) -> str:
+        """Canned answer in the layout the caller asked for"""
+        return self.compact_response_text if response_schema else self.response_text
+
+    async def generate(
+        self,
+        prompt: str,
+        image: Image.Image,
+        image_digest: str,
+        response_schema: Optional[Dict] = None
+    ) -> ModelResponse:
+        self.calls += 1
+        latency = self.latency_for(image_digest)
+        if latency > 0:
+            await asyncio.sleep(latency)
+        text = self.text_for(response_schema)
+        return ModelResponse(text=text, output_tokens=estimate_tokens(text))
+
+    async def generate_stream(
+        self,
+        prompt: str,
+        image: Image.Image,
+        image_digest: str,
+        response_schema: Optional[Dict] = None
+    ) -> AsyncIterator[str]:
+        self.calls += 1
+        text = self.text_for(response_schema)
+        size = self.stream_chunk_chars
+        chunks = [text[i:i + size] for i in range(0, len(text), size)]
+        delay = self.latency_for(image_digest) / len(chunks)
+        for chunk in chunks:
+            if delay > 0:
+                await asyncio.sleep(delay)
+            yield chunk
+
+
+class RecordReplayBackend(VisionBackend):
+    """
+    Records real model responses to disk, or replays them offline
+
+    Responses are stored one JSON file per call, keyed by the image digest,
+    the exact prompt and the response schema, so a prompt or schema change
+    never replays a stale answer.
+    In 'record' mode every call goes to the inner backend and is saved; in
+    'replay' mode only saved responses are served (all loaded into memory
+    up front) and unknown calls raise RecordingNotFoundError.
+    """
+
+    RECORD = 'record'
+    REPLAY = 'replay'
+
+    def __init__(self, directory: str, mode: str = REPLAY, inner: Optional[VisionBackend] = None):
+        if mode not in (self.RECORD, self.REPLAY):
+            raise ValueError(f"Unknown record/replay mode: {mode}")
+        if mode == self.RECORD and inner is None:
+            raise ValueError("Record mode needs a backend to record from")
+
+        self.directory = directory
+        self.mode = mode
+        self.inner = inner
+        self.model_name = inner.model_name if inner is not None else 'replay'
+        self.recordings: Dict[str, ModelResponse] = {}
+        self.hits = 0
+        self.misses = 0
+
+        if mode == self.REPLAY:
+            self._load()
+
+    @staticmethod
+    def recording_key(image_digest: str, prompt: str, response_schema: Optional[Dict] = None) -> str:
+        """Stable key for one (image, prompt, schema) call"""
+        parts = [image_digest, prompt]
+        if response_schema is not None:
+            parts.append(json.dumps(response_schema, sort_keys=True))
+        h = hashlib.sha256()
+        for part in parts:
+            h.update(part.encode('utf-8'))
+            h.update(b'\x00')
+        return h.hexdigest()
+
+    def _load(self) -> None:
+        if not os.path.isdir(self.directory):
+            return
+        for filename in os.listdir(self.directory):
+            if not filename.endswith('.json'):
+                continue
+            with open(os.path.join(self.directory, filename), 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+            self.recordings[entry['key']] = ModelResponse(
+                text=entry['text'], output_tokens=entry.get('output_tokens')
+            )
+            # Replays answer for whichever model made the recordings
+            self.model_name = entry.get('model', self.model_name)
+
+    def _save(self, key: str, entry: Dict) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        # Write-then-rename so a crash never leaves a half-written recording
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(entry, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, os.path.join(self.directory, f'{key}.json'))
+
+    async def generate(
+        self,
+        prompt: str,
+        image: Image.Image,
+        image_digest: str,
+        response_schema: Optional[Dict] = None
+    ) -> ModelResponse:
+        key = self.recording_key(image_digest, prompt, response_schema)
+        if self.mode == self.REPLAY:
+            response = self.recordings.get(key)
+            if response is None:
+                self.misses += 1
+                raise RecordingNotFoundError(f"No recorded response for image {image_digest[:12]}")
+            self.hits += 1
+            return response
+
+        response = await self.inner.generate(prompt, image, image_digest, response_schema)
+        await self._record(key, prompt, image_digest, response)
+        return response
+
+    async def generate_stream(
+        self,
+        prompt: str,
+        image: Image.Image,
+        image_digest: str,
+        response_schema: Optional[Dict] = None
+    ) -> AsyncIterator[str]:
+        if self.mode == self.REPLAY:
+            response = await self.generate(prompt, image, image_digest, response_schema)
+            yield response.text
+            return
+
+        chunks = []
+        async for chunk in self.inner.generate_stream(prompt, image, image_digest, response_schema):
+            chunks.append(chunk)
+            yield chunk
+        await self._record(
+            self.recording_key(image_digest, prompt, response_schema),
+            prompt,
+            image_digest,
+            ModelResponse(text=''.join(chunks))
+        )
+
+    async def _record(self, key: str, prompt: str, image_digest: str, response: ModelResponse) -> None:
+        entry = {
+            'key': key,
+            'model': self.inner.model_name,
+            'image_digest': image_digest,
+            'prompt_sha256': hashlib.sha256(prompt.encode('utf-8')).hexdigest(),
+            'text': response.text,
+            'output_tokens': response.output_tokens,
+        }
+        await asyncio.to_thread(self._save, key, entry)
+        self.recordings[key] = response
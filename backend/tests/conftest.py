@@ -1,10 +1,48 @@
 """Test configuration and fixtures."""
 
+import io
+import os
+from typing import Callable
+
 import pytest
 from uuid import UUID
+from PIL import Image
+
+# Importing the database layer creates an engine; tests run against SQLite
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
 
 
 def pytest_configure(config):
     """Configure pytest with custom markers."""
     config.addinivalue_line("markers", "integration: mark test as integration test")
     config.addinivalue_line("markers", "unit: mark test as unit test")
+
+
+class FakeClock:
+    """Manually advanced monotonic clock."""
+
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float) -> None:
+        self.now += seconds
+
+
+@pytest.fixture
+def clock() -> FakeClock:
+    return FakeClock()
+
+
+@pytest.fixture
+def jpeg_bytes() -> Callable[[tuple[int, int, int]], bytes]:
+    """Encoder of solid-colour 64x64 JPEG photos."""
+
+    def encode(color: tuple[int, int, int]) -> bytes:
+        buffer = io.BytesIO()
+        Image.new("RGB", (64, 64), color).save(buffer, "JPEG")
+        return buffer.getvalue()
+
+    return encode
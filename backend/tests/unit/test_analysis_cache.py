@@ -0,0 +1,89 @@
+"""
+Unit Tests - Analysis Cache
+
+Content-addressed cache in front of Gemini food image analysis.
+"""
+
+from src.services.analysis_cache import AnalysisCache
+from src.services.gemini_vision import DetectedFood, FoodAnalysisResult
+
+
+def make_result(description: str = "Arroz con pollo") -> FoodAnalysisResult:
+    return FoodAnalysisResult(
+        foods=[
+            DetectedFood(
+                name="arroz blanco", estimated_grams=180, preparation="cocido", confidence=0.9
+            )
+        ],
+        meal_description=description,
+    )
+
+
+class TestAnalysisCache:
+    """Test suite for AnalysisCache."""
+
+    def test_key_depends_on_content_and_parameters(self):
+        """Same bytes and parameters share a key; anything else does not."""
+        key = AnalysisCache.make_key(b"image", 300, "2 cucharadas de aceite")
+
+        assert key == AnalysisCache.make_key(b"image", 300, "2 cucharadas de aceite ")
+        assert key != AnalysisCache.make_key(b"image2", 300, "2 cucharadas de aceite")
+        assert key != AnalysisCache.make_key(b"image", 250, "2 cucharadas de aceite")
+        assert key != AnalysisCache.make_key(b"image", 300, None)
+
+    def test_non_positive_weight_is_same_as_no_weight(self):
+        """The service ignores weights <= 0, so the cache must too."""
+        assert AnalysisCache.make_key(b"x", 0) == AnalysisCache.make_key(b"x", None)
+        assert AnalysisCache.make_key(b"x", -5) == AnalysisCache.make_key(b"x", None)
+
+    def test_hit_returns_stored_result(self, clock):
+        cache = AnalysisCache(clock=clock)
+        result = make_result()
+        cache.set("k", result)
+
+        assert cache.get("k") is result
+        assert cache.get("missing") is None
+        assert cache.stats()["hits"] == 1
+        assert cache.stats()["misses"] == 1
+
+    def test_entries_expire_after_ttl(self, clock):
+        cache = AnalysisCache(ttl_seconds=60, clock=clock)
+        cache.set("k", make_result())
+
+        clock.now = 59
+        assert cache.get("k") is not None
+
+        clock.now = 60
+        assert cache.get("k") is None
+        assert cache.stats()["entries"] == 0
+
+    def test_lru_eviction_by_entry_count(self, clock):
+        cache = AnalysisCache(max_entries=2, clock=clock)
+        cache.set("a", make_result("a"))
+        cache.set("b", make_result("b"))
+
+        # Touch "a" so "b" becomes least recently used
+        cache.get("a")
+        cache.set("c", make_result("c"))
+
+        assert cache.get("a") is not None
+        assert cache.get("b") is None
+        assert cache.get("c") is not None
+        assert cache.stats()["evictions"] == 1
+
+    def test_byte_budget_is_enforced(self, clock):
+        entry_size = len(make_result().model_dump_json()) + 1
+        cache = AnalysisCache(max_bytes=entry_size * 2, clock=clock)
+
+        for key in "abc":
+            cache.set(key, make_result())
+
+        assert cache.stats()["bytes"] <= entry_size * 2
+        assert cache.get("a") is None
+        assert cache.get("c") is not None
+
+    def test_disabled_cache_stores_nothing(self, clock):
+        cache = AnalysisCache(max_entries=0, clock=clock)
+        cache.set("k", make_result())
+
+        assert cache.get("k") is None
@@ -0,0 +1,383 @@
+"""
+Unit Tests - Analysis Job Queue
+
+Database-backed job queue and worker pool, run against SQLite.
+"""
+
+import asyncio
+import threading
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from src import main
+from src.api import food_analysis
+from src.infrastructure.auth.security import create_access_token
+from src.infrastructure.config.settings import settings
+from src.infrastructure.database.database import Base
+from src.services.analysis_jobs import (
+    AnalysisJobQueue,
+    AnalysisWorkerPool,
+    JobQueueFullError,
+)
+
+
+# Where the shared monotonic clock fixture starts, as a UTC time
+EPOCH = datetime(2026, 1, 1, 12, 0, 0)
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'jobs.db'}", connect_args={"check_same_thread": False}
+    )
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def make_queue(session_factory, clock, **kwargs) -> AnalysisJobQueue:
+    return AnalysisJobQueue(
+        session_factory, clock=lambda: EPOCH + timedelta(seconds=clock()), **kwargs
+    )
+
+
+class TestAnalysisJobQueue:
+    """Test suite for AnalysisJobQueue."""
+
+    def test_enqueue_claim_complete(self, session_factory, clock):
+        queue = make_queue(session_factory, clock)
+        job = queue.enqueue("user:1", b"image", scaled_weight_g=300)
+
+        claimed = queue.claim("worker-a")
+        assert claimed.id == job.id
+        assert claimed.image == b"image"
+        assert claimed.status == "running"
+        assert claimed.attempts == 1
+
+        assert queue.complete(job.id, "worker-a", '{"ok": true}')
+        finished = queue.get(job.id)
+        assert finished.status == "succeeded"
+        assert finished.result == '{"ok": true}'
+        assert queue.claim("worker-a") is None
+
+    def test_image_is_dropped_once_finished(self, session_factory, clock):
+        queue = make_queue(session_factory, clock)
+        job = queue.enqueue("user:1", b"image")
+        queue.claim("w")
+        queue.complete(job.id, "w", "{}")
+
+        with session_factory() as db:
+            from src.infrastructure.database.models import AnalysisJob
+
+            assert db.get(AnalysisJob, job.id).image is None
+
+    def test_higher_priority_first(self, session_factory, clock):
+        queue = make_queue(session_factory, clock, max_running_per_owner=5)
+        low = queue.enqueue("user:1", b"a", priority=0)
+        clock.advance(1)
+        high = queue.enqueue("user:2", b"b", priority=10)
+
+        assert queue.claim("w").id == high.id
+        assert queue.claim("w").id == low.id
+
+    def test_fair_across_owners(self, session_factory, clock):
+        queue = make_queue(session_factory, clock, max_running_per_owner=5)
+        burst = []
+        for _ in range(3):
+            burst.append(queue.enqueue("user:heavy", b"x").id)
+            clock.advance(1)
+        single = queue.enqueue("user:light", b"y").id
+
+        order = [queue.claim("w").id for _ in range(4)]
+
+        # The light user's job is not stuck behind the whole burst
+        assert order == [burst[0], single, burst[1], burst[2]]
+
+    def test_running_cap_per_owner(self, session_factory, clock):
+        queue = make_queue(session_factory, clock, max_running_per_owner=1)
+        first = queue.enqueue("user:1", b"a")
+        clock.advance(1)
+        queue.enqueue("user:1", b"b")
+
+        assert queue.claim("w").id == first.id
+        assert queue.claim("w") is None
+
+        queue.complete(first.id, "w", "{}")
+        assert queue.claim("w") is not None
+
+    def test_pending_cap_per_owner(self, session_factory, clock):
+        queue = make_queue(session_factory, clock, max_pending_per_owner=2)
+        queue.enqueue("user:1", b"a")
+        queue.enqueue("user:1", b"b")
+
+        with pytest.raises(JobQueueFullError):
+            queue.enqueue("user:1", b"c")
+        queue.enqueue("user:2", b"d")
+
+    def test_expired_lease_is_recovered(self, session_factory, clock):
+        queue = make_queue(session_factory, clock, lease_seconds=60)
+        job = queue.enqueue("user:1", b"a")
+        queue.claim("crashed-worker")
+
+        clock.advance(30)
+        assert queue.recover_expired() == 0
+        clock.advance(31)
+        assert queue.recover_expired() == 1
+
+        reclaimed = queue.claim("new-worker")
+        assert reclaimed.id == job.id
+        assert reclaimed.attempts == 2
+        # The crashed worker can no longer report on it
+        assert not queue.complete(job.id, "crashed-worker", "{}")
+        assert queue.complete(job.id, "new-worker", "{}")
+
+    def test_heartbeat_keeps_lease(self, session_factory, clock):
+        queue = make_queue(session_factory, clock, lease_seconds=60)
+        job = queue.enqueue("user:1", b"a")
+        queue.claim("w")
+
+        for _ in range(5):
+            clock.advance(40)
+            assert queue.heartbeat(job.id, "w")
+            assert queue.recover_expired() == 0
+
+    def test_retryable_failure_backs_off_then_fails(self, session_factory, clock):
+        queue = make_queue(session_factory, clock, max_attempts=2, retry_backoff_seconds=10)
+        job = queue.enqueue("user:1", b"a")
+
+        queue.claim("w")
+        assert queue.fail(job.id, "w", "upstream down", 503, retryable=True) == "queued"
+        assert queue.claim("w") is None  # still backing off
+        clock.advance(10)
+        assert queue.claim("w").id == job.id
+        assert queue.fail(job.id, "w", "upstream down", 503, retryable=True) == "failed"
+
+        failed = queue.get(job.id)
+        assert failed.error == "upstream down"
+        assert failed.error_status == 503
+
+    def test_non_retryable_failure_is_final(self, session_factory, clock):
+        queue = make_queue(session_factory, clock)
+        job = queue.enqueue("user:1", b"a")
+        queue.claim("w")
+
+        assert queue.fail(job.id, "w", "not an image", 400) == "failed"
+
+    def test_repeatedly_interrupted_job_is_failed(self, session_factory, clock):
+        queue = make_queue(session_factory, clock, max_attempts=1, lease_seconds=10)
+        job = queue.enqueue("user:1", b"a")
+        queue.claim("w")
+        clock.advance(11)
+
+        queue.recover_expired()
+
+        assert queue.get(job.id).status == "failed"
+
+    def test_purge_finished(self, session_factory, clock):
+        queue = make_queue(session_factory, clock)
+        job = queue.enqueue("user:1", b"a")
+        queue.claim("w")
+        queue.complete(job.id, "w", "{}")
+        clock.advance(100)
+
+        assert queue.purge_finished(older_than_seconds=200) == 0
+        assert queue.purge_finished(older_than_seconds=50) == 1
+        assert queue.get(job.id) is None
+
+    def test_concurrent_workers_never_share_a_job(self, session_factory, clock):
+        queue = make_queue(session_factory, clock, max_running_per_owner=100)
+        for i in range(40):
+            queue.enqueue(f"user:{i % 4}", b"x")
+        claimed, lock = [], threading.Lock()
+
+        def work(worker_id):
+            while True:
+                job = queue.claim(worker_id)
+                if job is None:
+                    return
+                with lock:
+                    claimed.append(job.id)
+
+        threads = [threading.Thread(target=work, args=(f"w{i}",)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(claimed) == 40
+        assert len(set(claimed)) == 40
+
+
+class TestAnalysisWorkerPool:
+    """Test suite for AnalysisWorkerPool."""
+
+    async def test_processes_jobs_and_long_poll_returns_result(self, session_factory):
+        queue = AnalysisJobQueue(session_factory)
+
+        async def handler(job):
+            await asyncio.sleep(0.01)
+            return f'{{"size": {len(job.image)}}}'
+
+        pool = AnalysisWorkerPool(queue, handler, concurrency=2, poll_interval_seconds=0.05)
+        await pool.start()
+        try:
+            job = queue.enqueue("user:1", b"12345")
+            pool.notify()
+
+            finished = await pool.wait_for_job(job.id, timeout=5)
+        finally:
+            await pool.stop()
+
+        assert finished.status == "succeeded"
+        assert finished.result == '{"size": 5}'
+
+    async def test_long_poll_times_out_while_queued(self, session_factory):
+        queue = AnalysisJobQueue(session_factory)
+        pool = AnalysisWorkerPool(queue, handler=None, poll_interval_seconds=0.01)
+        job = queue.enqueue("user:1", b"x")
+
+        polled = await pool.wait_for_job(job.id, timeout=0.05)
+
+        assert polled.status == "queued"
+        assert await pool.wait_for_job("missing", timeout=0) is None
+
+    async def test_handler_errors_are_recorded(self, session_factory):
+        queue = AnalysisJobQueue(session_factory)
+
+        async def handler(job):
+            raise ValueError("broken photo")
+
+        pool = AnalysisWorkerPool(
+            queue, handler, poll_interval_seconds=0.05,
+            describe_error=lambda exc: (400, str(exc)),
+        )
+        await pool.start()
+        try:
+            job = queue.enqueue("user:1", b"x")
+            pool.notify()
+            finished = await pool.wait_for_job(job.id, timeout=5)
+        finally:
+            await pool.stop()
+
+        assert finished.status == "failed"
+        assert (finished.error_status, finished.error) == (400, "broken photo")
+
+    async def test_job_survives_worker_restart(self, session_factory):
+        queue = AnalysisJobQueue(session_factory)
+        started = asyncio.Event()
+
+        async def hanging_handler(job):
+            started.set()
+            await asyncio.sleep(60)
+
+        first = AnalysisWorkerPool(queue, hanging_handler, poll_interval_seconds=0.05)
+        await first.start()
+        job = queue.enqueue("user:1", b"x")
+        first.notify()
+        await asyncio.wait_for(started.wait(), 5)
+        await first.stop()
+
+        assert queue.get(job.id).status == "queued"
+
+        async def handler(job):
+            return "{}"
+
+        second = AnalysisWorkerPool(queue, handler, poll_interval_seconds=0.05)
+        await second.start()
+        try:
+            finished = await second.wait_for_job(job.id, timeout=5)
+        finally:
+            await second.stop()
+
+        assert finished.status == "succeeded"
+        assert finished.attempts == 1
+
+    async def test_long_polls_leave_no_state_behind(self, session_factory):
+        queue = AnalysisJobQueue(session_factory)
+        pool = AnalysisWorkerPool(queue, handler=None, poll_interval_seconds=0.01)
+        job = queue.enqueue("user:1", b"x")
+
+        async def finish_elsewhere():
+            await asyncio.sleep(0.05)
+            claimed = queue.claim("other-process")
+            queue.complete(claimed.id, "other-process", "{}")
+
+        polls = [pool.wait_for_job(job.id, timeout=5) for _ in range(3)]
+        *finished, _ = await asyncio.gather(*polls, finish_elsewhere())
+
+        assert [polled.status for polled in finished] == ["succeeded"] * 3
+        assert not pool._finished and not pool._waiters
+
+    async def test_worker_survives_a_failure_to_record_the_outcome(self, session_factory):
+        queue = AnalysisJobQueue(session_factory)
+        complete = queue.complete
+        calls = []
+
+        def flaky_complete(*args):
+            calls.append(args[0])
+            if len(calls) == 1:
+                raise RuntimeError("database is locked")
+            return complete(*args)
+
+        queue.complete = flaky_complete
+
+        async def handler(job):
+            return "{}"
+
+        pool = AnalysisWorkerPool(queue, handler, concurrency=1, poll_interval_seconds=0.05)
+        await pool.start()
+        try:
+            lost = queue.enqueue("user:1", b"x")
+            job = queue.enqueue("user:2", b"y")
+            pool.notify()
+            finished = await pool.wait_for_job(job.id, timeout=5)
+        finally:
+            await pool.stop()
+
+        assert finished.status == "succeeded"
+        assert queue.get(lost.id).status == "running"
+
+
+class TestAnalysisJobsApi:
+    """Test suite for the job endpoints and the app's worker lifecycle."""
+
+    @pytest.fixture
+    def pool(self, session_factory, monkeypatch):
+        async def handler(job):
+            return "{}"
+
+        pool = AnalysisWorkerPool(AnalysisJobQueue(session_factory), handler, poll_interval_seconds=0.05)
+        monkeypatch.setattr(main, "get_analysis_workers", lambda: pool)
+        main.app.dependency_overrides[food_analysis.get_analysis_workers] = lambda: pool
+        yield pool
+        main.app.dependency_overrides.clear()
+
+    def client(self):
+        # A new user per test starts with the whole hourly quota
+        token = create_access_token({"sub": str(uuid.uuid4())})
+        return TestClient(main.app, headers={"Authorization": f"Bearer {token}"})
+
+    def post_job(self, client, jpeg_bytes):
+        files = {"image": ("meal.jpg", jpeg_bytes((200, 100, 50)), "image/jpeg")}
+        return client.post("/api/analysis-jobs", files=files)
+
+    def test_workers_run_while_the_app_is_up(self, pool, jpeg_bytes):
+        with self.client() as client:
+            assert pool.running
+            assert self.post_job(client, jpeg_bytes).status_code == 202
+
+        assert not pool.running
+
+    def test_disabled_jobs_are_refused(self, pool, monkeypatch, jpeg_bytes):
+        monkeypatch.setattr(settings, "ANALYSIS_JOBS_ENABLED", False)
+
+        with self.client() as client:
+            response = self.post_job(client, jpeg_bytes)
+            assert not pool.running
+
+        assert response.status_code == 503
+        assert pool.queue.stats()["queued"] == 0
@@ -0,0 +1,169 @@
+"""
+Unit Tests - Compact Output Mode
+
+Schema-constrained compact answers, local repair of invalid answers and
+the bounded re-ask budget of GeminiVisionService.
+"""
+
+import json
+
+import pytest
+
+from src.services.analysis_schema import (
+    COMPACT_RESPONSE_SCHEMA,
+    compact_analysis,
+    expand_analysis,
+)
+from src.services.gemini_vision import GeminiVisionService, ResponseParseError
+from src.services.vision_backends import (
+    DEFAULT_FAKE_RESPONSE,
+    FakeVisionBackend,
+    ModelResponse,
+    RecordReplayBackend,
+    VisionBackend,
+)
+
+
+class ScriptedBackend(VisionBackend):
+    """Answers with the given texts in order, recording the prompts it saw."""
+
+    model_name = "scripted"
+
+    def __init__(self, *texts):
+        self.texts = list(texts)
+        self.prompts = []
+        self.schemas = []
+
+    async def generate(self, prompt, image, image_digest, response_schema=None):
+        self.prompts.append(prompt)
+        self.schemas.append(response_schema)
+        return ModelResponse(text=self.texts.pop(0), output_tokens=10)
+
+
+class TestCompactLayout:
+    """Test suite for the compact key layout."""
+
+    def test_round_trip(self):
+        assert expand_analysis(compact_analysis(DEFAULT_FAKE_RESPONSE)) == DEFAULT_FAKE_RESPONSE
+
+    def test_verbose_answers_pass_through(self):
+        assert expand_analysis(DEFAULT_FAKE_RESPONSE) is DEFAULT_FAKE_RESPONSE
+
+    def test_compact_answer_is_smaller(self):
+        verbose = json.dumps(DEFAULT_FAKE_RESPONSE, ensure_ascii=False)
+        compact = json.dumps(compact_analysis(DEFAULT_FAKE_RESPONSE), ensure_ascii=False, separators=(",", ":"))
+
+        assert len(compact) < 0.75 * len(verbose)
+
+
+class TestCompactMode:
+    """GeminiVisionService in compact output mode."""
+
+    async def test_sends_schema_and_short_prompt(self, jpeg_bytes):
+        backend = ScriptedBackend(json.dumps(compact_analysis(DEFAULT_FAKE_RESPONSE)))
+        service = GeminiVisionService(backend=backend, output_mode="compact")
+
+        result = await service.analyze_food_image(jpeg_bytes((200, 100, 50)))
+
+        assert result.foods[0].name == "arroz blanco"
+        assert backend.schemas == [COMPACT_RESPONSE_SCHEMA]
+        assert len(backend.prompts[0]) < len(service._build_analysis_prompt()) / 2
+
+    async def test_prompt_mode_sends_no_schema(self, jpeg_bytes):
+        backend = ScriptedBackend(json.dumps(DEFAULT_FAKE_RESPONSE))
+        service = GeminiVisionService(backend=backend)
+
+        await service.analyze_food_image(jpeg_bytes((200, 100, 50)))
+
+        assert backend.schemas == [None]
+        assert backend.prompts[0] == service._build_analysis_prompt()
+
+    def test_unknown_mode_is_rejected(self):
+        with pytest.raises(ValueError):
+            GeminiVisionService(backend=FakeVisionBackend(), output_mode="terse")
+
+    async def test_compact_stream_yields_expanded_foods(self, jpeg_bytes):
+        service = GeminiVisionService(
+            backend=FakeVisionBackend(stream_chunk_chars=16), output_mode="compact"
+        )
+
+        events = [e async for e in service.stream_food_analysis(jpeg_bytes((200, 100, 50)))]
+
+        assert [f.name for f in events[:-1]] == [f["name"] for f in DEFAULT_FAKE_RESPONSE["foods"]]
+        assert events[-1].meal_description == DEFAULT_FAKE_RESPONSE["meal_description"]
+
+    async def test_replay_keys_include_the_schema(self, tmp_path, jpeg_bytes):
+        recorder = GeminiVisionService(
+            backend=RecordReplayBackend(str(tmp_path), mode="record", inner=FakeVisionBackend()),
+            output_mode="compact",
+        )
+        await recorder.analyze_food_image(jpeg_bytes((200, 100, 50)))
+
+        replayer = GeminiVisionService(
+            backend=RecordReplayBackend(str(tmp_path), mode="replay"), output_mode="compact"
+        )
+        result = await replayer.analyze_food_image(jpeg_bytes((200, 100, 50)))
+
+        assert result.foods[0].name == "arroz blanco"
+        assert replayer.backend.recordings[next(iter(replayer.backend.recordings))].output_tokens > 0
+
+
+class TestResponseRepair:
+    """Local repair and the bounded re-ask budget."""
+
+    def test_local_repairs(self):
+        service = GeminiVisionService(backend=FakeVisionBackend())
+        text = json.dumps(DEFAULT_FAKE_RESPONSE)
+
+        assert service._parse_response(f"```json\n{text}\n```").foods
+        assert service._parse_response(f"Aquí está el análisis: {text} ¡Buen provecho!").foods
+        assert service._parse_response('{"f": [{"n": "pan", "g": 40, "p": "horneado", "c": 0.9},], "d": "pan",}').foods[0].name == "pan"
+
+    def test_wrong_shape_is_a_parse_error(self):
+        service = GeminiVisionService(backend=FakeVisionBackend())
+
+        with pytest.raises(ResponseParseError):
+            service._parse_response('{"foods": [{"name": "pan"}], "meal_description": "pan"}')
+        with pytest.raises(ResponseParseError):
+            service._parse_response("no sé qué es esto")
+
+    async def test_invalid_answer_is_re_asked_once(self, jpeg_bytes):
+        backend = ScriptedBackend("lo siento", json.dumps(DEFAULT_FAKE_RESPONSE))
+        service = GeminiVisionService(backend=backend, repair_attempts=1)
+
+        result = await service.analyze_food_image(jpeg_bytes((200, 100, 50)))
+
+        assert len(result.foods) == 4
+        assert len(backend.prompts) == 2
+        assert "no era JSON válido" in backend.prompts[1]
+        assert service.usage.stats()["prompt"]["repairs"] == 1
+
+    async def test_repair_budget_is_bounded(self, jpeg_bytes):
+        backend = ScriptedBackend("uno", "dos", "tres", "cuatro")
+        service = GeminiVisionService(backend=backend, repair_attempts=2)
+
+        with pytest.raises(Exception, match="Failed to parse"):
+            await service.analyze_food_image(jpeg_bytes((200, 100, 50)))
+
+        assert len(backend.prompts) == 3
+        stats = service.usage.stats()["prompt"]
+        assert stats["parse_failures"] == 3
+        assert stats["repairs"] == 2
+
+
+class TestOutputModeUsage:
+    """Per-mode usage metrics and the compact-vs-prompt deltas."""
+
+    async def test_reports_deltas_between_modes(self, jpeg_bytes):
+        backend = FakeVisionBackend()
+        service = GeminiVisionService(backend=backend)
+        image = jpeg_bytes((200, 100, 50))
+
+        await service.analyze_food_image(image)
+        service.output_mode = "compact"
+        await service.analyze_food_image(image)
+
+        stats = service.usage.stats()
+        assert stats["prompt"]["calls"] == stats["compact"]["calls"] == 1
+        assert stats["compact_vs_prompt"]["mean_output_tokens"] < 0
+        assert stats["compact_vs_prompt"]["output_tokens_pct"] < -25
@@ -0,0 +1,78 @@
+"""
+Unit Tests - Batch Analysis Endpoint
+
+POST /api/analyze-food/batch against the offline fake backend.
+"""
+
+import io
+import uuid
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from PIL import Image
+
+from src.api import food_analysis
+from src.infrastructure.auth.security import create_access_token
+from src.main import app
+from src.services.analysis_cache import AnalysisCache
+from src.services.food_matcher import FoodMatcher
+from src.services.gemini_vision import GeminiVisionService
+from src.services.image_hash import NearDuplicateIndex
+from src.services.vision_backends import FakeVisionBackend
+
+
+def noise_jpeg(seed: int) -> bytes:
+    """Distinct photo per seed (never a near-duplicate of another)"""
+    pixels = np.random.default_rng(seed).integers(0, 256, (64, 64, 3), dtype=np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, "JPEG")
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def backend():
+    backend = FakeVisionBackend()
+    app.dependency_overrides.update({
+        food_analysis.get_gemini_service: lambda: GeminiVisionService(backend=backend),
+        food_analysis.get_food_matcher: lambda: FoodMatcher([]),
+        food_analysis.get_analysis_cache: lambda: AnalysisCache(),
+        food_analysis.get_near_duplicate_index: lambda: NearDuplicateIndex(),
+    })
+    yield backend
+    app.dependency_overrides.clear()
+
+
+@pytest.fixture
+def client(backend):
+    # A new user per test starts with the whole hourly quota
+    token = create_access_token({"sub": str(uuid.uuid4())})
+    return TestClient(app, headers={"Authorization": f"Bearer {token}"})
+
+
+class TestBatchRateLimit:
+    """Test suite for charging batches against the hourly analysis quota."""
+
+    def batch(self, client, seeds):
+        files = [("images", (f"{seed}.jpg", noise_jpeg(seed), "image/jpeg")) for seed in seeds]
+        return client.post("/api/analyze-food/batch", files=files)
+
+    def test_batch_larger_than_the_quota_left_is_rejected_up_front(self, client, backend):
+        assert self.batch(client, range(9)).status_code == 200
+
+        response = self.batch(client, range(100, 110))
+
+        assert response.status_code == 429
+        assert backend.calls == 9
+        # The rejected batch cost nothing: exactly one analysis is left
+        assert self.batch(client, [200]).status_code == 200
+        assert self.batch(client, [300]).status_code == 429
+        assert backend.calls == 10
+
+    def test_images_answered_without_a_call_are_given_back(self, client, backend):
+        assert self.batch(client, [1, 1, 2]).status_code == 200
+        assert backend.calls == 2
+
+        assert self.batch(client, range(3, 11)).status_code == 200
+        assert self.batch(client, [11]).status_code == 429
+        assert backend.calls == 10
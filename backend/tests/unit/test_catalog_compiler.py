@@ -0,0 +1,214 @@
+"""
+Unit Tests - Catalog Compiler
+
+Parsing of the frontend data modules and the incremental catalog build.
+"""
+
+import json
+
+import pytest
+
+from src.services import catalog_compiler
+from src.services.catalog_compiler import (
+    DEFAULT_SOURCES,
+    CatalogBuildError,
+    compile_catalog,
+    load_records,
+    parse_ts_exports,
+)
+from src.services.catalog_file import CatalogFileError, load_catalog_file
+
+
+FOODS_TS = """
+import { FoodItem } from '../types';
+
+// Base foods
+export const foodDatabase: FoodItem[] = [
+    {
+        id: 'lomo-saltado',
+        name: 'Lomo Saltado',
+        category: 'peruvian',
+        caloriesPer100g: 180,
+        proteinPer100g: 15, /* lean beef */
+        carbsPer100g: 12,
+        fatPer100g: 8,
+        emoji: '🍖',
+    },
+    {
+        id: 'arroz-blanco',
+        name: "Arroz \\"Blanco\\"",
+        category: 'carbs',
+        caloriesPer100g: 130,
+        proteinPer100g: 2.7,
+        carbsPer100g: 28,
+        fatPer100g: 0.3,
+        fiberPer100g: 0.4,
+    },
+];
+
+export const getFoodById = (id: string) => foodDatabase.find(food => food.id === id);
+"""
+
+RECIPES_TS = """
+export const recipes: Recipe[] = [
+    {
+        id: 'bowl',
+        name: 'Bowl de Pollo',
+        ingredients: [
+            { foodId: 'pollo', grams: 150 },
+            { foodId: 'arroz-blanco', grams: 50 },
+        ],
+        totalCalories: 400,
+        totalProtein: 50,
+        totalCarbs: 30,
+        totalFat: 8,
+        emoji: '🥗',
+    },
+];
+"""
+
+
+@pytest.fixture
+def sources(tmp_path):
+    foods = tmp_path / "foods.ts"
+    recipes = tmp_path / "recipes.ts"
+    foods.write_text(FOODS_TS, encoding="utf-8")
+    recipes.write_text(RECIPES_TS, encoding="utf-8")
+    return [str(foods), str(recipes)]
+
+
+class TestParseTsExports:
+    """Test suite for the TypeScript literal parser."""
+
+    def test_parses_literal_exports_and_skips_functions(self):
+        exports = parse_ts_exports(FOODS_TS)
+
+        assert list(exports) == ["foodDatabase"]
+        assert exports["foodDatabase"][1]["name"] == 'Arroz "Blanco"'
+        assert exports["foodDatabase"][1]["proteinPer100g"] == 2.7
+        assert exports["foodDatabase"][0]["caloriesPer100g"] == 180
+
+    def test_unsupported_syntax_reports_the_line(self):
+        source = "export const foods = [\n  { id: 'a', calories: 100 * 2 },\n];"
+
+        with pytest.raises(CatalogBuildError, match="line 2"):
+            parse_ts_exports(source)
+
+    def test_parses_the_frontend_modules(self):
+        records = load_records(DEFAULT_SOURCES)
+        ids = [record["id"] for record in records]
+
+        assert len(records) > 100
+        assert len(ids) == len(set(ids))
+        assert {"lomo-saltado", "papa", "tacu-tacu"} <= set(ids)
+
+
+class TestLoadRecords:
+    """Test suite for mapping source entries to catalog records."""
+
+    def test_foods_and_recipes_become_catalog_records(self, sources):
+        lomo, arroz, bowl = load_records(sources)
+
+        assert lomo == {
+            "id": "lomo-saltado", "name": "Lomo Saltado", "category": ["peruvian", "protein"],
+            "emoji": "🍖", "calories": 180, "protein": 15, "carbs": 12, "fat": 8, "fiber": 0,
+        }
+        assert arroz["category"] == ["carbs"]
+        assert arroz["fiber"] == 0.4
+        # Recipe totals are scaled to 100 g of the 200 g of ingredients
+        assert (bowl["calories"], bowl["protein"], bowl["carbs"], bowl["fat"]) == (200, 25, 15, 4)
+        assert bowl["category"] == ["recipe", "protein"]
+
+    def test_supplement_does_not_override_frontend_foods(self, sources, tmp_path):
+        supplement = tmp_path / "supplement.json"
+        supplement.write_text(json.dumps([
+            {"id": "arroz", "name": "Arroz \"blanco\"", "category": ["carbs"], "calories": 1, "protein": 0, "carbs": 0, "fat": 0},
+            {"id": "papa", "name": "Papa", "category": ["carbs"], "calories": 77, "protein": 2, "carbs": 17, "fat": 0.1},
+        ]), encoding="utf-8")
+
+        records = load_records(sources + [str(supplement)])
+
+        assert [record["id"] for record in records] == ["lomo-saltado", "arroz-blanco", "bowl", "papa"]
+        assert records[-1]["fiber"] == 0
+
+    def test_invalid_entries_are_all_reported(self, sources, tmp_path):
+        bad = tmp_path / "bad.ts"
+        bad.write_text(FOODS_TS.replace("fatPer100g: 8", "fatPer100g: -8"), encoding="utf-8")
+
+        with pytest.raises(CatalogBuildError) as error:
+            load_records(sources + [str(bad)])
+
+        message = str(error.value)
+        assert "lomo-saltado: duplicate id" in message
+        assert "arroz-blanco: duplicate id" in message
+        assert "negative" in message.lower()
+
+
+class TestCompileCatalog:
+    """Test suite for the incremental build."""
+
+    def test_builds_then_skips_until_a_source_changes(self, sources, tmp_path):
+        output = tmp_path / "out"
+        output.mkdir()
+
+        first = compile_catalog(sources, str(output))
+        second = compile_catalog(sources, str(output))
+
+        assert first.compiled and first.foods == 3
+        assert not second.compiled and second.foods == 3
+        assert json.loads((output / "food_database.json").read_text(encoding="utf-8"))[2]["id"] == "bowl"
+        assert len(load_catalog_file(str(output / "food_catalog.bin"))) == 3
+
+        with open(sources[1], "a", encoding="utf-8") as f:
+            f.write("\n// reviewed\n")
+        assert compile_catalog(sources, str(output)).compiled
+        assert compile_catalog(sources, str(output), force=True).compiled
+
+    def test_compiled_file_is_stale_once_the_database_is_edited(self, sources, tmp_path):
+        compile_catalog(sources, str(tmp_path))
+        catalog_path = str(tmp_path / "food_catalog.bin")
+        database = tmp_path / "food_database.json"
+
+        assert len(load_catalog_file(catalog_path, database_path=str(database))) == 3
+
+        records = json.loads(database.read_text(encoding="utf-8"))
+        records[0]["calories"] = 999
+        database.write_text(json.dumps(records), encoding="utf-8")
+        with pytest.raises(CatalogFileError):
+            load_catalog_file(catalog_path, database_path=str(database))
+
+    def test_missing_output_is_rebuilt(self, sources, tmp_path):
+        compile_catalog(sources, str(tmp_path))
+        (tmp_path / "food_catalog.bin").unlink()
+
+        assert compile_catalog(sources, str(tmp_path)).compiled
+
+    def test_failed_build_keeps_the_previous_outputs(self, sources, tmp_path):
+        output = tmp_path / "out"
+        output.mkdir()
+        compile_catalog(sources, str(output))
+        with open(sources[0], "w", encoding="utf-8") as f:
+            f.write(FOODS_TS.replace("caloriesPer100g: 130", "caloriesPer100g: -130"))
+
+        with pytest.raises(CatalogBuildError):
+            compile_catalog(sources, str(output))
+        assert len(load_catalog_file(str(output / "food_catalog.bin"))) == 3
+
+    def test_interrupted_write_keeps_the_previous_database(self, sources, tmp_path, monkeypatch):
+        output = tmp_path / "out"
+        output.mkdir()
+        compile_catalog(sources, str(output))
+        previous = (output / "food_database.json").read_text(encoding="utf-8")
+
+        def failing_dump(obj, f, **kwargs):
+            f.write("[")
+            raise OSError("disk full")
+
+        monkeypatch.setattr(catalog_compiler.json, "dump", failing_dump)
+        with pytest.raises(OSError):
+            compile_catalog(sources, str(output), force=True)
+
+        assert (output / "food_database.json").read_text(encoding="utf-8") == previous
+        assert sorted(path.name for path in output.iterdir()) == [
+            "food_catalog.bin", "food_catalog.manifest.json", "food_database.json",
+        ]
@@ -0,0 +1,138 @@
+"""
+Unit Tests - Catalog File
+
+Compiled, memory-mapped food catalog with prebuilt indexes.
+"""
+
+import json
+import os
+import stat
+import struct
+
+import numpy as np
+import pytest
+
+from src.services.catalog_file import (
+    FILE_MODE,
+    FORMAT_VERSION,
+    CatalogFileError,
+    database_hash,
+    load_catalog_file,
+    read_catalog_arrays,
+    write_catalog_file,
+)
+from src.services.food_matcher import FoodMatcher
+from src.services.food_search import FoodSearchIndex
+
+
+FOODS = [
+    {"id": "aji-de-gallina", "name": "Ají de Gallina", "category": ["peruvian", "protein"], "emoji": "🍗",
+     "calories": 190, "protein": 14, "carbs": 8, "fat": 11},
+    {"id": "pollo-a-la-brasa", "name": "Pollo a la Brasa", "category": ["peruvian", "protein"], "emoji": "🍗",
+     "calories": 210, "protein": 25, "carbs": 0, "fat": 12},
+    {"id": "arroz-blanco", "name": "Arroz Blanco", "category": ["carbs"], "emoji": "🍚",
+     "calories": 130, "protein": 2.7, "carbs": 28, "fat": 0.3},
+    {"id": "papa-frita", "name": "Papa Frita", "category": ["carbs", "fats"],
+     "calories": 312, "protein": 3.4, "carbs": 41, "fat": 15},
+    {"id": "brocoli", "name": "Brócoli", "category": ["vegetables"], "emoji": "🥦",
+     "calories": 34, "protein": 2.8, "carbs": 7, "fat": 0.4},
+]
+
+QUERIES = ["pollito", "aji de galina", "arroz", "papa frita rellena", "brocoli", "cerveza", ""]
+
+
+@pytest.fixture
+def catalog_path(tmp_path):
+    path = str(tmp_path / "food_catalog.bin")
+    write_catalog_file(path, FOODS, metadata={"source": "test"})
+    return path
+
+
+class TestCatalogFile:
+    """Test suite for writing and loading compiled catalogs."""
+
+    def test_loaded_catalog_matches_and_searches_like_a_built_one(self, catalog_path):
+        catalog = load_catalog_file(catalog_path)
+        loaded, built = FoodMatcher(catalog), FoodMatcher(FOODS)
+        loaded_search, built_search = FoodSearchIndex(catalog), FoodSearchIndex(FOODS)
+
+        assert [catalog.food(i) for i in range(len(catalog))] == [FoodMatcher(FOODS).catalog.food(i) for i in range(5)]
+        for query in QUERIES:
+            for preparation in ("", "frito", "a la plancha"):
+                assert loaded.match_food(query, preparation, 0.0) == built.match_food(query, preparation, 0.0)
+            assert loaded_search.search(query) == built_search.search(query)
+        assert loaded_search.search("p").total == built_search.search("p").total
+
+    def test_sections_are_read_only_views_of_the_mapping(self, catalog_path):
+        arrays, metadata = read_catalog_arrays(catalog_path)
+        catalog = load_catalog_file(catalog_path)
+
+        assert metadata == {"source": "test"}
+        assert not arrays["catalog.nutrients"].flags.writeable
+        assert catalog.prebuilt("matcher") is not None
+        assert catalog.prebuilt("search") is not None
+        assert not catalog.column("calories").flags.owndata
+        assert catalog.column("calories").tolist() == pytest.approx([190, 210, 130, 312, 34])
+
+    def test_empty_catalog_round_trips(self, tmp_path):
+        path = str(tmp_path / "empty.bin")
+        write_catalog_file(path, [])
+        catalog = load_catalog_file(path)
+
+        assert len(catalog) == 0
+        assert FoodMatcher(catalog).match_food("arroz") is None
+        assert FoodSearchIndex(catalog).search("arroz").total == 0
+
+    def test_corruption_fails_the_checksum(self, catalog_path):
+        with open(catalog_path, "r+b") as f:
+            f.seek(-3, 2)
+            byte = f.read(1)
+            f.seek(-3, 2)
+            f.write(bytes([byte[0] ^ 0xFF]))
+
+        with pytest.raises(CatalogFileError, match="checksum"):
+            load_catalog_file(catalog_path)
+        assert len(load_catalog_file(catalog_path, verify=False)) == len(FOODS)
+
+    def test_other_format_version_is_rejected(self, catalog_path):
+        with open(catalog_path, "r+b") as f:
+            f.seek(8)
+            f.write(struct.pack("<I", FORMAT_VERSION + 1))
+
+        with pytest.raises(CatalogFileError, match="version"):
+            load_catalog_file(catalog_path)
+
+    def test_missing_or_foreign_file(self, tmp_path):
+        other = tmp_path / "foods.json"
+        other.write_text("[" + "{}, " * 20 + "{}]")
+
+        with pytest.raises(CatalogFileError):
+            load_catalog_file(str(tmp_path / "missing.bin"))
+        with pytest.raises(CatalogFileError, match="not a compiled catalog"):
+            load_catalog_file(str(other))
+
+    def test_file_built_from_another_database_is_stale(self, tmp_path):
+        database = tmp_path / "food_database.json"
+        database.write_text(json.dumps(FOODS), encoding="utf-8")
+        path = str(tmp_path / "food_catalog.bin")
+        write_catalog_file(path, FOODS, metadata={"database": database_hash(str(database))})
+
+        assert len(load_catalog_file(path, database_path=str(database))) == 5
+        assert len(load_catalog_file(path, database_path=str(tmp_path / "missing.json"))) == 5
+
+        database.write_text(json.dumps(FOODS[:2]), encoding="utf-8")
+        with pytest.raises(CatalogFileError, match="current"):
+            load_catalog_file(path, database_path=str(database))
+
+    def test_rewrite_replaces_the_file_atomically(self, catalog_path):
+        previous = load_catalog_file(catalog_path)
+        write_catalog_file(catalog_path, FOODS[:2])
+
+        # The old mapping stays valid; the file now holds the new catalog
+        assert previous.food(4)["id"] == "brocoli"
+        assert len(load_catalog_file(catalog_path)) == 2
+        assert isinstance(previous.nutrients, np.ndarray)
+
+    def test_file_is_readable_by_other_users(self, catalog_path):
+        assert FILE_MODE & stat.S_IROTH
+        assert stat.S_IMODE(os.stat(catalog_path).st_mode) == FILE_MODE
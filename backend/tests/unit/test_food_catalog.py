@@ -0,0 +1,91 @@
+"""
+Unit Tests - Food Catalog
+
+Columnar catalog storage, dict views and vectorized nutrition.
+"""
+
+import numpy as np
+import pytest
+
+from src.services.food_catalog import FoodCatalog, StringTable
+from src.services.food_matcher import FoodMatcher
+
+
+RECORDS = [
+    {"id": "palta", "name": "Palta/Aguacate", "category": ["fats", "fruits"], "emoji": "🥑",
+     "calories": 160, "protein": 2, "carbs": 8.5, "fat": 14.7},
+    {"id": "arroz-blanco", "name": "Arroz Blanco", "category": ["carbs"], "emoji": "🍚",
+     "calories": 130, "protein": 2.7, "carbs": 28, "fat": 0.3},
+    {"id": "causa-limena", "name": "Causa Limeña", "category": ["peruvian", "carbs"], "emoji": "🥔",
+     "calories": 150, "protein": 5, "carbs": 20, "fat": 6, "fiber": 1.8},
+]
+
+
+@pytest.fixture
+def catalog():
+    return FoodCatalog.from_records(RECORDS)
+
+
+class TestStringTable:
+    """Test suite for StringTable."""
+
+    def test_round_trips_unicode(self):
+        table = StringTable(["Ají", "", "Causa Limeña"])
+
+        assert len(table) == 3
+        assert list(table) == ["Ají", "", "Causa Limeña"]
+        assert table[2] == "Causa Limeña"
+
+
+class TestFoodCatalog:
+    """Test suite for FoodCatalog."""
+
+    def test_food_returns_the_source_record(self, catalog):
+        assert catalog.food(0) == {**RECORDS[0], "fiber": 0.0}
+        assert catalog.food(2) == RECORDS[2]
+        assert catalog.food(1) is not catalog.food(1)
+
+    def test_columns_are_contiguous_float32(self, catalog):
+        fat = catalog.column("fat")
+
+        assert fat.dtype == np.float32
+        assert fat.flags["C_CONTIGUOUS"]
+        assert fat.tolist() == pytest.approx([14.7, 0.3, 6.0])
+
+    def test_repeated_values_are_interned(self, catalog):
+        assert len(catalog.category_lists) == 3
+        assert catalog.has_category("carbs").tolist() == [False, True, True]
+        assert catalog.has_category("dairy").tolist() == [False, False, False]
+
+    def test_missing_id_and_emoji(self):
+        catalog = FoodCatalog.from_records([{"name": "Pan Francés", "calories": 265}])
+
+        assert catalog.food(0) == {
+            "id": "pan-francés", "name": "Pan Francés", "category": [],
+            "calories": 265.0, "protein": 0.0, "carbs": 0.0, "fat": 0.0, "fiber": 0.0,
+        }
+
+    def test_nutrition_is_vectorized_and_matches_dict_math(self, catalog):
+        grams = [150, 200, 75, 150]
+        indices = [1, 0, 2, 1]
+        nutrition = catalog.nutrition(indices, grams)
+        matcher = FoodMatcher([])
+
+        assert nutrition.shape == (4, 5)
+        for row, idx, amount in zip(nutrition.tolist(), indices, grams):
+            expected = matcher.calculate_nutrition(RECORDS[idx], amount)
+            assert dict(zip(expected, (round(value, 1) for value in row))) == expected
+
+    def test_float32_storage_does_not_shift_rounding(self, catalog):
+        # 0.3 is 0.30000001 in float32; 0.45 must still round like the float64 dicts
+        fat = catalog.nutrition([1], [150])[0][3]
+
+        assert fat == 0.3 * 1.5
+        assert round(fat, 1) == 0.4
+
+    def test_empty_catalog(self):
+        catalog = FoodCatalog.from_records([])
+
+        assert len(catalog) == 0
+        assert catalog.nutrition([], []).shape == (0, 5)
+        assert catalog.has_category("carbs").tolist() == []
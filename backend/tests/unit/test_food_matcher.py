@@ -0,0 +1,271 @@
+"""
+Unit Tests - Food Matcher
+
+Trigram inverted index, accent folding and the preparation boost.
+"""
+
+import pytest
+
+from src.services.food_matcher import FoodMatcher
+from src.services.text_normalization import fold, tokens, trigrams
+
+
+CATALOG = [
+    {"id": "aji-de-gallina", "name": "Ají de Gallina", "category": ["peruvian", "protein"],
+     "calories": 190, "protein": 14, "carbs": 8, "fat": 11},
+    {"id": "pollo-a-la-brasa", "name": "Pollo a la Brasa", "category": ["peruvian", "protein"],
+     "calories": 210, "protein": 25, "carbs": 0, "fat": 12},
+    {"id": "tallarines-verdes", "name": "Tallarines Verdes", "category": ["peruvian", "carbs"],
+     "calories": 160, "protein": 5, "carbs": 25, "fat": 5},
+    {"id": "arroz-blanco", "name": "Arroz Blanco", "category": ["carbs"],
+     "calories": 130, "protein": 2.7, "carbs": 28, "fat": 0.3},
+    {"id": "brocoli", "name": "Brócoli", "category": ["vegetables"],
+     "calories": 34, "protein": 2.8, "carbs": 7, "fat": 0.4},
+    {"id": "papa", "name": "Papa", "category": ["carbs"],
+     "calories": 77, "protein": 2, "carbs": 17, "fat": 0.1},
+    {"id": "papa-frita", "name": "Papa Frita", "category": ["carbs", "fats"],
+     "calories": 312, "protein": 3.4, "carbs": 41, "fat": 15},
+]
+
+
+@pytest.fixture
+def matcher():
+    return FoodMatcher(CATALOG)
+
+
+class TestTextNormalization:
+    """Test suite for accent/case folding and trigrams."""
+
+    def test_fold_strips_accents_case_and_punctuation(self):
+        assert fold("Ají de  Gallina") == "aji de gallina"
+        assert fold("Palta/Aguacate") == "palta aguacate"
+        assert fold("Causa Limeña") == "causa limena"
+
+    def test_tokens_drop_stop_words(self):
+        assert tokens("Pollo a la Brasa") == ["pollo", "brasa"]
+
+    def test_trigrams_are_padded_per_word(self):
+        assert trigrams("Pan") == {" pa", "pan", "an "}
+        assert trigrams("de la") == set()
+
+
+class TestFoodMatcher:
+    """Test suite for FoodMatcher.match_food."""
+
+    def test_exact_name_matches_fully(self, matcher):
+        food, score = matcher.match_food("arroz blanco")
+
+        assert food["id"] == "arroz-blanco"
+        assert score == pytest.approx(1.0)
+
+    def test_accents_and_case_are_ignored(self, matcher):
+        food, score = matcher.match_food("BROCOLI")
+
+        assert food["id"] == "brocoli"
+        assert score == pytest.approx(1.0)
+
+    def test_partial_and_misspelled_words_match(self, matcher):
+        assert matcher.match_food("tallarín", min_confidence=0.4)[0]["id"] == "tallarines-verdes"
+        assert matcher.match_food("pollito", "a la plancha", min_confidence=0.4)[0]["id"] == "pollo-a-la-brasa"
+        assert matcher.match_food("aji de galina")[0]["id"] == "aji-de-gallina"
+
+    def test_unrelated_name_has_no_match(self, matcher):
+        assert matcher.match_food("cerveza") is None
+        assert matcher.match_food("") is None
+
+    def test_threshold_is_respected(self, matcher):
+        _, score = matcher.match_food("pollería", min_confidence=0.0)
+
+        assert score < 0.5
+        assert matcher.match_food("pollería", min_confidence=0.5) is None
+
+    def test_frito_boosts_fried_foods(self, matcher):
+        plain_food, plain_score = matcher.match_food("papa", min_confidence=0.0)
+        food, score = matcher.match_food("papa frita rellena", "frito", min_confidence=0.0)
+        _, unboosted = matcher.match_food("papa frita rellena", min_confidence=0.0)
+
+        assert plain_food["id"] == "papa"
+        assert food["id"] == "papa-frita"
+        assert score == pytest.approx(unboosted + FoodMatcher.PREPARATION_BOOST)
+
+    def test_plancha_boosts_proteins_and_caps_at_one(self, matcher):
+        _, unboosted = matcher.match_food("pollo", min_confidence=0.0)
+        _, boosted = matcher.match_food("pollo", "a la plancha", min_confidence=0.0)
+        _, exact = matcher.match_food("pollo a la brasa", "asado")
+
+        assert boosted == pytest.approx(unboosted + FoodMatcher.PREPARATION_BOOST)
+        assert exact == pytest.approx(1.0)
+
+    def test_dense_and_sparse_merges_agree(self, matcher):
+        sparse = matcher.match_food("tallarín verde", min_confidence=0.0)
+        matcher.match_cache.clear()
+        matcher.DENSE_MERGE_RATIO = 10**9
+        dense = matcher.match_food("tallarín verde", min_confidence=0.0)
+
+        assert dense[0] == sparse[0]
+        assert dense[1] == pytest.approx(sparse[1])
+
+    def test_empty_catalog(self):
+        assert FoodMatcher([]).match_food("arroz") is None
+
+
+class TestSpellingCorrection:
+    """Test suite for how corrected names are trusted."""
+
+    FOODS = CATALOG + [
+        {"id": "pina", "name": "Piña", "category": ["fruits"], "calories": 50, "protein": 0.5, "carbs": 13, "fat": 0.1},
+        {"id": "platano", "name": "Plátano", "category": ["fruits"], "calories": 89, "protein": 1.1, "carbs": 23, "fat": 0.3},
+        {"id": "huevo-duro", "name": "Huevo Duro", "category": ["protein"], "calories": 155, "protein": 13, "carbs": 1.1, "fat": 11},
+        {"id": "ceviche", "name": "Ceviche", "category": ["peruvian", "protein"], "calories": 100, "protein": 18, "carbs": 4, "fat": 1},
+    ]
+
+    @pytest.fixture
+    def matcher(self):
+        return FoodMatcher(self.FOODS)
+
+    @pytest.mark.parametrize("name", ["pizza", "galleta"])
+    def test_valid_words_missing_from_the_catalog_do_not_match(self, matcher, name):
+        assert matcher.match_food(name) is None
+        assert matcher.match_many([(name, "", 100)]) == [None]
+
+    def test_correction_never_changes_the_food(self, matcher):
+        food, score = matcher.match_food("platano maduro", min_confidence=0.0)
+        _, corrected = matcher.match_food("platano duro", min_confidence=0.0)
+
+        assert food["id"] == "platano"
+        assert score < corrected
+
+    def test_correction_is_discounted_per_edit(self, matcher):
+        _, exact = matcher.match_food("ceviche")
+        _, typo = matcher.match_food("cevice")
+
+        assert typo == pytest.approx(exact - FoodMatcher.CORRECTION_PENALTY)
+        assert matcher.match_many([("cevice", "", 100)])[0].score == pytest.approx(typo)
+
+    def test_calculate_nutrition_scales_per_100g(self, matcher):
+        nutrition = matcher.calculate_nutrition(CATALOG[3], 200)
+
+        assert nutrition == {"calories": 260.0, "protein": 5.4, "carbs": 56.0, "fat": 0.6}
+
+
+DETECTIONS = [
+    ("arroz blanco", "", 150),
+    ("papa frita rellena", "frito", 120),
+    ("pollo", "a la plancha", 180),
+    ("pollo", "", 90),
+    ("tallarín", "", 200),
+    ("cerveza", "", 330),
+    ("aji de galina", "", 250),
+    ("arroz blanco", "", 75),
+]
+
+
+class TestMatchMany:
+    """Test suite for FoodMatcher.match_many."""
+
+    def expected(self, min_confidence):
+        reference = FoodMatcher(CATALOG, cache_entries=0)
+        results = []
+        for name, preparation, grams in DETECTIONS:
+            match = reference.match_food(name, preparation, min_confidence=min_confidence)
+            results.append(match and (match[0], match[1], reference.calculate_nutrition(match[0], grams)))
+        return results
+
+    def check(self, matcher, min_confidence):
+        matcher.match_cache.clear()
+        for match, expected in zip(matcher.match_many(DETECTIONS, min_confidence), self.expected(min_confidence)):
+            if expected is None:
+                assert match is None
+            else:
+                assert match.food["id"] == expected[0]["id"]
+                assert match.score == pytest.approx(expected[1])
+                assert match.nutrition == expected[2]
+
+    @pytest.mark.parametrize("min_confidence", [0.0, 0.4, 0.7])
+    def test_same_results_as_match_food(self, matcher, min_confidence):
+        self.check(matcher, min_confidence)
+
+    def test_sparse_merge_agrees(self, matcher):
+        matcher.DENSE_MERGE_RATIO = 0
+
+        self.check(matcher, 0.0)
+        self.check(matcher, 0.4)
+
+    def test_dense_blocks_agree(self, matcher):
+        matcher.DENSE_MERGE_RATIO = 10**9
+        matcher.DENSE_BLOCK_ROWS = 3
+
+        self.check(matcher, 0.0)
+        self.check(matcher, 0.4)
+
+    def test_no_detections_or_no_matches(self, matcher):
+        assert matcher.match_many([]) == []
+        assert matcher.match_many([("cerveza", "", 330), ("", "", 10)]) == [None, None]
+        assert FoodMatcher([]).match_many([("arroz", "", 100)]) == [None]
+
+
+class TestMatchCache:
+    """Test suite for the FoodMatcher match result cache."""
+
+    def test_repeated_and_equivalent_names_hit(self, matcher):
+        first = matcher.match_food("Arroz Blanco")
+        again = matcher.match_food("arroz  blanco")
+        stats = matcher.match_cache.stats()
+
+        assert again == first
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["hit_rate"] == 0.5
+
+    def test_key_is_the_preparation_kind(self, matcher):
+        matcher.match_food("pollo", "a la plancha")
+        matcher.match_food("pollo", "asado")
+        matcher.match_food("pollo", "hervido")
+
+        assert len(matcher.match_cache) == 2
+        assert matcher.match_cache.hits == 1
+
+    def test_threshold_is_applied_to_cached_matches(self, matcher):
+        assert matcher.match_food("pollería", min_confidence=0.0) is not None
+        assert matcher.match_food("pollería", min_confidence=0.5) is None
+        assert matcher.match_cache.hits == 1
+
+    def test_match_many_shares_the_cache(self, matcher):
+        matcher.match_food("arroz blanco")
+        matcher.match_many([("arroz blanco", "", 100), ("papa", "", 100)])
+        matcher.match_food("papa")
+
+        assert matcher.match_cache.hits == 2
+        assert matcher.match_cache.misses == 2
+
+    def test_reload_invalidates(self, matcher):
+        assert matcher.match_food("arroz blanco")[0]["id"] == "arroz-blanco"
+        generation = matcher.match_cache.generation
+
+        matcher.reload([{"id": "arroz-integral", "name": "Arroz Integral", "category": ["carbs"],
+                         "calories": 111, "protein": 2.6, "carbs": 23, "fat": 0.9}])
+
+        assert len(matcher.match_cache) == 0
+        assert matcher.match_food("arroz blanco", min_confidence=0.0)[0]["id"] == "arroz-integral"
+        # A result computed against the previous catalog is not stored
+        matcher.match_cache.set(("papa", 0), (5, 1.0), generation)
+        assert matcher.match_food("papa") is None
+
+    def test_least_recently_used_is_evicted(self):
+        matcher = FoodMatcher(CATALOG, cache_entries=2)
+        matcher.match_food("papa")
+        matcher.match_food("arroz")
+        matcher.match_food("papa")
+        matcher.match_food("brocoli")
+
+        assert matcher.match_cache.evictions == 1
+        matcher.match_food("papa")
+        assert matcher.match_cache.hits == 2
+
+    def test_disabled_cache(self):
+        matcher = FoodMatcher(CATALOG, cache_entries=0)
+        matcher.match_food("papa")
+        matcher.match_food("papa")
+
+        assert len(matcher.match_cache) == 0
+        assert matcher.match_cache.stats()["hits"] == 0
@@ -0,0 +1,85 @@
+"""
+Unit Tests - Food Search
+
+Prefix index behind GET /api/foods/search.
+"""
+
+import pytest
+
+from src.services.food_search import FoodSearchIndex
+
+
+NAMES = [
+    "Pollo a la Brasa",
+    "Arroz con Pollo",
+    "Pechuga de Pollo",
+    "Pollo",
+    "Papa",
+    "Papa Rellena",
+    "Plátano",
+    "Ají de Gallina",
+    "Brócoli",
+]
+
+
+@pytest.fixture
+def index():
+    return FoodSearchIndex([{"id": str(i), "name": name} for i, name in enumerate(NAMES)])
+
+
+def names(page):
+    return [food["name"] for food in page.foods]
+
+
+class TestFoodSearchIndex:
+    """Test suite for FoodSearchIndex.search."""
+
+    def test_ranks_exact_then_name_prefix_then_word_prefix(self, index):
+        page = index.search("pollo")
+
+        assert names(page) == ["Pollo", "Pollo a la Brasa", "Arroz con Pollo", "Pechuga de Pollo"]
+        assert page.total == 4
+
+    def test_accents_and_case_are_folded(self, index):
+        assert names(index.search("AJI")) == ["Ají de Gallina"]
+        assert names(index.search("plát")) == ["Plátano"]
+        assert names(index.search("broc")) == ["Brócoli"]
+
+    def test_every_word_is_a_prefix(self, index):
+        assert names(index.search("pol bra")) == ["Pollo a la Brasa"]
+        assert names(index.search("arroz de pollo")) == ["Arroz con Pollo"]
+        assert index.search("pollo papa").total == 0
+
+    def test_stop_word_being_typed_is_a_prefix(self, index):
+        assert names(index.search("a")) == ["Ají de Gallina", "Arroz con Pollo", "Pollo a la Brasa"]
+        assert names(index.search("pollo a")) == ["Pollo a la Brasa", "Arroz con Pollo"]
+        assert names(index.search("pollo a la")) == ["Pollo a la Brasa"]
+        assert index.search("pollo a ").total == index.search("pollo").total == 4
+        assert names(index.search("con")) == ["Arroz con Pollo"]
+        assert names(index.search("y")) == []
+
+    def test_pagination(self, index):
+        first = index.search("p", limit=3)
+        second = index.search("p", offset=3, limit=3)
+        everything = index.search("p", limit=100)
+
+        assert names(first) + names(second) == names(everything)[:6]
+        assert first.total == second.total == everything.total == 7
+        assert index.search("p", offset=50).foods == []
+
+    def test_empty_and_stop_word_queries(self, index):
+        assert index.search("").total == 0
+        assert index.search("de la ").total == 0
+        assert index.search("zzz").total == 0
+
+    def test_precomputed_prefixes_match_full_ranking(self):
+        foods = [{"id": str(i), "name": f"pan {i}"} for i in range(300)]
+        foods += [{"id": f"p{i}", "name": f"papa {i}"} for i in range(300)]
+        index = FoodSearchIndex(foods)
+        assert "p" in index._heavy
+
+        cached = index.search("p", limit=20)
+        index._heavy.clear()
+
+        assert index.search("p", limit=20) == cached
+        assert cached.total == 600
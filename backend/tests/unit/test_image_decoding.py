@@ -0,0 +1,171 @@
+"""
+Unit Tests - Image Decoding
+
+Uploads are size-capped as the request body streams in (before the
+multipart form is spooled) and again when the file is read, bombs are
+rejected from the header, and large JPEGs are decoded at reduced scale.
+"""
+
+import io
+import json
+
+import pytest
+from fastapi import UploadFile
+from fastapi.testclient import TestClient
+from PIL import Image
+
+from src.infrastructure.config.settings import settings
+from src.main import UPLOAD_FORM_OVERHEAD_BYTES, app
+from src.services.image_decoding import (
+    ImageRejectedError,
+    ImageTooLargeError,
+    decode_image,
+    read_upload_limited,
+)
+
+
+def encode(img: Image.Image, fmt: str = "JPEG") -> bytes:
+    buffer = io.BytesIO()
+    img.save(buffer, fmt)
+    return buffer.getvalue()
+
+
+class TestReadUploadLimited:
+    """Test suite for read_upload_limited."""
+
+    async def test_reads_small_upload(self):
+        upload = UploadFile(io.BytesIO(b"x" * 1000))
+
+        assert await read_upload_limited(upload, max_bytes=1000) == b"x" * 1000
+
+    async def test_stops_as_soon_as_limit_is_exceeded(self):
+        stream = io.BytesIO(b"x" * 1_000_000)
+        upload = UploadFile(stream)
+
+        with pytest.raises(ImageTooLargeError):
+            await read_upload_limited(upload, max_bytes=100_000)
+
+        # Did not slurp the whole file before noticing
+        assert stream.tell() < 1_000_000
+
+    async def test_declared_size_rejected_up_front(self):
+        upload = UploadFile(io.BytesIO(b"x"), size=10_000)
+
+        with pytest.raises(ImageTooLargeError):
+            await read_upload_limited(upload, max_bytes=1000)
+
+
+class TestUploadSizeLimit:
+    """Test suite for the upload size middleware."""
+
+    BOUNDARY = "limit"
+
+    @pytest.fixture
+    def limit(self, monkeypatch):
+        monkeypatch.setattr(settings, "MAX_UPLOAD_BYTES", 1000)
+        return 1000 + UPLOAD_FORM_OVERHEAD_BYTES
+
+    def multipart(self, size):
+        head = (
+            f"--{self.BOUNDARY}\r\nContent-Disposition: form-data; name=\"image\"; "
+            'filename="meal.jpg"\r\nContent-Type: image/jpeg\r\n\r\n'
+        ).encode()
+        return head + b"x" * size + f"\r\n--{self.BOUNDARY}--\r\n".encode()
+
+    def post(self, body, headers=None):
+        headers = {"Content-Type": f"multipart/form-data; boundary={self.BOUNDARY}", **(headers or {})}
+        return TestClient(app).post("/api/analyze-food", content=body, headers=headers)
+
+    def test_declared_length_rejected_up_front(self, limit):
+        response = self.post(self.multipart(limit), {"Content-Length": str(limit + 200)})
+
+        assert response.status_code == 413
+
+    async def test_chunked_body_is_cut_off_at_the_limit(self, limit):
+        body = self.multipart(4 * limit)
+        chunks = [body[start:start + 4096] for start in range(0, len(body), 4096)]
+        read = []
+        sent = []
+
+        async def receive():
+            read.append(len(read))
+            return {"type": "http.request", "body": chunks[len(read) - 1],
+                    "more_body": len(read) < len(chunks)}
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+            "method": "POST", "scheme": "http", "path": "/api/analyze-food",
+            "raw_path": b"/api/analyze-food", "root_path": "", "query_string": b"",
+            "headers": [(b"content-type", f"multipart/form-data; boundary={self.BOUNDARY}".encode())],
+            "client": ("127.0.0.1", 1234), "server": ("testserver", 80),
+        }
+        await app(scope, receive, send)
+
+        assert sent[0]["status"] == 413
+        assert json.loads(sent[1]["body"]) == {"detail": "Image too large"}
+        # Aborted once past the limit, not after spooling the whole body
+        assert len(read) * 4096 < 2 * limit
+
+    def test_small_chunked_body_reaches_the_endpoint(self, limit):
+        response = self.post(iter([self.multipart(500)]))
+
+        # Past the size check: the endpoint itself answers
+        assert response.status_code != 413
+
+
+class TestDecodeImage:
+    """Test suite for decode_image."""
+
+    def test_large_jpeg_is_downscaled_to_max_size(self):
+        data = encode(Image.new("RGB", (4000, 3000), (200, 120, 40)))
+
+        img = decode_image(data, max_size=1024, max_pixels=50_000_000)
+
+        assert img.mode == "RGB"
+        assert img.size == (1024, 768)
+
+    def test_jpeg_uses_reduced_scale_decode(self, monkeypatch):
+        """draft() is asked for the final size, so the decoder scales down."""
+        requested = []
+        original_draft = Image.Image.draft
+
+        def spy(self, mode, size):
+            requested.append(size)
+            return original_draft(self, mode, size)
+
+        monkeypatch.setattr(Image.Image, "draft", spy)
+        monkeypatch.setattr("PIL.JpegImagePlugin.JpegImageFile.draft", spy, raising=False)
+        data = encode(Image.new("RGB", (4000, 3000), (200, 120, 40)))
+
+        decode_image(data, max_size=1024, max_pixels=50_000_000)
+
+        assert requested == [(1024, 768)]
+
+    def test_small_image_keeps_its_size(self):
+        data = encode(Image.new("RGBA", (300, 200), (0, 0, 0, 0)), "PNG")
+
+        img = decode_image(data, max_size=1024, max_pixels=50_000_000)
+
+        assert img.size == (300, 200)
+        assert img.mode == "RGB"
+
+    def test_too_many_pixels_rejected_before_decoding(self):
+        data = encode(Image.new("L", (3000, 3000)), "PNG")
+
+        with pytest.raises(ImageTooLargeError):
+            decode_image(data, max_size=1024, max_pixels=1_000_000)
+
+    def test_non_image_rejected(self):
+        with pytest.raises(ImageRejectedError) as exc_info:
+            decode_image(b"definitely not an image", max_size=1024, max_pixels=1_000_000)
+
+        assert exc_info.value.status_code == 400
+
+    def test_truncated_image_rejected(self):
+        data = encode(Image.new("RGB", (800, 600), (10, 20, 30)))
+
+        with pytest.raises(ImageRejectedError):
+            decode_image(data[: len(data) // 3], max_size=1024, max_pixels=50_000_000)
@@ -0,0 +1,101 @@
+"""
+Unit Tests - Perceptual Hash Index
+
+dHash must be stable under recompression/rescaling, and the multi-index
+hash table must return exactly what a brute-force Hamming scan returns.
+"""
+
+import io
+import random
+
+from PIL import Image, ImageDraw
+
+from src.services.image_hash import NearDuplicateIndex, dhash, hamming_distance
+
+
+def make_plate(seed: int) -> Image.Image:
+    """Synthetic 'meal photo' with a few coloured blobs."""
+    rng = random.Random(seed)
+    img = Image.new("RGB", (640, 480), (240, 240, 240))
+    draw = ImageDraw.Draw(img)
+    for _ in range(6):
+        x, y = rng.randint(0, 560), rng.randint(0, 400)
+        color = tuple(rng.randint(0, 255) for _ in range(3))
+        draw.ellipse((x, y, x + rng.randint(40, 200), y + rng.randint(40, 200)), fill=color)
+    return img
+
+
+def recompress(img: Image.Image, quality: int) -> Image.Image:
+    buffer = io.BytesIO()
+    img.save(buffer, "JPEG", quality=quality)
+    buffer.seek(0)
+    return Image.open(buffer)
+
+
+class TestDHash:
+    """Test suite for dhash."""
+
+    def test_recompressed_and_resized_copies_are_close(self):
+        original = make_plate(1)
+        base = dhash(original)
+
+        assert hamming_distance(base, dhash(recompress(original, 40))) <= 4
+        assert hamming_distance(base, dhash(original.resize((320, 240)))) <= 4
+
+    def test_different_plates_are_far_apart(self):
+        assert hamming_distance(dhash(make_plate(1)), dhash(make_plate(2))) > 10
+
+
+class TestNearDuplicateIndex:
+    """Test suite for NearDuplicateIndex."""
+
+    def test_matches_brute_force_scan(self, clock):
+        """MIH lookup returns the same nearest distance as a linear scan."""
+        rng = random.Random(42)
+        index = NearDuplicateIndex(max_distance=7, clock=clock)
+        stored = [rng.getrandbits(64) for _ in range(2000)]
+        for value in stored:
+            index.add(value, "user:1", value)
+
+        for _ in range(300):
+            # Queries near a stored hash, plus purely random ones
+            query = rng.choice(stored)
+            for bit in rng.sample(range(64), rng.randint(0, 9)):
+                query ^= 1 << bit
+
+            expected = min(hamming_distance(query, value) for value in stored)
+            found = index.find(query, "user:1")
+
+            if expected <= 7:
+                assert found is not None
+                assert found[1] == expected
+                assert hamming_distance(query, found[0]) == expected
+            else:
+                assert found is None
+
+    def test_lookup_is_scoped_by_owner(self, clock):
+        index = NearDuplicateIndex(clock=clock)
+        index.add(0xABCD, "user:1", "result")
+
+        assert index.find(0xABCD, "user:1") == ("result", 0)
+        assert index.find(0xABCD, "user:2") is None
+
+    def test_entries_expire_after_window(self, clock):
+        index = NearDuplicateIndex(window_seconds=60, clock=clock)
+        index.add(0xABCD, "user:1", "result")
+
+        clock.now = 59
+        assert index.find(0xABCD ^ 0b11, "user:1") == ("result", 2)
+
+        clock.now = 61
+        assert index.find(0xABCD, "user:1") is None
+        assert len(index) == 0
+
+    def test_oldest_entries_evicted_at_capacity(self, clock):
+        index = NearDuplicateIndex(max_entries=2, max_distance=0, clock=clock)
+        for value in (1, 2, 3):
+            index.add(value, "user:1", value)
+
+        assert len(index) == 2
+        assert index.find(1, "user:1") is None
+        assert index.find(3, "user:1") == (3, 0)
@@ -0,0 +1,65 @@
+"""
+Unit Tests - Image Preparation Pool
+
+Image decoding must run off the event loop, with a bounded queue.
+"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from src.services.image_pool import ImagePoolSaturatedError, ImagePreparationPool
+
+
+class TestImagePreparationPool:
+    """Test suite for ImagePreparationPool."""
+
+    async def test_runs_work_off_the_event_loop(self):
+        pool = ImagePreparationPool(max_workers=1, max_queue=1)
+        loop_thread = threading.get_ident()
+
+        worker_thread = await pool.run(threading.get_ident)
+
+        assert worker_thread != loop_thread
+        pool.shutdown()
+
+    async def test_event_loop_stays_responsive(self):
+        """A slow decode must not delay other coroutines."""
+        pool = ImagePreparationPool(max_workers=1, max_queue=0)
+        job = asyncio.ensure_future(pool.run(time.sleep, 0.2))
+
+        started = time.perf_counter()
+        await asyncio.sleep(0.01)
+        assert time.perf_counter() - started < 0.1
+
+        await job
+        pool.shutdown()
+
+    async def test_rejects_work_beyond_queue_depth(self):
+        pool = ImagePreparationPool(max_workers=1, max_queue=1)
+        release = threading.Event()
+        jobs = [asyncio.ensure_future(pool.run(release.wait)) for _ in range(2)]
+        await asyncio.sleep(0)
+
+        with pytest.raises(ImagePoolSaturatedError):
+            await pool.run(release.wait)
+        assert pool.stats()["rejected"] == 1
+
+        release.set()
+        await asyncio.gather(*jobs)
+        assert pool.stats()["pending"] == 0
+        pool.shutdown()
+
+    async def test_records_queue_wait_and_decode_time(self):
+        pool = ImagePreparationPool(max_workers=1, max_queue=4)
+
+        await asyncio.gather(pool.run(time.sleep, 0.02), pool.run(time.sleep, 0.02))
+        stats = pool.stats()
+
+        assert stats["decode_time"]["count"] == 2
+        assert stats["decode_time"]["max_ms"] >= 15
+        # Second job waited behind the first on the single worker
+        assert stats["queue_wait"]["max_ms"] >= 15
+        pool.shutdown()
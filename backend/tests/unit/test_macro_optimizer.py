@@ -0,0 +1,528 @@
+"""
+Unit Tests - Macro Optimizer
+
+Food recommendations must not change with the vectorized scoring engine.
+"""
+
+import random
+from decimal import Decimal
+
+import numpy as np
+import pytest
+
+from src.domain.entities.food import Food, FoodCategory, NutritionalInfo
+from src.domain.services.macro_optimizer import (
+    FoodMatrix,
+    FoodRecommendation,
+    MacroOptimizer,
+    MacroTarget,
+)
+from src.domain.services.meal_solver import MealSolver
+
+
+def make_food(name, category, calories, protein, carbs, fat):
+    return Food(
+        name=name,
+        category=category,
+        calories_per_100g=Decimal(str(calories)),
+        protein_g=Decimal(str(protein)),
+        carbs_g=Decimal(str(carbs)),
+        fat_g=Decimal(str(fat)),
+    )
+
+
+def random_catalog(count, seed=7):
+    rng = random.Random(seed)
+    categories = list(FoodCategory)
+    foods = []
+    for idx in range(count):
+        protein = round(rng.uniform(0, 35), 1)
+        carbs = round(rng.uniform(0, 80), 1)
+        fat = round(rng.uniform(0, 40), 1)
+        calories = round(protein * 4 + carbs * 4 + fat * 9 + rng.uniform(-10, 10), 1)
+        if idx % 50 == 0:
+            calories = 0
+        foods.append(make_food(f"food-{idx}", rng.choice(categories), max(calories, 0), protein, carbs, fat))
+    # Exact duplicates tie on score and must keep catalog order
+    foods.extend(foods[:5])
+    return foods
+
+
+def reference_recommendations(optimizer, foods, remaining, max_recommendations=5, max_portion_g=Decimal("500")):
+    """recommend_foods as a per-food Decimal loop"""
+    if remaining.is_complete():
+        return []
+    recommendations = []
+    for food in foods:
+        if food.calories_per_100g == 0:
+            continue
+        portion_g, score = optimizer.optimize_portion_size(food, remaining, max_portion_g)
+        recommendations.append(
+            FoodRecommendation(
+                food=food, grams=portion_g, score=score,
+                nutritional_info=food.calculate_for_portion(portion_g),
+            )
+        )
+    recommendations.sort(key=lambda x: x.score)
+    return optimizer._ensure_diversity(recommendations, max_recommendations)[:max_recommendations]
+
+
+def summary(recommendations):
+    return [
+        (rec.food.name, rec.grams, rec.score, rec.nutritional_info.calories, rec.nutritional_info.protein_g)
+        for rec in recommendations
+    ]
+
+
+def count_scored(optimizer):
+    """Foods scored by each solver pass of optimizer"""
+    rows = []
+    solved_deviations = optimizer._solved_deviations
+
+    def spy(macros, *args, **kwargs):
+        rows.append(len(macros))
+        return solved_deviations(macros, *args, **kwargs)
+
+    optimizer._solved_deviations = spy
+    return rows
+
+
+TARGETS = [
+    MacroTarget(Decimal("650"), Decimal("45"), Decimal("70"), Decimal("20")),
+    MacroTarget(Decimal("120"), Decimal("25"), Decimal("0"), Decimal("2")),
+    MacroTarget(Decimal("1800"), Decimal("140"), Decimal("200"), Decimal("60")),
+    MacroTarget(Decimal("-150"), Decimal("10"), Decimal("-20"), Decimal("5")),
+]
+
+
+class TestRecommendFoods:
+    """Test suite for catalog-wide recommendations."""
+
+    @pytest.fixture(params=[True, False], ids=["exact", "grid"])
+    def optimizer(self, request) -> MacroOptimizer:
+        """Fixture providing optimizer instances for both portion strategies."""
+        return MacroOptimizer(exact_portions=request.param)
+
+    @pytest.fixture(scope="class")
+    def catalog(self):
+        return random_catalog(400)
+
+    @pytest.mark.parametrize("remaining", TARGETS)
+    @pytest.mark.parametrize("max_recommendations", [1, 5, 12])
+    def test_matches_per_food_scoring(self, optimizer, catalog, remaining, max_recommendations):
+        expected = reference_recommendations(optimizer, catalog, remaining, max_recommendations)
+        actual = optimizer.recommend_foods(catalog, remaining, max_recommendations)
+
+        assert summary(actual) == summary(expected)
+        assert all(a.food is e.food for a, e in zip(actual, expected))
+
+    def test_early_exit_threshold_is_respected(self):
+        optimizer = MacroOptimizer(exact_portions=False)
+        # 20g scores 0.99 and stops the scan although 30g would score 0.015
+        food = make_food("Exit", FoodCategory.PROTEIN, 100, 0, 0, 0)
+        remaining = MacroTarget(Decimal("29.9"), Decimal("0"), Decimal("0"), Decimal("0"))
+
+        [rec] = optimizer.recommend_foods([food], remaining, 1)
+
+        assert (rec.grams, rec.score) == (Decimal("20"), Decimal("0.99"))
+
+    def test_scores_near_the_threshold_match_decimal_rules(self):
+        optimizer = MacroOptimizer(exact_portions=False)
+        # Calories only: 20g scores exactly 5 (no exit), 30g scores 4
+        food = make_food("Edge", FoodCategory.CARBS, 100, 0, 0, 0)
+        remaining = MacroTarget(Decimal("70"), Decimal("0"), Decimal("0"), Decimal("0"))
+
+        [rec] = optimizer.recommend_foods([food], remaining, 1)
+
+        assert (rec.grams, rec.score) == (Decimal("30"), Decimal("4.0"))
+
+    def test_reusable_matrix_and_empty_inputs(self, optimizer, catalog):
+        matrix = FoodMatrix(catalog)
+        remaining = TARGETS[0]
+
+        assert summary(optimizer.recommend_foods(matrix, remaining)) == summary(
+            optimizer.recommend_foods(catalog, remaining)
+        )
+        assert optimizer.recommend_foods([], remaining) == []
+        assert optimizer.recommend_foods(catalog, MacroTarget(*[Decimal("1")] * 4)) == []
+        assert optimizer.recommend_foods(catalog, remaining, 0) == []
+
+    @pytest.mark.parametrize("max_portion_g", [Decimal("150"), Decimal("20"), Decimal("10")])
+    def test_portions_stay_within_the_bound(self, optimizer, catalog, max_portion_g):
+        remaining = TARGETS[2]
+        expected = reference_recommendations(optimizer, catalog, remaining, 5, max_portion_g)
+
+        for foods in (catalog, FoodMatrix(catalog)):
+            actual = optimizer.recommend_foods(foods, remaining, 5, max_portion_g=max_portion_g)
+
+            assert summary(actual) == summary(expected)
+            assert all(rec.grams <= max(max_portion_g, optimizer.min_portion_g) for rec in actual)
+
+    def test_scoring_is_chunked(self, optimizer, catalog):
+        optimizer.SCORING_CHUNK = 7
+        remaining = TARGETS[2]
+
+        assert summary(optimizer.recommend_foods(catalog, remaining)) == summary(
+            reference_recommendations(optimizer, catalog, remaining)
+        )
+
+
+class TestEnsureDiversity:
+    """Test suite for the category diversity pass."""
+
+    @staticmethod
+    def two_pass(recommendations, max_count):
+        """Best of each category first, then the best of the rest"""
+        diverse = []
+        for rec in recommendations:
+            if len(diverse) < max_count and all(rec.food.category != other.food.category for other in diverse):
+                diverse.append(rec)
+        rest = [rec for rec in recommendations if all(rec is not other for other in diverse)]
+        return diverse + rest[: max_count - len(diverse)]
+
+    @pytest.mark.parametrize("max_count", [0, 1, 3, 8, 40])
+    def test_matches_the_two_pass_definition(self, max_count):
+        optimizer = MacroOptimizer()
+        remaining = TARGETS[0]
+        foods = random_catalog(60, seed=3)[1:]
+        recommendations = sorted(
+            (
+                FoodRecommendation(
+                    food=food, grams=Decimal("100"), score=optimizer.calculate_macro_score(food, Decimal("100"), remaining),
+                    nutritional_info=food.calculate_for_portion(Decimal("100")),
+                )
+                for food in foods
+            ),
+            key=lambda x: x.score,
+        )
+
+        diverse = optimizer._ensure_diversity(recommendations, max_count)
+
+        assert [id(rec) for rec in diverse] == [id(rec) for rec in self.two_pass(recommendations, max_count)]
+
+
+class TestSolvePortionSize:
+    """Test suite for the exact breakpoint portion solver."""
+
+    @pytest.fixture
+    def optimizer(self) -> MacroOptimizer:
+        """Fixture providing optimizer instance."""
+        return MacroOptimizer()
+
+    def random_cases(self, count, seed):
+        rng = random.Random(seed)
+        foods = random_catalog(count, seed)
+        for food in foods:
+            remaining = MacroTarget(*(Decimal(str(round(rng.uniform(-100, high), 1))) for high in (1500, 120, 200, 70)))
+            yield food, remaining
+
+    def test_never_scores_worse_than_the_grid_scan(self, optimizer):
+        for food, remaining in self.random_cases(600, seed=11):
+            _, solved = optimizer.solve_portion_size(food, remaining)
+            grid = [
+                optimizer.calculate_macro_score(food, Decimal(grams), remaining)
+                for grams in range(20, 501, 10)
+            ]
+            _, scanned = optimizer.scan_portion_sizes(food, remaining)
+
+            assert solved <= min(grid) <= scanned
+
+    def test_finds_the_best_gram_portion(self, optimizer):
+        for food, remaining in self.random_cases(25, seed=3):
+            portion, score = optimizer.solve_portion_size(food, remaining)
+            best = min(
+                (optimizer.calculate_macro_score(food, Decimal(grams), remaining), grams)
+                for grams in range(20, 501)
+            )
+
+            assert (score, portion) == best
+
+    def test_kink_on_the_penalty_boundary(self, optimizer):
+        # 250g meets the calories exactly; 251g would be penalized
+        food = make_food("Rice", FoodCategory.CARBS, 200, 0, 0, 0)
+        remaining = MacroTarget(Decimal("500"), Decimal("0"), Decimal("0"), Decimal("0"))
+
+        assert optimizer.solve_portion_size(food, remaining) == (Decimal("250"), Decimal("0"))
+        assert optimizer.solve_portion_size(food, remaining, Decimal("120")) == (Decimal("120"), Decimal("26.0"))
+        assert optimizer.solve_portion_size(food, remaining, Decimal("10"))[1] == Decimal("inf")
+
+
+NOTHING = NutritionalInfo(Decimal("0"), Decimal("0"), Decimal("0"), Decimal("0"))
+
+
+def meal_score(optimizer, meal, remaining):
+    total = sum((item.nutritional_info for item in meal.values() if item is not None), NOTHING)
+    return optimizer.score_nutrition(total, remaining)
+
+
+def greedy_meal_score(optimizer, remaining, groups):
+    """suggest_meal_completion before the joint search: best of each group in turn"""
+    original = remaining
+    total = NOTHING
+    for foods in groups:
+        recs = optimizer.recommend_foods(foods, remaining, max_recommendations=1)
+        if not recs:
+            continue
+        nutrition = recs[0].nutritional_info
+        total = total + nutrition
+        remaining = MacroTarget(
+            calories=remaining.calories - nutrition.calories,
+            protein_g=remaining.protein_g - nutrition.protein_g,
+            carbs_g=remaining.carbs_g - nutrition.carbs_g,
+            fat_g=remaining.fat_g - nutrition.fat_g,
+        )
+    return optimizer.score_nutrition(total, original)
+
+
+class TestSuggestMealCompletion:
+    """Test suite for the joint meal search."""
+
+    @pytest.fixture
+    def optimizer(self) -> MacroOptimizer:
+        """Fixture providing optimizer instance."""
+        return MacroOptimizer()
+
+    @pytest.fixture(scope="class")
+    def groups(self):
+        foods = random_catalog(300, seed=19)
+        return foods[0::3], foods[1::3], foods[2::3]
+
+    def test_never_worse_than_the_greedy_meal(self, optimizer, groups):
+        rng = random.Random(5)
+        for _ in range(8):
+            remaining = MacroTarget(*(Decimal(str(round(rng.uniform(0, high), 1))) for high in (1200, 90, 150, 50)))
+            meal = optimizer.suggest_meal_completion(remaining, *groups)
+            score = meal_score(optimizer, meal, remaining)
+
+            assert score <= greedy_meal_score(optimizer, remaining, groups)
+            assert all(item.score == score for item in meal.values() if item is not None)
+            assert all(
+                optimizer.min_portion_g <= item.grams <= Decimal("500")
+                for item in meal.values() if item is not None
+            )
+
+    def test_chooses_portions_jointly(self, optimizer):
+        chicken = make_food("Pechuga de Pollo", FoodCategory.PROTEIN, 165, 31, 0, 3.6)
+        rice = make_food("Arroz Blanco", FoodCategory.CARBS, 130, 2.7, 28, 0.3)
+        avocado = make_food("Palta", FoodCategory.FATS, 160, 2, 8.5, 14.7)
+        remaining = MacroTarget(Decimal("600"), Decimal("45"), Decimal("60"), Decimal("18"))
+
+        meal = optimizer.suggest_meal_completion(remaining, [chicken], [rice], [avocado])
+        greedy = greedy_meal_score(optimizer, remaining, ([chicken], [rice], [avocado]))
+
+        assert meal_score(optimizer, meal, remaining) < greedy / 2
+        assert [item.food.name for item in meal.values()] == ["Pechuga de Pollo", "Arroz Blanco", "Palta"]
+
+    @pytest.mark.parametrize("time_budget_s", [0, None])
+    def test_portions_stay_within_the_bound(self, optimizer, time_budget_s):
+        chicken = make_food("Pechuga de Pollo", FoodCategory.PROTEIN, 165, 31, 0, 3.6)
+        rice = make_food("Arroz Blanco", FoodCategory.CARBS, 130, 2.7, 28, 0.3)
+        oil = make_food("Aceite de Oliva", FoodCategory.FATS, 884, 0, 0, 100)
+        remaining = MacroTarget(Decimal("1500"), Decimal("120"), Decimal("150"), Decimal("50"))
+
+        meal = optimizer.suggest_meal_completion(
+            remaining, [chicken], [rice], [oil], max_portion_g=Decimal("150"), time_budget_s=time_budget_s
+        )
+
+        assert all(item is not None for item in meal.values())
+        assert all(optimizer.min_portion_g <= item.grams <= Decimal("150") for item in meal.values())
+
+    def test_item_cap(self, optimizer, groups):
+        remaining = MacroTarget(Decimal("700"), Decimal("50"), Decimal("70"), Decimal("25"))
+
+        one = optimizer.suggest_meal_completion(remaining, *groups, max_items=1)
+        two = optimizer.suggest_meal_completion(remaining, *groups, max_items=2)
+
+        assert sum(item is not None for item in one.values()) == 1
+        assert sum(item is not None for item in two.values()) <= 2
+        assert meal_score(optimizer, two, remaining) <= meal_score(optimizer, one, remaining)
+        assert optimizer.suggest_meal_completion(remaining, *groups, max_items=0) == dict.fromkeys(["protein", "carb", "fat"])
+
+    def test_time_budget_returns_the_best_meal_so_far(self, optimizer, groups):
+        remaining = MacroTarget(Decimal("700"), Decimal("50"), Decimal("70"), Decimal("25"))
+
+        meal = optimizer.suggest_meal_completion(remaining, *groups, time_budget_s=0)
+
+        assert meal_score(optimizer, meal, remaining) <= greedy_meal_score(optimizer, remaining, groups)
+        assert optimizer.suggest_meal_completion(MacroTarget(*[Decimal("0")] * 4), *groups) == dict.fromkeys(
+            ["protein", "carb", "fat"]
+        )
+
+
+class TestMealSolver:
+    """Test suite for the portion solver of fixed food sets."""
+
+    def test_rounded_portions_are_near_the_best_whole_grams(self):
+        rng = np.random.default_rng(1)
+        grams = np.arange(20, 501, dtype=np.float64)
+        grid = np.stack(np.meshgrid(grams, grams, indexing="ij"), axis=-1).reshape(-1, 2)
+        for _ in range(10):
+            solver = MealSolver(
+                targets=rng.uniform([0, 0, 0, 0], [1500, 120, 200, 70]), weights=[0.1, 4, 1, 2],
+                over_calorie_penalty=1.5, min_portion_g=20, max_portion_g=500, resolution_g=1,
+                max_items=3, time_budget_s=1,
+            )
+            per_gram = rng.uniform(0, [4, 0.35, 0.8, 0.4], size=(1, 2, 4))
+
+            portions, scores = solver.best_portions(per_gram)
+
+            assert np.all(portions == np.round(portions)) and np.all((portions >= 20) & (portions <= 500))
+            assert scores[0] <= solver.score(per_gram[0], grid).min() + 0.5
+
+    def test_single_food_matches_the_exact_portion_solver(self):
+        optimizer = MacroOptimizer()
+        for food, remaining in TestSolvePortionSize().random_cases(40, seed=23):
+            solver = MealSolver(
+                targets=[float(getattr(remaining, field)) for field in MacroOptimizer.MACRO_WEIGHTS],
+                weights=[0.1, 4, 1, 2], over_calorie_penalty=1.5, min_portion_g=20,
+                max_portion_g=500, resolution_g=1, max_items=3, time_budget_s=1,
+            )
+            per_100g = [food.calories_per_100g, food.protein_g, food.carbs_g, food.fat_g]
+            _, scores = solver.best_portions(np.array([[[float(value) / 100 for value in per_100g]]]))
+
+            assert scores[0] == pytest.approx(float(optimizer.solve_portion_size(food, remaining)[1]), abs=1e-9)
+
+
+class TestBuckets:
+    """Test suite for scoring a catalog by buckets of similar foods."""
+
+    @pytest.fixture(scope="class")
+    def matrix(self):
+        return FoodMatrix(random_catalog(3000, seed=31))
+
+    @pytest.fixture(scope="class")
+    def large(self):
+        return FoodMatrix(random_catalog(20000, seed=37))
+
+    def test_buckets_hold_similar_foods_of_one_category(self, matrix):
+        buckets = MacroOptimizer()._food_buckets(matrix)
+        members = np.repeat(np.arange(len(buckets.starts)), buckets.sizes)
+
+        assert sorted(buckets.foods) == list(np.flatnonzero(matrix.macros[:, 0] != 0))
+        assert buckets.sizes.max() <= MacroOptimizer.BUCKET_FOODS
+        assert (matrix.category_codes[buckets.foods] == buckets.categories[members]).all()
+        assert (buckets.low[members] <= matrix.macros[buckets.foods]).all()
+        assert (matrix.macros[buckets.foods] <= buckets.high[members]).all()
+
+    @pytest.mark.parametrize("remaining", TARGETS)
+    def test_bounds_never_exceed_a_member_score(self, matrix, remaining):
+        optimizer = MacroOptimizer()
+        buckets = optimizer._food_buckets(matrix)
+        members = np.repeat(np.arange(len(buckets.starts)), buckets.sizes)
+
+        bounds, floors = optimizer._bucket_bounds(buckets, remaining, Decimal("500"))
+        scores, exact_floors = optimizer._solved_scores_with_floors(
+            matrix.macros[buckets.foods], remaining, Decimal("500")
+        )
+
+        assert (bounds[members] <= scores + optimizer._tolerance(scores)).all()
+        assert (floors[members] <= exact_floors + optimizer._tolerance(exact_floors)).all()
+
+    @pytest.mark.parametrize("max_recommendations", [1, 5, 12])
+    def test_results_match_a_full_pass(self, matrix, max_recommendations):
+        optimizer = MacroOptimizer(max_warm_users=0)
+        full = MacroOptimizer()
+        for remaining in TARGETS:
+            assert summary(optimizer.recommend_foods(matrix, remaining, max_recommendations)) == summary(
+                full.recommend_foods(matrix.foods, remaining, max_recommendations)
+            )
+
+    def test_first_requests_score_a_fraction_of_the_catalog(self, large):
+        optimizer = MacroOptimizer(max_warm_users=0)
+        rows = count_scored(optimizer)
+        for remaining in TARGETS:
+            rows.clear()
+            optimizer.recommend_foods(large, remaining)
+
+            assert 0 < sum(rows) < len(large) / 5
+
+    def test_falls_back_to_a_full_pass(self, matrix):
+        optimizer = MacroOptimizer()
+        optimizer.WARM_START_REBASE_FRACTION = 0
+        rows = count_scored(optimizer)
+        remaining = TARGETS[0]
+
+        result = optimizer.recommend_foods(matrix, remaining, user_id="ana")
+
+        assert rows[-1] == len(optimizer._food_buckets(matrix).foods)
+        assert summary(result) == summary(MacroOptimizer().recommend_foods(matrix.foods, remaining))
+        assert len(optimizer._warm_starts["ana"].floors) == len(matrix.buckets.starts)
+
+
+class TestWarmStart:
+    """Test suite for per-user warm-started recommendations."""
+
+    MEALS = [(35, 2, 4, 1.5), (120, 8, 15, 3), (60, 1, 12, 0.5), (450, 30, 50, 15), (10, 0, 2.5, 0)]
+
+    @pytest.fixture(scope="class")
+    def matrix(self):
+        return FoodMatrix(random_catalog(3000, seed=29))
+
+    @staticmethod
+    def after(remaining, meal):
+        calories, protein, carbs, fat = (Decimal(str(value)) for value in meal)
+        return MacroTarget(
+            remaining.calories - calories, remaining.protein_g - protein,
+            remaining.carbs_g - carbs, remaining.fat_g - fat,
+        )
+
+    def test_warm_results_match_a_full_pass(self, matrix):
+        optimizer = MacroOptimizer()
+        full = MacroOptimizer()
+        for max_recommendations in (1, 5, 12):
+            remaining = MacroTarget(Decimal("1800"), Decimal("140"), Decimal("200"), Decimal("60"))
+            for meal in [(0, 0, 0, 0)] + self.MEALS:
+                remaining = self.after(remaining, meal)
+                warm = optimizer.recommend_foods(matrix, remaining, max_recommendations, user_id="ana")
+
+                assert summary(warm) == summary(full.recommend_foods(matrix.foods, remaining, max_recommendations))
+
+    def test_small_changes_score_fewer_foods(self, matrix):
+        warm = MacroOptimizer()
+        cold = MacroOptimizer(max_warm_users=0)
+        warm_rows = count_scored(warm)
+        cold_rows = count_scored(cold)
+        remaining = MacroTarget(Decimal("1800"), Decimal("140"), Decimal("200"), Decimal("60"))
+
+        warm.recommend_foods(matrix, remaining, user_id="ana")
+        warm_rows.clear()
+        for meal in self.MEALS:
+            remaining = self.after(remaining, meal)
+            warm.recommend_foods(matrix, remaining, user_id="ana")
+            cold.recommend_foods(matrix, remaining)
+
+        assert sum(warm_rows) < 0.8 * sum(cold_rows)
+
+    def test_state_is_bounded_and_tied_to_the_catalog(self, matrix):
+        optimizer = MacroOptimizer(max_warm_users=2)
+        remaining = MacroTarget(Decimal("900"), Decimal("60"), Decimal("100"), Decimal("30"))
+        for user in ("ana", "ben", "cal"):
+            optimizer.recommend_foods(matrix, remaining, user_id=user)
+
+        assert list(optimizer._warm_starts) == ["ben", "cal"]
+        assert optimizer._warm_start(FoodMatrix(matrix.foods), Decimal("500"), remaining) is None
+        assert optimizer._warm_start(matrix, Decimal("400"), remaining) is None
+
+    def test_nearest_state_is_used_whoever_it_belongs_to(self, matrix):
+        optimizer = MacroOptimizer()
+        near = MacroTarget(Decimal("1800"), Decimal("140"), Decimal("200"), Decimal("60"))
+        far = MacroTarget(Decimal("500"), Decimal("20"), Decimal("80"), Decimal("10"))
+        optimizer.recommend_foods(matrix, near, user_id="ana")
+        optimizer.recommend_foods(matrix, far, user_id="ben")
+
+        remaining = self.after(far, self.MEALS[0])
+        assert optimizer._warm_start(matrix, Decimal("500"), remaining) is optimizer._warm_starts["ben"]
+
+        result = optimizer.recommend_foods(matrix, remaining, 5, user_id="ana")
+        assert summary(result) == summary(MacroOptimizer().recommend_foods(matrix.foods, remaining, 5))
+
+    def test_plain_lists_and_grid_scan_do_not_keep_state(self, matrix):
+        remaining = MacroTarget(Decimal("900"), Decimal("60"), Decimal("100"), Decimal("30"))
+        exact = MacroOptimizer()
+        grid = MacroOptimizer(exact_portions=False)
+
+        exact.recommend_foods(matrix.foods[:200], remaining, user_id="ana")
+        assert summary(grid.recommend_foods(matrix, remaining, user_id="ana")) == summary(
+            MacroOptimizer(exact_portions=False).recommend_foods(matrix, remaining)
+        )
+        assert not exact._warm_starts and not grid._warm_starts
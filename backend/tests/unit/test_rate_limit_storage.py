@@ -0,0 +1,106 @@
+"""
+Unit Tests - Shared Rate Limit Storage
+
+SQLite-file counters shared by every worker that opens the same file.
+"""
+
+import threading
+
+import pytest
+from limits import RateLimitItemPerHour
+from limits.storage import storage_from_string
+from limits.strategies import FixedWindowRateLimiter
+
+from src.infrastructure.config import rate_limit_storage
+from src.infrastructure.config.rate_limit_storage import SQLiteStorage
+
+
+@pytest.fixture
+def uri(tmp_path):
+    return f"sqlite:///{tmp_path / 'limits.db'}"
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(rate_limit_storage.time, "time", lambda: now[0])
+    return now
+
+
+class TestSQLiteStorage:
+    """Test suite for SQLiteStorage."""
+
+    def test_registered_as_limits_scheme(self, uri):
+        assert isinstance(storage_from_string(uri), SQLiteStorage)
+
+    def test_counts_within_window(self, uri, clock):
+        storage = SQLiteStorage(uri)
+
+        assert storage.incr("k", 60) == 1
+        assert storage.incr("k", 60, amount=2) == 3
+        assert storage.get("k") == 3
+        assert storage.get_expiry("k") == clock[0] + 60
+
+    def test_new_window_after_expiry(self, uri, clock):
+        storage = SQLiteStorage(uri)
+        storage.incr("k", 60, amount=5)
+
+        clock[0] += 60
+        assert storage.get("k") == 0
+        assert storage.incr("k", 60) == 1
+        assert storage.get_expiry("k") == clock[0] + 60
+
+    def test_decr_refunds_but_not_below_zero(self, uri, clock):
+        storage = SQLiteStorage(uri)
+        storage.incr("k", 60, amount=2)
+
+        assert storage.decr("k") == 1
+        assert storage.decr("k", amount=5) == 0
+        assert storage.decr("missing") == 0
+
+    def test_counters_shared_between_workers(self, uri):
+        worker_a = SQLiteStorage(uri)
+        worker_b = SQLiteStorage(uri)
+
+        worker_a.incr("user:1", 3600)
+        worker_b.incr("user:1", 3600)
+
+        assert worker_a.get("user:1") == 2
+
+    def test_concurrent_hits_are_not_lost(self, uri):
+        storage = SQLiteStorage(uri)
+
+        def hammer():
+            for _ in range(200):
+                storage.incr("k", 3600)
+
+        threads = [threading.Thread(target=hammer) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert storage.get("k") == 1600
+
+    def test_clear_and_reset(self, uri):
+        storage = SQLiteStorage(uri)
+        storage.incr("a", 60)
+        storage.incr("b", 60)
+
+        storage.clear("a")
+        assert storage.get("a") == 0
+        assert storage.reset() == 1
+        assert storage.check()
+
+    def test_enforces_limit_across_workers(self, uri):
+        limit = RateLimitItemPerHour(10)
+        workers = [FixedWindowRateLimiter(SQLiteStorage(uri)) for _ in range(2)]
+
+        allowed = sum(workers[i % 2].hit(limit, "user:1") for i in range(20))
+
+        # Two workers together still allow 10/hour, not 20
+        assert allowed == 10
+
+    def test_needs_a_file(self):
+        with pytest.raises(ValueError):
+            SQLiteStorage("sqlite:///:memory:")
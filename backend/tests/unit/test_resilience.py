@@ -0,0 +1,179 @@
+"""
+Unit Tests - Resilience Layer
+
+Deadline, retry, circuit breaker and hedging behaviour, exercised against
+a scripted local fake of the model endpoint.
+"""
+
+import asyncio
+import random
+
+import pytest
+
+from src.services.resilience import (
+    CircuitBreaker,
+    CircuitOpenError,
+    DeadlineExceededError,
+    ResilientCaller,
+)
+
+
+class TransientError(Exception):
+    """Retryable upstream failure (think 503)."""
+
+
+class BadRequestError(Exception):
+    """Non-retryable upstream failure (think 400)."""
+
+
+class FakeEndpoint:
+    """Local stand-in for the model endpoint with scripted behaviour."""
+
+    def __init__(self, script):
+        # Each entry: (latency_seconds, exception_or_None)
+        self.script = list(script)
+        self.calls = 0
+
+    async def __call__(self):
+        latency, error = self.script[min(self.calls, len(self.script) - 1)]
+        self.calls += 1
+        await asyncio.sleep(latency)
+        if error is not None:
+            raise error
+        return f"response-{self.calls}"
+
+
+def make_caller(**kwargs) -> ResilientCaller:
+    kwargs.setdefault("is_retryable", lambda exc: isinstance(exc, TransientError))
+    kwargs.setdefault("base_backoff_seconds", 0.001)
+    kwargs.setdefault("rng", random.Random(0))
+    return ResilientCaller(**kwargs)
+
+
+class TestResilientCaller:
+    """Test suite for ResilientCaller."""
+
+    async def test_retries_transient_errors_then_succeeds(self):
+        endpoint = FakeEndpoint([(0, TransientError()), (0, TransientError()), (0, None)])
+        caller = make_caller(max_attempts=3)
+
+        assert await caller.call(endpoint) == "response-3"
+        assert caller.retries == 2
+
+    async def test_gives_up_after_max_attempts(self):
+        endpoint = FakeEndpoint([(0, TransientError())])
+        caller = make_caller(max_attempts=3)
+
+        with pytest.raises(TransientError):
+            await caller.call(endpoint)
+        assert endpoint.calls == 3
+
+    async def test_non_retryable_errors_fail_immediately(self):
+        endpoint = FakeEndpoint([(0, BadRequestError())])
+        caller = make_caller(max_attempts=3)
+
+        with pytest.raises(BadRequestError):
+            await caller.call(endpoint)
+        assert endpoint.calls == 1
+        assert caller.breaker.state == CircuitBreaker.CLOSED
+
+    async def test_deadline_bounds_slow_upstream(self):
+        endpoint = FakeEndpoint([(5, None)])
+        caller = make_caller(deadline_seconds=0.05)
+
+        with pytest.raises(DeadlineExceededError):
+            await caller.call(endpoint)
+        assert caller.stats()["deadlines_exceeded"] == 1
+
+    async def test_breaker_opens_and_fails_fast(self, clock):
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30, clock=clock)
+        endpoint = FakeEndpoint([(0, TransientError())])
+        caller = make_caller(max_attempts=1, breaker=breaker)
+
+        for _ in range(2):
+            with pytest.raises(TransientError):
+                await caller.call(endpoint)
+
+        with pytest.raises(CircuitOpenError):
+            await caller.call(endpoint)
+        assert endpoint.calls == 2
+        assert breaker.stats()["state"] == "open"
+        assert breaker.stats()["rejected"] == 1
+
+    async def test_breaker_half_opens_and_recovers(self, clock):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30, clock=clock)
+        endpoint = FakeEndpoint([(0, TransientError()), (0, None)])
+        caller = make_caller(max_attempts=1, breaker=breaker)
+
+        with pytest.raises(TransientError):
+            await caller.call(endpoint)
+        assert breaker.state == CircuitBreaker.OPEN
+
+        clock.now = 30
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        assert await caller.call(endpoint) == "response-2"
+        assert breaker.state == CircuitBreaker.CLOSED
+
+    async def test_failed_trial_call_reopens_breaker(self, clock):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30, clock=clock)
+        caller = make_caller(max_attempts=1, breaker=breaker)
+
+        with pytest.raises(TransientError):
+            await caller.call(FakeEndpoint([(0, TransientError())]))
+        clock.now = 30
+        with pytest.raises(TransientError):
+            await caller.call(FakeEndpoint([(0, TransientError())]))
+
+        assert breaker.state == CircuitBreaker.OPEN
+        assert breaker.stats()["times_opened"] == 2
+
+
+    async def test_cancelled_trial_call_frees_its_slot(self, clock):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30, clock=clock)
+        caller = make_caller(max_attempts=1, breaker=breaker)
+        with pytest.raises(TransientError):
+            await caller.call(FakeEndpoint([(0, TransientError())]))
+        clock.now = 30
+
+        trial = asyncio.create_task(caller.call(FakeEndpoint([(10, None)])))
+        await asyncio.sleep(0.01)
+        trial.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await trial
+
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        assert await caller.call(FakeEndpoint([(0, None)])) == "response-1"
+        assert breaker.state == CircuitBreaker.CLOSED
+        assert breaker.stats()["rejected"] == 0
+
+
+class TestHedging:
+    """Test suite for hedged requests."""
+
+    async def test_no_hedging_before_latency_warm_up(self):
+        caller = make_caller(hedge=True, hedge_min_samples=5)
+
+        assert caller.hedge_delay() is None
+
+    async def test_slow_primary_is_hedged_and_fast_backup_wins(self):
+        caller = make_caller(hedge=True, hedge_min_samples=3, hedge_min_delay_seconds=0.01)
+        for _ in range(3):
+            caller.latency.record(0.01)
+
+        # First attempt hangs, the hedge answers quickly
+        endpoint = FakeEndpoint([(5, None), (0, None)])
+        result = await asyncio.wait_for(caller.call(endpoint), timeout=1)
+
+        assert result == "response-2"
+        assert caller.hedges == 1
+        assert caller.hedge_wins == 1
+
+    async def test_fast_primary_is_not_hedged(self):
+        caller = make_caller(hedge=True, hedge_min_samples=1, hedge_min_delay_seconds=0.5)
+        caller.latency.record(0.5)
+
+        endpoint = FakeEndpoint([(0, None)])
+
+        assert await caller.call(endpoint) == "response-1"
+        assert endpoint.calls == 1
+        assert caller.hedges == 0
@@ -0,0 +1,94 @@
+"""
+Unit Tests - Single Flight
+
+Identical in-flight analysis calls must share one upstream call.
+"""
+
+import asyncio
+
+import pytest
+
+from src.services.single_flight import SingleFlight
+
+
+class TestSingleFlight:
+    """Test suite for SingleFlight."""
+
+    async def test_concurrent_calls_with_same_key_run_once(self):
+        flights = SingleFlight()
+        calls = 0
+
+        async def call():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return "result"
+
+        outcomes = await asyncio.gather(*(flights.run("k", call) for _ in range(5)))
+
+        assert calls == 1
+        assert [result for result, _ in outcomes] == ["result"] * 5
+        assert [joined for _, joined in outcomes] == [False, True, True, True, True]
+        assert flights.stats() == {"in_flight": 0, "started": 1, "coalesced": 4}
+
+    async def test_different_keys_do_not_share(self):
+        flights = SingleFlight()
+
+        async def echo(value):
+            await asyncio.sleep(0)
+            return value
+
+        outcomes = await asyncio.gather(
+            flights.run("a", lambda: echo("a")), flights.run("b", lambda: echo("b"))
+        )
+
+        assert [result for result, _ in outcomes] == ["a", "b"]
+
+    async def test_sequential_calls_are_not_coalesced(self):
+        flights = SingleFlight()
+
+        async def call():
+            return "result"
+
+        await flights.run("k", call)
+        _, joined = await flights.run("k", call)
+
+        assert joined is False
+        assert flights.stats()["started"] == 2
+
+    async def test_cancelled_waiter_does_not_cancel_shared_call(self):
+        flights = SingleFlight()
+        release = asyncio.Event()
+        finished = []
+
+        async def call():
+            await release.wait()
+            finished.append(True)
+            return "result"
+
+        first = asyncio.ensure_future(flights.run("k", call))
+        second = asyncio.ensure_future(flights.run("k", call))
+        await asyncio.sleep(0)
+
+        first.cancel()
+        await asyncio.sleep(0)
+        release.set()
+
+        assert await second == ("result", True)
+        assert finished == [True]
+        with pytest.raises(asyncio.CancelledError):
+            await first
+
+    async def test_errors_reach_every_waiter(self):
+        flights = SingleFlight()
+
+        async def failing():
+            await asyncio.sleep(0)
+            raise RuntimeError("upstream down")
+
+        outcomes = await asyncio.gather(
+            flights.run("k", failing), flights.run("k", failing), return_exceptions=True
+        )
+
+        assert all(isinstance(outcome, RuntimeError) for outcome in outcomes)
+        assert flights.stats()["in_flight"] == 0
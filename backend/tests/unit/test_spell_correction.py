@@ -0,0 +1,78 @@
+"""
+Unit Tests - Spell Correction
+
+Symmetric-delete correction of detected food name words.
+"""
+
+import pytest
+
+from src.services.spell_correction import SpellingIndex, edit_distance
+
+
+VOCABULARY = ["brocoli", "platano", "aji", "gallina", "pollo", "papa", "papa", "pan", "quinua", "zanahoria"]
+
+
+@pytest.fixture
+def index():
+    return SpellingIndex(VOCABULARY)
+
+
+class TestEditDistance:
+    """Test suite for the bounded optimal string alignment distance."""
+
+    @pytest.mark.parametrize(
+        "a, b, expected",
+        [
+            ("gallina", "gallina", 0),
+            ("galina", "gallina", 1),
+            ("pollo", "polol", 1),
+            ("kinua", "quinua", 2),
+            ("", "pan", 3),
+        ],
+    )
+    def test_distances(self, a, b, expected):
+        assert edit_distance(a, b, max_distance=3) == expected
+
+    def test_stops_past_the_bound(self):
+        assert edit_distance("zanahoria", "brocoli", max_distance=2) == 3
+
+
+class TestSpellingIndex:
+    """Test suite for SpellingIndex."""
+
+    def test_known_words_are_returned_unchanged(self, index):
+        assert index.lookup("pollo") == "pollo"
+
+    def test_corrects_up_to_two_edits(self, index):
+        assert index.lookup("galina") == "gallina"
+        assert index.lookup("zanaoria") == "zanahoria"
+        assert index.lookup("kinua") == "quinua"
+        assert index.lookup("plaatno") == "platano"
+
+    def test_unrelated_words_are_not_corrected(self, index):
+        assert index.lookup("cerveza") is None
+
+    def test_short_words_allow_fewer_edits(self, index):
+        assert index.lookup("pam") == "pan"
+        assert index.lookup("pxm") is None
+        assert index.lookup("pa") is None
+
+    def test_ties_prefer_frequent_words(self, index):
+        assert index.lookup("paa") == "papa"
+
+    def test_correct_folds_and_keeps_stop_words(self, index):
+        assert index.correct("Ají de Galina") == "aji de gallina"
+        assert index.correct("plátano maduro") == "platano maduro"
+
+    def test_correct_counts_edits(self, index):
+        assert index.correct_with_edits("Ají de Galina") == ("aji de gallina", 1)
+        assert index.correct_with_edits("kinua con pollo") == ("quinua con pollo", 2)
+        assert index.correct_with_edits("pollo") == ("pollo", 0)
+
+    def test_memory_is_bounded_by_prefix_length(self):
+        long_word = "a" * 5 + "bcdefghijklmnop"
+
+        assert len(SpellingIndex([long_word], prefix_length=7)) == len(SpellingIndex([long_word[:7]], prefix_length=7))
+
+    def test_empty_vocabulary(self):
+        assert SpellingIndex([]).lookup("pollo") is None
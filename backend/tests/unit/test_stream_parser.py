@@ -0,0 +1,90 @@
+"""
+Unit Tests - Incremental Array Parser
+
+Items of the streamed "foods" array are emitted as soon as they close,
+whatever the chunk boundaries.
+"""
+
+import json
+import random
+
+import pytest
+
+from src.services.stream_parser import IncrementalArrayParser
+
+
+RESPONSE = {
+    "foods": [
+        {"name": "arroz {blanco}", "estimated_grams": 180, "preparation": "cocido", "confidence": 0.95},
+        {"name": 'pollo "a la brasa" \\ ]', "estimated_grams": 140, "preparation": "horno", "confidence": 0.9},
+        {"name": "ensalada", "estimated_grams": 60, "preparation": "crudo", "confidence": 0.7,
+         "extra": {"nested": [1, 2, {"deep": True}]}},
+    ],
+    "meal_description": "foods [ { } ]",
+}
+
+
+def feed_in_chunks(text: str, sizes) -> list:
+    parser = IncrementalArrayParser("foods")
+    items = []
+    pos = 0
+    for size in sizes:
+        items.extend(parser.feed(text[pos:pos + size]))
+        pos += size
+    items.extend(parser.feed(text[pos:]))
+    return items, parser
+
+
+class TestIncrementalArrayParser:
+    """Test suite for IncrementalArrayParser."""
+
+    def test_whole_document_at_once(self):
+        items, parser = feed_in_chunks(json.dumps(RESPONSE), [])
+
+        assert items == RESPONSE["foods"]
+        assert parser.items_emitted == 3
+
+    def test_one_character_at_a_time(self):
+        text = json.dumps(RESPONSE, ensure_ascii=False)
+
+        items, parser = feed_in_chunks(text, [1] * len(text))
+
+        assert items == RESPONSE["foods"]
+        assert parser.text == text
+
+    def test_random_chunk_boundaries(self):
+        text = json.dumps(RESPONSE, indent=2)
+        rng = random.Random(7)
+
+        for _ in range(200):
+            sizes = [rng.randint(1, 20) for _ in range(len(text) // 5)]
+            items, _ = feed_in_chunks(text, sizes)
+            assert items == RESPONSE["foods"]
+
+    def test_item_emitted_as_soon_as_it_closes(self):
+        text = json.dumps(RESPONSE)
+        first_end = text.index("}, {") + 1
+        parser = IncrementalArrayParser("foods")
+
+        assert parser.feed(text[: first_end - 1]) == []
+        assert parser.feed(text[first_end - 1 : first_end]) == [RESPONSE["foods"][0]]
+
+    def test_markdown_fence_is_skipped(self):
+        text = "```json\n" + json.dumps(RESPONSE) + "\n```"
+
+        items, _ = feed_in_chunks(text, [3] * 50)
+
+        assert items == RESPONSE["foods"]
+
+    def test_other_arrays_are_ignored(self):
+        text = json.dumps({"notes": [{"a": 1}], "foods": [{"b": 2}]})
+
+        items, _ = feed_in_chunks(text, [4] * 10)
+
+        assert items == [{"b": 2}]
+
+    def test_invalid_item_raises(self):
+        parser = IncrementalArrayParser("foods")
+
+        with pytest.raises(json.JSONDecodeError):
+            parser.feed('{"foods": [{"name": oops}]}')
@@ -0,0 +1,169 @@
+"""
+Unit Tests - Vision Backends
+
+The offline fake and record/replay backends behind GeminiVisionService.
+"""
+
+import asyncio
+import time
+
+import pytest
+from PIL import Image
+
+from src.services.gemini_vision import GeminiVisionService
+from src.services.vision_backends import (
+    DEFAULT_FAKE_RESPONSE,
+    FakeVisionBackend,
+    RecordReplayBackend,
+    RecordingNotFoundError,
+)
+
+
+class TestFakeVisionBackend:
+    """Test suite for FakeVisionBackend."""
+
+    async def test_returns_canned_response(self):
+        backend = FakeVisionBackend(response={"foods": [], "meal_description": "vacío"})
+
+        response = await backend.generate("prompt", Image.new("RGB", (8, 8)), "ab" * 32)
+
+        assert response.text == '{"foods": [], "meal_description": "vacío"}'
+        assert response.output_tokens > 0
+        assert backend.calls == 1
+
+    async def test_applies_configured_latency(self):
+        backend = FakeVisionBackend(latency_seconds=0.05)
+
+        started = time.perf_counter()
+        await backend.generate("prompt", Image.new("RGB", (8, 8)), "00" * 32)
+
+        assert time.perf_counter() - started >= 0.05
+
+    def test_jitter_is_deterministic_per_image(self):
+        backend = FakeVisionBackend(latency_seconds=0.1, jitter_seconds=0.2)
+
+        assert backend.latency_for("ffffffff") == pytest.approx(0.3)
+        assert backend.latency_for("00000000") == pytest.approx(0.1)
+        assert backend.latency_for("8badf00d") == backend.latency_for("8badf00d")
+
+
+class TestRecordReplayBackend:
+    """Test suite for RecordReplayBackend."""
+
+    async def test_recorded_responses_replay_offline(self, tmp_path):
+        inner = FakeVisionBackend(response={"foods": [], "meal_description": "grabado"})
+        recorder = RecordReplayBackend(str(tmp_path), mode="record", inner=inner)
+        image = Image.new("RGB", (8, 8))
+
+        recorded = await recorder.generate("prompt", image, "digest-1")
+        replayer = RecordReplayBackend(str(tmp_path), mode="replay")
+        replayed = await replayer.generate("prompt", image, "digest-1")
+
+        assert replayed == recorded
+        assert replayer.model_name == "fake"
+        assert replayer.hits == 1
+
+    async def test_unrecorded_prompt_or_image_is_a_miss(self, tmp_path):
+        inner = FakeVisionBackend()
+        recorder = RecordReplayBackend(str(tmp_path), mode="record", inner=inner)
+        await recorder.generate("prompt", Image.new("RGB", (8, 8)), "digest-1")
+        replayer = RecordReplayBackend(str(tmp_path), mode="replay")
+
+        with pytest.raises(RecordingNotFoundError):
+            await replayer.generate("other prompt", Image.new("RGB", (8, 8)), "digest-1")
+        with pytest.raises(RecordingNotFoundError):
+            await replayer.generate("prompt", Image.new("RGB", (8, 8)), "digest-2")
+        assert replayer.misses == 2
+
+    def test_record_mode_requires_inner_backend(self, tmp_path):
+        with pytest.raises(ValueError):
+            RecordReplayBackend(str(tmp_path), mode="record")
+
+
+class TestGeminiVisionServiceWithBackends:
+    """The service runs its full pipeline against a pluggable backend."""
+
+    async def test_analysis_with_fake_backend(self, jpeg_bytes):
+        service = GeminiVisionService(backend=FakeVisionBackend())
+
+        result = await service.analyze_food_image(jpeg_bytes((200, 100, 50)))
+
+        assert [f.name for f in result.foods] == [
+            f["name"] for f in DEFAULT_FAKE_RESPONSE["foods"]
+        ]
+        assert service.model_name == "fake"
+
+    async def test_replay_is_keyed_by_image_content(self, tmp_path, jpeg_bytes):
+        recorder = GeminiVisionService(
+            backend=RecordReplayBackend(str(tmp_path), mode="record", inner=FakeVisionBackend())
+        )
+        await recorder.analyze_food_image(jpeg_bytes((200, 100, 50)))
+
+        replayer = GeminiVisionService(backend=RecordReplayBackend(str(tmp_path), mode="replay"))
+
+        result = await replayer.analyze_food_image(jpeg_bytes((200, 100, 50)))
+        assert result.meal_description == DEFAULT_FAKE_RESPONSE["meal_description"]
+        with pytest.raises(Exception, match="No recorded response"):
+            await replayer.analyze_food_image(jpeg_bytes((10, 20, 30)))
+
+
+class TestStreamingAnalysis:
+    """Test suite for GeminiVisionService.stream_food_analysis."""
+
+    async def test_foods_stream_before_the_response_completes(self, jpeg_bytes):
+        backend = FakeVisionBackend(stream_chunk_chars=16)
+        service = GeminiVisionService(backend=backend)
+        chunks_seen = []
+
+        original = backend.generate_stream
+
+        async def counting_stream(*args):
+            async for chunk in original(*args):
+                chunks_seen.append(chunk)
+                yield chunk
+
+        backend.generate_stream = counting_stream
+        events = service.stream_food_analysis(jpeg_bytes((200, 100, 50)))
+
+        first = await events.__anext__()
+        total_chunks = -(-len(backend.response_text) // 16)
+        assert first.name == "arroz blanco"
+        assert len(chunks_seen) < total_chunks
+
+        rest = [event async for event in events]
+        assert [f.name for f in rest[:-1]] == ["pollo guisado", "papa amarilla", "ensalada criolla"]
+        assert rest[-1].meal_description == DEFAULT_FAKE_RESPONSE["meal_description"]
+
+    async def test_stream_respects_deadline(self, jpeg_bytes):
+        from src.services.resilience import DeadlineExceededError, ResilientCaller
+
+        service = GeminiVisionService(
+            backend=FakeVisionBackend(latency_seconds=5, stream_chunk_chars=8),
+            resilience=ResilientCaller(deadline_seconds=0.05),
+        )
+
+        with pytest.raises(DeadlineExceededError):
+            async for _ in service.stream_food_analysis(jpeg_bytes((1, 2, 3))):
+                pass
+
+    async def test_deadline_expires_mid_stream_in_another_task(self, jpeg_bytes):
+        from src.services.resilience import DeadlineExceededError, ResilientCaller
+
+        service = GeminiVisionService(
+            backend=FakeVisionBackend(latency_seconds=1.8, stream_chunk_chars=16),
+            resilience=ResilientCaller(deadline_seconds=0.6),
+        )
+        events = service.stream_food_analysis(jpeg_bytes((1, 2, 3)))
+
+        # Like StreamingResponse: the first food is awaited by the endpoint,
+        # the rest by the response's own task
+        first = await asyncio.create_task(events.__anext__())
+
+        async def drain():
+            return [event async for event in events]
+
+        started = time.perf_counter()
+        with pytest.raises(DeadlineExceededError):
+            await asyncio.wait_for(asyncio.create_task(drain()), timeout=2)
+        assert first.name == "arroz blanco"
+        assert time.perf_counter() - started < 0.5
@@ -8,6 +8,9 @@ echo "=== Installing Python dependencies ==="
 cd backend
 pip install -r requirements.txt
 
+echo "=== Compiling food catalog ==="
+python -m src.services.catalog_compiler
+
 echo "=== Installing Node.js dependencies ==="
 cd ../frontend
 npm ci